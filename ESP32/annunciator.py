@@ -0,0 +1,142 @@
+# ==========================================
+# 響鈴提示 (硬體計時器 + PWM 蜂鳴器)
+# ==========================================
+# 響鈴節奏由週期計時器驅動，聲音由 PWM (LEDC) 產生，不依賴主迴圈：
+# 網路請求或其他 task 佔住 CPU 時，節奏照常 (計時器回呼最多延後，PWM 輸出不會停)。
+#   1. 提示樣式 (PATTERNS) 在建構時編成步驟表 (bytearray：每步 [持續格數, 音高索引])，
+#      計時器回呼只做整數運算與 PWM 設定，不配置記憶體
+#   2. 逐級升級 (LEVELS)：每一級有自己的樣式與音量，重複指定次數後換下一級 (越來越大聲、越來越急)
+#   3. 響滿 RING_MS 沒人回應就自動貪睡 SNOOZE_MS 再響，最多 ROUNDS 輪，之後放棄
+# 貪睡 / 再響 / 放棄時呼叫 notify (可在中斷中呼叫的旗標)，由主程式更新畫面、再通知 LINE。
+from array import array
+
+TICK_MS = 50
+RING_MS = 120000            # 每一輪響多久
+SNOOZE_MS = 300000          # 沒人回應時的貪睡時間
+ROUNDS = 5                  # 最多響幾輪 (約 30 分鐘)
+TONES = (0, 2000, 2700, 3400)   # 音高索引 -> Hz，0 = 靜音
+
+# 樣式：一次循環的 (毫秒, 音高索引)
+PATTERNS = {
+    "slow": ((500, 1), (500, 0)),
+    "double": ((150, 2), (100, 0), (150, 2), (600, 0)),
+    "fast": ((120, 3), (80, 0)),
+}
+# 每一級：(樣式, 音量 duty_u16, 循環幾次後升級；0 = 最後一級)
+LEVELS = (("slow", 12000, 10), ("double", 24000, 15), ("fast", 32768, 0))
+
+
+def compile_levels(levels, patterns=PATTERNS, tick_ms=TICK_MS):
+    # steps[2k] = 持續格數 (1~255)，steps[2k+1] = 音高索引；每一級佔 [start, end) 步
+    steps = bytearray()
+    start = array('H'); end = array('H'); duty = array('H'); cycles = array('H')
+    for name, d, n in levels:
+        start.append(len(steps) // 2)
+        for ms, tone in patterns[name]:
+            steps.append(max(1, min(255, ms // tick_ms))); steps.append(tone)
+        end.append(len(steps) // 2)
+        duty.append(d); cycles.append(n)
+    return steps, start, end, duty, cycles
+
+
+class Annunciator:
+    def __init__(self, pwm, timer, notify=None, levels=LEVELS,
+                 ring_ms=RING_MS, snooze_ms=SNOOZE_MS, rounds=ROUNDS):
+        # pwm 需支援 freq() / duty_u16()；timer 需支援 init(mode, period, callback) / deinit()
+        self.pwm = pwm
+        self.timer = timer
+        self.notify = notify
+        self.steps, self.l_start, self.l_end, self.l_duty, self.l_cycles = compile_levels(levels)
+        self.levels = len(self.l_duty)
+        self.freqs = array('H', TONES)
+        self.ring_ticks = ring_ms // TICK_MS
+        self.snooze_ms = snooze_ms
+        self.rounds = rounds
+        self.active = False         # 響鈴中 (含貪睡)
+        self.snoozed = False
+        self.gave_up = False        # 響滿 rounds 輪沒人回應
+        self.round = 0
+        self.level = 0
+        self.step = 0
+        self.left = 0               # 目前這一步還剩幾格
+        self.cycle = 0
+        self.ticks = 0              # 這一輪已響幾格
+        self.freq_i = 0             # 目前 PWM 頻率的音高索引 (沒變就不重設)
+        self.lit = False            # 正在發聲
+        self.repeats = 0            # 統計：自動貪睡後再響的次數
+        self._tick_cb = self._tick
+        self._wake_cb = self._wake
+        pwm.duty_u16(0)
+
+    def start(self):
+        self.gave_up = False
+        self.round = 0; self.level = 0
+        self.active = True
+        self._round()
+
+    def stop(self):
+        # 先標記停止：已排入的回呼看到 active = False 就不再發聲
+        self.active = False
+        self.snoozed = False
+        self.timer.deinit()
+        self._silence()
+
+    def _silence(self):
+        self.lit = False
+        self.pwm.duty_u16(0)
+
+    def _round(self):
+        # 開始新的一輪，延續上一輪升到的等級
+        self.round += 1
+        self.snoozed = False
+        self.ticks = 0; self.cycle = 0
+        self.step = self.l_start[self.level]
+        self._play()
+        self.timer.init(mode=self.timer.PERIODIC, period=TICK_MS, callback=self._tick_cb)
+
+    def _play(self):
+        i = self.step * 2
+        self.left = self.steps[i]
+        tone = self.steps[i + 1]
+        if not tone:
+            if self.lit: self._silence()
+            return
+        if tone != self.freq_i:
+            self.pwm.freq(self.freqs[tone]); self.freq_i = tone
+        self.pwm.duty_u16(self.l_duty[self.level])
+        self.lit = True
+
+    # ---- 計時器回呼 (不配置記憶體) ----
+    def _tick(self, t):
+        if not self.active or self.snoozed: return
+        self.ticks += 1
+        if self.ticks >= self.ring_ticks:
+            self._silence()
+            if self.round >= self.rounds:
+                self.timer.deinit()
+                self.active = False; self.gave_up = True
+            else:
+                self.snoozed = True
+                self.timer.init(mode=self.timer.ONE_SHOT, period=self.snooze_ms, callback=self._wake_cb)
+            if self.notify: self.notify()
+            return
+        self.left -= 1
+        if self.left > 0: return
+        s = self.step + 1
+        lv = self.level
+        if s >= self.l_end[lv]:
+            # 一次循環結束，次數到了就升級
+            self.cycle += 1
+            n = self.l_cycles[lv]
+            if n and self.cycle >= n and lv + 1 < self.levels:
+                lv = self.level = lv + 1
+                self.cycle = 0
+            s = self.l_start[lv]
+        self.step = s
+        self._play()
+
+    def _wake(self, t):
+        if not self.active: return
+        self.repeats += 1
+        self._round()
+        if self.notify: self.notify()
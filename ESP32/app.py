@@ -0,0 +1,1039 @@
+import time
+import gc
+import runtime as rt
+from journal import Journal, encode_batch
+from history import History, EPOCH_OFFSET, NO_SLOT, K_TAKE, K_ALARM, K_REPEAT, K_SKIP, K_MISS, K_LATE
+from history import SRC_LID, SRC_BUTTON, SRC_MENU
+from config_store import ConfigStore
+from render import Screen
+from schedule import Schedule, doses_from_config, NEVER
+from power import Power
+from lid import LidMonitor
+from inputq import InputQueue, Encoder, Button, EV_CW, EV_PRESS, accel
+from stats import Stats, STAGE_LID, STAGE_NET, STAGE_ALARM, STAGE_RENDER, STAGE_INPUT
+from stats import HTTP_ATTEMPTS, HTTP_RETRIES, HTTP_FAILS, HTTP_ERR16
+from stats import BOOT_CLOCK, BOOT_ONLINE, BOOT_CONFIG
+from jsonstream import JsonPicker
+from link import Link
+from timekeep import TimeKeeper
+from annunciator import Annunciator
+from snapshot import Snapshot, F_RINGING, F_SYNC_CONFIG
+
+# ==========================================
+# 設定區
+# ==========================================
+GAS_URL = "https://script.google.com/macros/s/AKfycbzKDhZvjdHClDMXHGdD0UG7sdhmKO4WHprAmV_RxHLzbpOQghF8KWyxhZrPOATL_euj/exec"
+UTC_OFFSET = 8 * 3600
+
+# 效能統計：關閉時只剩一次屬性判斷；STATS_UPLOAD_MS = 0 表示不附在請求上
+STATS_ENABLED = True
+STATS_UPLOAD_MS = 3600000
+STATS_REPORT_MS = 600000
+
+# HTTP：一串請求共用同一條 TLS 連線；False = 每次請求後斷線 (舊版行為)
+HTTP_KEEP_ALIVE = True
+
+# 回應只取需要的欄位 (串流解析)；超過上限的回應視為失敗
+JSON_BODY_LIMIT = 8192
+JSON_VALUE_LIMIT = 1024     # 單一欄位 (doses 陣列) 的上限
+CONFIG_KEYS = ('status', 'hour', 'minute', 'days', 'doses', 'version')
+BIND_KEYS = ('status', 'userId')
+BATCH_KEYS = ('status', 'acked')
+
+# -----------------------------
+# 1. 腳位
+# -----------------------------
+ROTARY_CLK_PIN = 32
+ROTARY_DT_PIN = 33
+ROTARY_SW_PIN = 4
+BUZZER_PIN = 15
+LID_PIN_1 = 18
+LID_PIN_2 = 19
+OLED_SCL_PIN = 22
+OLED_SDA_PIN = 21
+LID_TIMER = 0
+ALERT_TIMER = 1
+
+# -----------------------------
+# 2. 常數
+# -----------------------------
+SCAN_VIEW = 0
+PASSWORD_INPUT = 1
+CLOCK_VIEW = 2
+MENU_SELECT = 3
+SET_HOUR = 4
+SET_MINUTE = 5
+SET_WEEKDAY = 6
+ALARM_RINGING = 7
+BIND_INPUT = 8
+HISTORY_VIEW = 9
+
+# 日誌上傳：先等一下讓事件合併成一批，失敗時指數退避
+FLUSH_DELAY_MS = 5000
+FLUSH_BACKOFF_MIN_MS = 30000
+FLUSH_BACKOFF_MAX_MS = 600000
+
+# 雲端設定輪詢：帶上已知版本，沒變就只回 not_modified；沒變時間隔加倍
+CONFIG_POLL_MIN_MS = 60000
+CONFIG_POLL_MAX_MS = 480000
+
+# WiFi 斷線時請求最多等多久讓 link 重連 (重連與退避由 link.py 負責)
+LINK_WAIT_MS = 20000
+
+# 設定寫回 flash 前的合併時間
+COMMIT_DELAY_MS = 2000
+
+EARLY_TAKE_S = 3 * 3600   # 鬧鐘前 3 小時內提早吃過就不響
+
+# 省電：時鐘畫面閒置 DIM_AFTER_MS 後調暗螢幕並 light sleep
+DIM_AFTER_MS = 20000
+BLANK_AFTER_MS = 0          # >0 時閒置更久後關閉螢幕
+NORMAL_CONTRAST = 0xFF
+DIM_CONTRAST = 0x01
+MAX_SLEEP_MS = 60000
+DUTY_REPORT_MS = 600000
+
+# 看門狗：alarm_task 與 clock_task 都在 WDT_STALL_MS 內跑過才餵狗；light sleep 前也餵，
+# 逾時必須大於最長睡眠 (MAX_SLEEP_MS)
+WDT_TIMEOUT_MS = 90000
+WDT_FEED_MS = 5000
+WDT_STALL_MS = 15000
+
+PASSWORD_CHARS = "0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ!@#$%^&*()_+-=[]{};:'\",.<>/?~`"
+NUMERIC_CHARS = "0123456789"
+CONTROL_OPTIONS = ["OK", "DEL", "BACK"]
+
+MENU_ITEMS = ["Set Time", "Set Days", "Sync Cloud", "Bind User", "Log Now", "History", "WiFi Setup", "Back"]
+MENU_ROWS = 5               # 一次顯示幾個項目 (超過就捲動)
+WEEKDAY_NAMES = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+
+# ==========================================
+# App：整個韌體 (硬體全部由 hal 提供)
+# ==========================================
+# 裝置上 main.py 傳入 hal.Board()；電腦上 host/sim.py 傳入 SimBoard，
+# 同一份程式碼可在 CPython 下以虛擬時鐘執行。
+class App:
+    def __init__(self, hal):
+        self.hal = hal
+        self.stats = Stats(STATS_ENABLED)
+        self.stats_sent = rt.ticks_ms()
+
+        # ---- 腳位 ----
+        self.clk_pin = hal.pin_in(ROTARY_CLK_PIN)
+        self.dt_pin = hal.pin_in(ROTARY_DT_PIN)
+        self.sw_pin = hal.pin_in(ROTARY_SW_PIN)
+        # 藥盒開關 (上拉模式)
+        self.lid_switch_1 = hal.pin_in(LID_PIN_1)
+        self.lid_switch_2 = hal.pin_in(LID_PIN_2)
+
+        # light sleep 喚醒來源：按鍵 (ext0) 與旋鈕 CLK (ext1)，兩者都是 RTC 腳位
+        hal.wake_on_input(self.sw_pin, self.clk_pin)
+        self.pm = Power(hal.lightsleep, watch_pins=(self.lid_switch_1, self.lid_switch_2),
+                        input_wake=hal.woke_by_input)
+
+        # ---- 變數 ----
+        self.current_state = SCAN_VIEW
+        self.current_index = 0
+        self.max_index = 0
+        self.display_needs_update = True
+
+        self.should_upload_log = False
+        self.should_bind_code = False
+        self.should_sync_config = False
+        self.should_connect_wifi = False
+        self.pending_wifi = None
+
+        # 協作式排程用的通知旗標 (IRQ 可安全 set)
+        self.ui_flag = rt.Flag()
+        self.net_flag = rt.Flag()
+        # 結果訊息停留到此 tick，期間時鐘不覆蓋畫面
+        self.notice_until = 0
+
+        # 上一次觸發之後回應響鈴的時間 (0 = 沒有)：回應後不久再開蓋不算下一個時段的提早吃藥
+        self.answered_at = 0
+        self.last_alarm_fire = 0
+        self.ringing_slot = NO_SLOT     # 正在響的時段 (記入歷史)
+        # 當機 / 看門狗重置後要接續的狀態 (RTC 記憶體，狀態改變才寫)
+        self.snap = Snapshot(hal.rtc_memory, hal.rtc_memory)
+        self.wdt = None
+        self.beat_alarm = self.beat_clock = rt.ticks_ms()
+        self.tasks = []
+        self.alarm_toggle_flag = False
+        # 蜂鳴器由計時器 + PWM 驅動 (響鈴節奏、升級、自動貪睡)；狀態變化時通知 alert_task
+        self.alert_flag = rt.Flag()
+        self.ann = Annunciator(hal.pwm(BUZZER_PIN), hal.timer(ALERT_TIMER), notify=self.alert_flag.set)
+
+        self.char_index = 0
+        self.input_buffer = ""
+        self.wifi_list = []
+        self.menu_index = 0
+        self.weekday_edit_index = 0
+
+        # ---- OLED ----
+        # hal 只負責送初始化序列，之後畫面由 Screen 差異更新
+        self.lcd = Screen(hal.display_i2c(OLED_SCL_PIN, OLED_SDA_PIN, 128, 64))
+        self.lcd.clear(); self.lcd.show()
+
+        # ---- 檔案與網路 ----
+        # 設定集中在 ConfigStore：開機載入一次，讀取走 RAM，寫入合併後由 config_task 落地
+        self.config_flag = rt.Flag()
+        self.store = ConfigStore(on_dirty=self.config_flag.set)
+        self.alarm_config = self.store.alarm
+        self.sched = Schedule(UTC_OFFSET)
+        self.wlan = hal.wlan()
+        # 斷線自動重連；連上時喚醒網路 task (上傳日誌、開機同步)
+        self.link = Link(self.wlan, self.store, self.stats, on_up=self.net_flag.set)
+        # 定期 NTP 校時與 RTC 漂移補償；未校時 (tk.synced = False) 時鬧鐘暫停
+        self.tk = TimeKeeper(hal, self.store, self.link, on_step=self.clock_stepped)
+        self.http = hal.http_client(HTTP_KEEP_ALIVE)
+        self.http_busy = False      # 請求進行中 (非阻塞，其他 task 照常執行；不可 light sleep)
+        self.picker = JsonPicker(JSON_BODY_LIMIT, JSON_VALUE_LIMIT)
+        # 服藥歷史 (flash 環形檔 + 每日索引)；離線上傳直接從歷史讀未確認的事件
+        self.hist = History(UTC_OFFSET)
+        self.journal = Journal(self.hist)
+        self.poll_ms = CONFIG_POLL_MIN_MS
+        self.poll_full = False      # True：下一次輪詢不帶版本 (開機同步)
+        self.boot_sync = False      # 有存 WiFi 開機：第一次連上時完整同步設定
+        self.poll_at = rt.ticks_add(rt.ticks_ms(), CONFIG_POLL_MIN_MS)
+
+        # ---- 中斷 ----
+        # 旋鈕 (CLK/DT 雙邊緣正交解碼) 與按鍵只把事件放進 input_q；
+        # 藥盒開關由 LidMonitor 綁雙邊緣中斷 + 計時器去彈跳
+        self.input_flag = rt.Flag()
+        self.input_q = InputQueue()
+        self.input_q.notify = self.input_flag.set
+        self.encoder = Encoder(self.clk_pin, self.dt_pin, self.input_q); self.encoder.attach()
+        self.button = Button(self.sw_pin, self.input_q); self.button.attach()
+        self.lid_flag = rt.Flag()
+        self.lids = LidMonitor((self.lid_switch_1, self.lid_switch_2), hal.timer(LID_TIMER),
+                               notify=self.lid_flag.set)
+
+    # -----------------------------
+    # 3. 設定與網路
+    # -----------------------------
+    def get_user_id(self):
+        return self.store.user_id
+
+    # 選單編輯的是第一個服藥時段
+    def first_dose(self):
+        return self.alarm_config["doses"][0]
+
+    # 鬧鐘設定改變：標記寫回並重算排程
+    def alarm_changed(self):
+        self.store.mark_alarm()
+        self.reload_schedule()
+
+    def reload_schedule(self):
+        entries = doses_from_config(self.alarm_config) if self.alarm_config["enabled"] else []
+        self.sched.set_entries(entries, time.time())
+
+    # WiFi 設定畫面選好的帳密：連線一次，成功後由 link 在背景維持
+    async def connect_wifi(self, ssid, password):
+        lcd = self.lcd
+        lcd.clear(); lcd.text("Connecting...", 0, 0, 8, label=True); lcd.show()
+        return await self.link.join(ssid, password)
+
+    # 剛設定好 WiFi：顯示畫面並立刻校時，之後由 TimeKeeper 在背景定期校時
+    async def sync_time(self):
+        lcd = self.lcd
+        lcd.clear(); lcd.text("Syncing Time...", 0, 20, 8, label=True); lcd.show()
+        return await self.tk.sync()
+
+    # RTC 被校時或補償：時鐘可能跳動，從新的時間重算下一次鬧鐘
+    # 往前跳過的時段照補響規則：CATCHUP_S 內的補響，更早的由 check_alarm 記為錯過 (K_LATE)
+    def clock_stepped(self, old):
+        now = time.time()
+        if old is None: self.sched.rebuild(now)
+        else: self.sched.rebuild(now, old)
+
+    def scan_wifi(self):
+        lcd = self.lcd
+        lcd.clear(); lcd.text("Scanning...", 0, 20, 8, label=True); lcd.show()
+        try: nets = self.wlan.scan()
+        except: nets = []
+        new_list = []
+        for ap in nets:
+            try:
+                ssid = ap[0].decode('utf-8')
+                if ssid: new_list.append(f"{ssid} ({ap[3]}dBm)")
+            except: continue
+        self.max_index = len(new_list); self.current_index = 0
+        return new_list
+
+    async def api_request(self, payload, keys, max_retries=3):
+        # 1. 組合網址
+        params = ""
+        for key in payload:
+            params += "&" + key + "=" + str(payload[key])
+        full_url = GAS_URL + "?device=esp32" + params
+
+        # 每 STATS_UPLOAD_MS 把統計附在請求上 (後端寫入 Stats 表)
+        st = self.stats
+        attach = st.enabled and STATS_UPLOAD_MS and \
+            rt.ticks_diff(rt.ticks_ms(), self.stats_sent) > STATS_UPLOAD_MS
+        if attach: full_url += "&st=" + st.compact()
+
+        # 2. Connection 表頭由 HTTP 客戶端決定 (保持連線或 close)
+        headers = {
+            'User-Agent': 'Mozilla/5.0' # 偽裝一下比較不會被擋
+        }
+
+        link = self.link
+        for attempt in range(max_retries):
+            # 斷線時等 link 重連，等不到就放棄 (不必空轉重試)
+            if not await link.wait_up(LINK_WAIT_MS):
+                print("WiFi 未連線")
+                break
+            gc.collect()
+            st.inc(HTTP_ATTEMPTS)
+            st.mem()
+
+            if attempt > 0:
+                st.inc(HTTP_RETRIES)
+                print(f"等待資源釋放... ({attempt}/{max_retries})")
+                await rt.sleep_ms(2000)
+
+            print(f"發送請求...")
+            res = None
+            self.http_busy = True
+            try:
+                # 發送請求 (帶上 headers)；非阻塞，等待回應期間其他 task 照常執行
+                res = await self.http.get(full_url, headers)
+                print("狀態碼:", res.status_code)
+
+                data = None
+                try:
+                    # 分段讀取，只留下 keys 裡的欄位
+                    data = await self.picker.apick(res, keys)
+                except OSError: raise
+                except:
+                    print("JSON 解析失敗")
+                # 解析完成時的 heap：只有固定緩衝區與取出的欄位
+                st.mem()
+
+                # 關閉連線
+                if res:
+                    await res.close()
+                    del res # 強制刪除物件
+
+                gc.collect() # 再次清理
+                if attach: self.stats_sent = rt.ticks_ms()
+                return data
+
+            except OSError as e:
+                print(f"連線錯誤: {e}")
+                if res:
+                    try: await res.close()
+                    except: pass
+                # 連線可能已壞：全部關掉，釋放 TLS 佔用的 heap 再重試；順便請 link 檢查 WiFi
+                self.http.close()
+                link.kick()
+
+                # 如果是 Error 16，休息一下再試，通常 Connection: close 會解決它
+                if "16" in str(e):
+                    st.inc(HTTP_ERR16)
+                    await rt.sleep_ms(1000)
+
+            except Exception as e:
+                print(f"其他錯誤: {e}")
+                if res:
+                    try: await res.close()
+                    except: pass
+            finally:
+                self.http_busy = False
+
+        print("多次嘗試失敗，放棄。")
+        st.inc(HTTP_FAILS)
+        return None
+
+    # -----------------------------
+    # 4. 邏輯處理
+    # -----------------------------
+    # 顯示結果訊息並保留一段時間 (不阻塞，其他 task 照常執行)
+    def hold_screen(self, ms):
+        self.lcd.show()
+        self.notice_until = rt.ticks_add(rt.ticks_ms(), ms)
+
+    def screen_held(self):
+        return rt.ticks_diff(self.notice_until, rt.ticks_ms()) > 0
+
+    async def perform_sync_config(self):
+        lcd = self.lcd
+        uid = self.get_user_id()
+        if not uid:
+            lcd.clear(); lcd.text("No User Bound", 0, 20, 8, label=True); self.hold_screen(2000)
+            return
+
+        lcd.clear(); lcd.text("Syncing Config...", 0, 20, 8, label=True); lcd.show()
+        # 手動 / 開機同步一定取完整設定 (雲端覆蓋本機修改)
+        resp = await self.api_request({'action': 'get_config', 'userId': uid}, CONFIG_KEYS)
+        self.schedule_poll(CONFIG_POLL_MIN_MS)
+
+        lcd.clear()
+        if resp and resp.get('status') == 'success':
+            try:
+                new_doses = self.apply_config(resp)
+                h = new_doses[0]['hour']; m = new_doses[0]['minute']
+                lcd.text("Sync Success!", 0, 10, 8, label=True)
+                extra = f" +{len(new_doses) - 1}" if len(new_doses) > 1 else ""
+                lcd.text(f"Alarm: {h:02}:{m:02}{extra}", 0, 30, 8)
+
+                active_days = ""
+                for i in range(7):
+                    if new_doses[0]['days'][i]: active_days += str(i+1)
+                if active_days == "": active_days = "None"
+                lcd.text(f"Days: {active_days}", 0, 50, 8)
+
+            except Exception as e:
+                print("同步處理錯誤:", e)
+                lcd.text("Data Error", 0, 20, 8, label=True)
+        else:
+            lcd.text("Sync Failed", 0, 20, 8, label=True)
+
+        self.hold_screen(2000)
+
+    # 套用 get_config 回應，資料有誤時丟出例外 (不改動目前設定)
+    def apply_config(self, resp):
+        doses = resp.get('doses')
+        if not isinstance(doses, list) or not doses:
+            # 舊版後端只有單一時段
+            doses = [{'hour': resp.get('hour'), 'minute': resp.get('minute'), 'days': resp.get('days')}]
+        new_doses = []
+        for d in doses:
+            dose = {'hour': int(d['hour']), 'minute': int(d['minute']),
+                    'days': [False]*7, 'box': int(d.get('box', 0))}
+            cloud_days = d.get('days')
+            if isinstance(cloud_days, list) and len(cloud_days) == 7:
+                dose['days'] = cloud_days
+            new_doses.append(dose)
+
+        self.alarm_config['doses'] = new_doses
+        self.alarm_config['enabled'] = True
+        # 舊版後端沒有版本號：不帶版本，輪詢時每次都取完整設定
+        ver = resp.get('version')
+        if ver is not None: self.alarm_config['version'] = str(ver)
+        else: self.alarm_config.pop('version', None)
+        self.alarm_changed()
+        return new_doses
+
+    def schedule_poll(self, ms):
+        self.poll_ms = ms
+        self.poll_at = rt.ticks_add(rt.ticks_ms(), ms)
+
+    def poll_left_ms(self):
+        return rt.ticks_diff(self.poll_at, rt.ticks_ms())
+
+    # 背景輪詢雲端設定 (不動畫面)：LINE 改的設定幾分鐘內就會生效
+    async def poll_config(self):
+        uid = self.get_user_id()
+        if not uid or not self.link.online:
+            self.schedule_poll(CONFIG_POLL_MAX_MS); return
+        payload = {'action': 'get_config', 'userId': uid}
+        ver = None if self.poll_full else self.alarm_config.get('version')
+        if ver: payload['ver'] = ver
+        resp = await self.api_request(payload, CONFIG_KEYS, max_retries=1)
+        status = resp.get('status') if resp else None
+        if status == 'not_modified':
+            self.schedule_poll(min(self.poll_ms * 2, CONFIG_POLL_MAX_MS))
+        elif status == 'success':
+            try:
+                self.apply_config(resp)
+                if self.poll_full: self.stats.mark(BOOT_CONFIG)
+                self.poll_full = False
+                print("雲端設定已更新, 版本:", self.alarm_config.get('version'))
+                if self.current_state == CLOCK_VIEW:
+                    self.display_needs_update = True; self.ui_flag.set()
+                self.schedule_poll(CONFIG_POLL_MIN_MS)
+            except Exception as e:
+                print("同步處理錯誤:", e)
+                self.schedule_poll(CONFIG_POLL_MAX_MS)
+        else:
+            # 失敗：退避，不和日誌上傳搶重試
+            self.schedule_poll(min(self.poll_ms * 2, CONFIG_POLL_MAX_MS))
+
+    def handle_input(self, charset, is_wifi):
+        clen = len(charset)
+        if self.char_index < clen:
+            self.input_buffer += charset[self.char_index]
+            self.char_index = 0
+        else:
+            cmd = self.char_index - clen
+            if cmd == 0: # OK
+                if is_wifi:
+                    # 連線交給網路 task，不在輸入處理裡等待
+                    ssid = self.wifi_list[self.current_index].split(' (')[0]
+                    self.pending_wifi = (ssid, self.input_buffer)
+                    self.should_connect_wifi = True
+                    self.net_flag.set()
+                else:
+                    self.should_bind_code = True
+                    self.current_state = CLOCK_VIEW
+                    self.net_flag.set()
+
+            elif cmd == 1: # DEL
+                self.input_buffer = self.input_buffer[:-1]
+            elif cmd == 2: # BACK
+                if is_wifi: self.current_state = SCAN_VIEW
+                else: self.current_state = MENU_SELECT
+
+    async def perform_bind(self):
+        lcd = self.lcd
+        lcd.clear(); lcd.text("Binding...", 0, 20, 8, label=True); lcd.show()
+        resp = await self.api_request({'action': 'bind', 'code': self.input_buffer}, BIND_KEYS)
+        lcd.clear()
+        if resp and resp.get('status') == 'success':
+            uid = resp.get('userId')
+            print("儲存 User ID:", uid)
+            self.store.set_user_id(uid)
+            lcd.text("Bind Success!", 0, 20, 8, label=True)
+        else:
+            lcd.text("Bind Failed!", 0, 20, 8, label=True)
+        self.hold_screen(2000)
+
+    async def perform_connect_wifi(self):
+        ssid, pwd = self.pending_wifi
+        if await self.connect_wifi(ssid, pwd):
+            self.store.set_wifi(ssid, pwd)
+            await self.sync_time()
+            self.should_sync_config = True
+            self.current_state = CLOCK_VIEW
+        else: self.current_state = SCAN_VIEW
+        self.pending_wifi = None
+
+    # 吃藥事件已由 mark_taken 寫入歷史 (網路 task 批次上傳)，這裡只顯示結果
+    def show_logged(self):
+        lcd = self.lcd
+        lcd.clear()
+        if self.get_user_id(): lcd.text("Log Saved!", 0, 20, 8, label=True)
+        else: lcd.text("Please Bind 1st", 0, 20, 8, label=True)
+        self.hold_screen(1000)
+
+    # 響鈴 / 再響記入歷史，由網路 task 上傳後後端通知 LINE
+    def notify_alarm(self, kind=K_ALARM):
+        print("通知 LINE: 鬧鐘響了")
+        self.hist.add(kind, slot=self.ringing_slot)
+        self.net_flag.set()
+
+    # 上傳一批日誌事件，回傳是否成功 (失敗由呼叫端退避重試)
+    # 還沒綁定時事件留在日誌裡，回傳 False：綁定前不算送出
+    async def flush_journal(self):
+        uid = self.get_user_id()
+        if not uid: return False
+        journal = self.journal
+        batch = journal.pending()
+        if not batch:
+            # 待上傳的紀錄已讀不到 (斷電寫壞)：確認到最後一筆，不再重試
+            journal.ack(self.hist.last_upload); return True
+        resp = await self.api_request({'action': 'batch', 'userId': uid, 'jid': journal.jid,
+                                       'events': encode_batch(batch)}, BATCH_KEYS, max_retries=1)
+        if resp and resp.get('status') == 'success':
+            journal.ack(int(resp.get('acked', batch[-1][0])))
+            return True
+        return False
+
+    # -----------------------------
+    # 5. 輸入與開關事件
+    # -----------------------------
+    # 旋鈕 / 按鍵事件由中斷放進 input_q，這裡在 input_task 中消化 (可安全做任何事)
+    def on_rotate(self, direction, dt):
+        s = self.current_state
+        if s == SCAN_VIEW and self.max_index > 0:
+            self.current_index = (self.current_index + direction) % self.max_index
+        elif s == PASSWORD_INPUT:
+            total_opts = len(PASSWORD_CHARS) + 3
+            self.char_index = (self.char_index + direction * accel(dt)) % total_opts
+        elif s == BIND_INPUT:
+            total_opts = len(NUMERIC_CHARS) + 3
+            self.char_index = (self.char_index + direction + total_opts) % total_opts
+        elif s == MENU_SELECT:
+            self.menu_index = (self.menu_index + direction) % len(MENU_ITEMS)
+        elif s == SET_HOUR:
+            d = self.first_dose(); d["hour"] = (d["hour"] + direction) % 24
+        elif s == SET_MINUTE:
+            d = self.first_dose(); d["minute"] = (d["minute"] + direction * accel(dt)) % 60
+        elif s == SET_WEEKDAY:
+            self.weekday_edit_index = (self.weekday_edit_index + direction) % 8
+        self.display_needs_update = True
+
+    def on_press(self):
+        s = self.current_state
+        if s == SCAN_VIEW and self.max_index > 0:
+            self.input_buffer = ""; self.char_index = 0; self.current_state = PASSWORD_INPUT
+        elif s == PASSWORD_INPUT:
+            self.handle_input(PASSWORD_CHARS, is_wifi=True)
+        elif s == BIND_INPUT:
+            self.handle_input(NUMERIC_CHARS, is_wifi=False)
+        elif s == CLOCK_VIEW:
+            self.menu_index = 0; self.current_state = MENU_SELECT
+        elif s == MENU_SELECT:
+            item = MENU_ITEMS[self.menu_index]
+            if item == "Set Time": self.current_state = SET_HOUR
+            elif item == "Set Days": self.weekday_edit_index = 0; self.current_state = SET_WEEKDAY
+            elif item == "Sync Cloud":
+                self.current_state = CLOCK_VIEW; self.should_sync_config = True
+            elif item == "Bind User":
+                self.current_state = BIND_INPUT; self.input_buffer = ""; self.char_index = 0
+            elif item == "Log Now":
+                self.current_state = CLOCK_VIEW; self.should_upload_log = True
+                self.mark_taken(0, SRC_MENU, False)
+            elif item == "History": self.current_state = HISTORY_VIEW
+            elif item == "WiFi Setup":
+                self.link.stop()
+                self.wifi_list = self.scan_wifi(); self.current_state = SCAN_VIEW
+            elif item == "Back": self.current_state = CLOCK_VIEW
+        elif s == SET_HOUR: self.current_state = SET_MINUTE
+        elif s == SET_MINUTE:
+            self.alarm_config["enabled"] = True; self.alarm_changed(); self.current_state = CLOCK_VIEW
+        elif s == SET_WEEKDAY:
+            days = self.first_dose()["days"]
+            i = self.weekday_edit_index
+            if i < 7: days[i] = not days[i]
+            else: self.alarm_changed(); self.current_state = CLOCK_VIEW
+        elif s == ALARM_RINGING:
+            self.ann.stop(); self.current_state = CLOCK_VIEW; self.should_upload_log = True
+            self.mark_taken(0, SRC_BUTTON, True)
+        elif s == HISTORY_VIEW: self.current_state = CLOCK_VIEW
+
+        self.display_needs_update = True
+        self.net_flag.set()
+
+    # 藥盒開關事件 (由 lid_task 從 LidMonitor 的緩衝區取出)
+    def handle_lid_event(self, box, opened, ts):
+        if not opened:
+            print(f"藥格 {box} 已關閉")
+            return
+        print(f"確認開蓋！藥格 {box}")
+        # 執行吃藥動作
+        if self.current_state == ALARM_RINGING:
+            self.ann.stop()
+            self.current_state = CLOCK_VIEW
+            self.mark_taken(box, SRC_LID, True, ts)
+            self.show_logged(); self.net_flag.set()
+        elif self.current_state == CLOCK_VIEW:
+            self.mark_taken(box, SRC_LID, False, ts)
+            self.show_logged(); self.net_flag.set()
+
+    # -----------------------------
+    # 6. UI
+    # -----------------------------
+    # 各畫面只更新內容有變的欄位 (lcd.field)，固定標題在進入畫面時畫一次
+    def draw_input_ui(self, title, charset):
+        lcd = self.lcd
+        if lcd.begin(self.current_state): lcd.text(title, 0, 0, 8, label=True)
+        lcd.field('buf', self.input_buffer[-13:], 0, 16)
+        mid = 2; start = self.char_index - mid
+        total = len(charset) + 3
+        for i in range(5):
+            idx = (start + i) % total
+            txt = ""
+            if idx < len(charset): txt = charset[idx]
+            else: txt = CONTROL_OPTIONS[idx - len(charset)]
+            if txt == "DEL": txt = "<-"
+            elif txt == "BACK": txt = "RT"
+            x = 10 + i * 24
+            lcd.field(i, txt, x, 40)
+            if i == mid: lcd.field('caret', "^", x + (4 if len(txt)>1 else 0), 52)
+        lcd.show()
+
+    def update_ui(self):
+        lcd = self.lcd
+        s = self.current_state
+        if s == SCAN_VIEW:
+            if self.wifi_list:
+                lcd.begin(SCAN_VIEW); lcd.field('ssid', self.wifi_list[self.current_index][:16], 0, 0); lcd.show()
+        elif s == PASSWORD_INPUT:
+            # 連線中畫面由網路 task 負責
+            if self.pending_wifi is None: self.draw_input_ui("Enter WiFi Pass", PASSWORD_CHARS)
+        elif s == BIND_INPUT: self.draw_input_ui("Enter Bind Code", NUMERIC_CHARS)
+        elif s == MENU_SELECT:
+            # 項目名稱是固定標籤，只在捲動時重畫；平常只移動游標
+            if lcd.begin(MENU_SELECT): lcd.text("--- Menu ---", 0, 0, 8, label=True)
+            top = max(0, self.menu_index - MENU_ROWS + 1)
+            for r in range(MENU_ROWS):
+                lcd.field(r, MENU_ITEMS[top + r], 16, 16 + r*10, label=True)
+            lcd.field('cursor', ">", 0, 16 + (self.menu_index - top)*10)
+            lcd.show()
+        elif s == HISTORY_VIEW:
+            if lcd.begin(HISTORY_VIEW): self.draw_history()
+            lcd.show()
+        elif s == SET_HOUR:
+            if lcd.begin(SET_HOUR): lcd.text("Set Hour", 0, 0, 8, label=True)
+            lcd.field('v', f"{self.first_dose()['hour']:02}", 50, 30); lcd.show()
+        elif s == SET_MINUTE:
+            if lcd.begin(SET_MINUTE): lcd.text("Set Minute", 0, 0, 8, label=True)
+            lcd.field('v', f"{self.first_dose()['minute']:02}", 50, 30); lcd.show()
+        elif s == SET_WEEKDAY:
+            if lcd.begin(SET_WEEKDAY): lcd.text("Set Days", 0, 0, 8, label=True)
+            idx = self.weekday_edit_index
+            if idx < 7:
+                day = WEEKDAY_NAMES[idx]
+                status = "ON" if self.first_dose()['days'][idx] else "OFF"
+                lcd.field('v', f"{day}: {status}", 30, 30)
+            else: lcd.field('v', "Save & Exit", 20, 30)
+            lcd.show()
+
+    # 服藥紀錄：今天 / 昨天 (按時 / 應服)、7 / 30 天服藥率、連續全勤天數 (只讀歷史的 RAM 索引)
+    def draw_history(self):
+        lcd = self.lcd; h = self.hist
+        d = h.today()
+        lcd.text("--- History ---", 0, 0, 8, label=True)
+        ok, due = h.day_counts(d)
+        lcd.text(f"Today {ok}/{due}", 0, 16, 8)
+        ok, due = h.day_counts(d - 1)
+        lcd.text(f"Yday  {ok}/{due}", 0, 26, 8)
+        for n, y in ((7, 36), (30, 46)):
+            ok, due = h.summary(d, n)
+            pct = f"{ok * 100 // due}%" if due else "--"
+            lcd.text(f"{n}d {pct} {ok}/{due}", 0, y, 8)
+        lcd.text(f"Streak {h.streak(d)}d", 0, 56, 8)
+
+    # -----------------------------
+    # 7. 鬧鐘檢查
+    # -----------------------------
+    # 吃藥記入歷史 (box: 開啟的藥格，0 = 按鈕 / 選單)；answering = True 表示是回應正在響的鬧鐘
+    # 非響鈴時吃藥算提早吃藥：取消 EARLY_TAKE_S 內、藥格相符的下一次鬧鐘
+    # ts：事件發生的時間 (開蓋中斷記下的 RTC 秒)，預設為現在；lid_task 晚取出也不會記錯時間
+    def mark_taken(self, box, src, answering, ts=None):
+        if ts is None: ts = int(time.time())
+        self.hist.add(K_TAKE, box, src, self.ringing_slot if answering else NO_SLOT, ts + EPOCH_OFFSET)
+        if answering: self.answered_at = ts
+        else: self.sched.take_early(box, ts, EARLY_TAKE_S, self.answered_at)
+
+    # 排程到期時才會往下執行，平常只是一次整數比較
+    def check_alarm(self):
+        # 時間不可信 (斷電後尚未校時) 就先不響，校時後從正確時間重算
+        if not self.tk.synced: return
+        fired = self.sched.poll(time.time())
+        if not fired: return
+        for t, i, on_time in fired:
+            self.last_alarm_fire = t
+            self.answered_at = 0
+            if not on_time:
+                print("錯過鬧鐘 (超過補響時間):", self.sched.entries[i])
+                self.hist.add(K_LATE, slot=i); continue
+            if self.sched.skipped(i, t):
+                self.hist.add(K_SKIP, slot=i); continue
+            self.current_state = ALARM_RINGING
+            self.ringing_slot = i
+            self.ann.start()
+            print("鬧鐘響了！", self.sched.entries[i])
+            self.notify_alarm()
+        self.save_snapshot()
+
+    def draw_clock(self):
+        t = time.localtime(time.time() + UTC_OFFSET)
+
+        lcd = self.lcd
+        lcd.begin(CLOCK_VIEW)
+        # 省電模式每分鐘才醒來一次，不顯示秒
+        # y 對齊頁邊界：字格直接複製，每秒只送一頁
+        if self.pm.low_power: lcd.field('time', f"{t[3]:02}:{t[4]:02}", 30, 24)
+        else: lcd.field('time', f"{t[3]:02}:{t[4]:02}:{t[5]:02}", 30, 24)
+        lcd.field('sync', "" if self.tk.synced else "?", 104, 24)
+
+        nxt = self.sched.upcoming()
+        if nxt:
+            a = time.localtime(nxt[0] + UTC_OFFSET)
+            alarm_time = f"{a[3]:02}:{a[4]:02}"
+            taken_mark = "[V]" if self.hist.taken(self.hist.today()) else "[ ]"
+            lcd.field('alarm', f"Alarm: {alarm_time} {taken_mark}", 0, 40)
+        else:
+            lcd.field('alarm', "Alarm: OFF", 0, 40)
+
+        lcd.show()
+
+    # -----------------------------
+    # 8. 當機接續
+    # -----------------------------
+    def save_snapshot(self, crash=False):
+        flags = 0
+        if self.current_state == ALARM_RINGING: flags |= F_RINGING
+        if self.should_sync_config: flags |= F_SYNC_CONFIG
+        sched = self.sched
+        self.snap.save(flags, self.ringing_slot, self.last_alarm_fire, self.answered_at,
+                       sched.last_fire, sched.skip, crash)
+
+    # 開機：有快照 (軟重置 / 看門狗 / 當機) 就接續響鈴、提早吃藥與排程狀態，回傳是否接續
+    def restore_snapshot(self):
+        snap = self.snap.load(self.hal.reset_cause())
+        print("重開機:", self.snap.report())
+        if snap is None: return False
+        flags, slot, last_fire, answered, fires, skips = snap
+        self.last_alarm_fire = last_fire
+        self.answered_at = answered
+        # 已觸發過的時段不重響，重開期間到期的照補響規則處理
+        self.sched.resume(fires, skips, time.time())
+        if flags & F_SYNC_CONFIG: self.should_sync_config = True
+        if flags & F_RINGING and slot < len(self.sched.entries):
+            self.ringing_slot = slot
+            self.current_state = ALARM_RINGING
+            self.ann.start()
+            print("接續響鈴:", self.sched.entries[slot])
+        return True
+
+    # -----------------------------
+    # 9. Tasks
+    # -----------------------------
+    # 時鐘顯示 / 響鈴閃爍 (聲音由 annunciator 自己計時，這裡只管畫面)
+    async def clock_task(self):
+        lcd = self.lcd; st = self.stats
+        while True:
+            self.beat_clock = rt.ticks_ms()
+            if self.current_state == ALARM_RINGING:
+                self.alarm_toggle_flag = not self.alarm_toggle_flag
+                t0 = st.start()
+                lcd.begin(ALARM_RINGING)
+                # 貪睡中不閃爍
+                on = self.alarm_toggle_flag or self.ann.snoozed
+                lcd.field('msg', "Time to Eat!" if on else "", 20, 32, label=True); lcd.show()
+                st.stop(STAGE_RENDER, t0)
+                await rt.sleep_ms(500)
+            else:
+                if self.current_state == CLOCK_VIEW and not self.screen_held():
+                    t0 = st.start(); self.draw_clock(); st.stop(STAGE_RENDER, t0)
+                await rt.sleep_ms(1000)
+
+    # 鬧鐘檢查 (每 250ms 一次)。除了 WiFi 設定畫面外，任何畫面都會響；
+    # 設定期間到期的鬧鐘留在排程中，回到其他畫面時依補響規則處理
+    async def alarm_task(self):
+        st = self.stats
+        while True:
+            self.beat_alarm = rt.ticks_ms()
+            if self.current_state not in (SCAN_VIEW, PASSWORD_INPUT):
+                t0 = st.start(); self.check_alarm(); st.stop(STAGE_ALARM, t0)
+            await rt.sleep_ms(250)
+
+    # 響鈴沒人回應：annunciator 自動貪睡後再響時重新通知 LINE，響滿最後一輪就回到時鐘
+    async def alert_task(self):
+        ann = self.ann
+        while True:
+            await self.alert_flag.wait()
+            if self.current_state != ALARM_RINGING: continue
+            if ann.gave_up:
+                print("鬧鐘無人回應，停止提醒")
+                self.hist.add(K_MISS, slot=self.ringing_slot)
+                self.current_state = CLOCK_VIEW
+            elif ann.snoozed: print("鬧鐘貪睡中")
+            elif ann.active:
+                print(f"再次提醒 (第 {ann.round} 輪)")
+                self.notify_alarm(K_REPEAT)
+            self.save_snapshot()
+
+    # 旋鈕 / 按鍵：等中斷通知後把事件一次取完，整批處理完才重畫一次
+    async def input_task(self):
+        q = self.input_q; st = self.stats
+        while True:
+            await self.input_flag.wait()
+            t0 = st.start()
+            while True:
+                ev = q.get()
+                if ev is None: break
+                kind, dt = ev
+                self.pm.activity()
+                if kind == EV_PRESS: self.on_press()
+                else: self.on_rotate(1 if kind == EV_CW else -1, dt)
+            st.stop(STAGE_INPUT, t0)
+            self.save_snapshot()
+            if self.display_needs_update: self.ui_flag.set()
+
+    # 藥盒開關：等 LidMonitor 通知後把事件一次取完
+    async def lid_task(self):
+        st = self.stats
+        while True:
+            await self.lid_flag.wait()
+            t0 = st.start()
+            while True:
+                ev = self.lids.get()
+                if ev is None: break
+                self.handle_lid_event(*ev)
+            st.stop(STAGE_LID, t0)
+            self.save_snapshot()
+
+    def _net_work_pending(self):
+        return self.should_connect_wifi or self.should_bind_code or self.should_upload_log \
+            or self.should_sync_config
+
+    # 依序處理網路旗標
+    async def handle_net_flags(self):
+        if self.should_connect_wifi:
+            self.should_connect_wifi = False
+            await self.perform_connect_wifi(); self.display_needs_update = True; self.ui_flag.set()
+        if self.should_bind_code:
+            self.should_bind_code = False
+            await self.perform_bind(); self.display_needs_update = True; self.ui_flag.set()
+        if self.should_upload_log:
+            self.should_upload_log = False
+            self.show_logged(); self.display_needs_update = True; self.ui_flag.set()
+        if self.should_sync_config:
+            self.should_sync_config = False
+            await self.perform_sync_config(); self.display_needs_update = True; self.ui_flag.set()
+        self.save_snapshot()
+
+    # WiFi 連上 (開機或斷線恢復)：校時到期 (或尚未校時) 就校時；有存 WiFi 開機的第一次連線做完整設定同步
+    def link_up(self):
+        self.tk.kick()
+        if not self.boot_sync: return
+        self.boot_sync = False
+        st = self.stats
+        st.mark(BOOT_ONLINE)
+        # 開機同步一定取完整設定 (雲端覆蓋本機修改)，不佔用畫面
+        self.poll_full = True
+        self.schedule_poll(0)
+        print("開機: 時鐘 %d ms, 上線 %d ms" % (st.boot[BOOT_CLOCK], st.boot[BOOT_ONLINE]))
+
+    # 網路 I/O：先處理旗標，沒有工作時等待 net_flag、日誌上傳時間或設定輪詢時間
+    async def net_task(self):
+        flush_wait = FLUSH_DELAY_MS
+        flush_at = None
+        journal = self.journal; st = self.stats; link = self.link
+        ups = 0
+        while True:
+            if link.ups != ups:
+                # 剛連上：日誌不等退避，馬上上傳
+                ups = link.ups
+                self.link_up()
+                flush_at = None; flush_wait = 0
+            if self._net_work_pending():
+                t0 = st.start(); await self.handle_net_flags(); st.stop(STAGE_NET, t0)
+                continue
+            poll_left = self.poll_left_ms()
+            if poll_left <= 0:
+                t0 = st.start(); await self.poll_config(); st.stop(STAGE_NET, t0)
+                continue
+            if not journal.has_pending() or not self.get_user_id():
+                # 一串請求結束：關閉保持中的連線再閒置 (還沒綁定時事件留著，綁定後由 net_flag 喚醒)
+                flush_at = None
+                self.http.close()
+                await self.net_flag.wait_ms(poll_left); continue
+            # 有待上傳事件：等合併時間 (期間有新旗標或輪詢到期就先處理)
+            if flush_at is None: flush_at = rt.ticks_add(rt.ticks_ms(), flush_wait)
+            flush_left = rt.ticks_diff(flush_at, rt.ticks_ms())
+            if flush_left > 0:
+                await self.net_flag.wait_ms(min(flush_left, poll_left)); continue
+            flush_at = None
+            t0 = st.start()
+            flushed = link.online and await self.flush_journal()
+            st.stop(STAGE_NET, t0)
+            if flushed:
+                flush_wait = FLUSH_DELAY_MS
+                if journal.has_pending(): flush_wait = 0
+            else:
+                self.http.close()
+                flush_wait = min(max(flush_wait * 2, FLUSH_BACKOFF_MIN_MS), FLUSH_BACKOFF_MAX_MS)
+
+    # 設定寫回 flash：第一次變更後等 COMMIT_DELAY_MS，把期間的修改合併成一次寫入
+    async def config_task(self):
+        while True:
+            await self.config_flag.wait()
+            await rt.sleep_ms(COMMIT_DELAY_MS)
+            try: self.store.commit()
+            except OSError as e:
+                print("設定寫入失敗:", e); self.config_flag.set()
+            print("flash 寫入次數:", self.store.flash_writes)
+
+    def can_sleep(self):
+        if self.current_state != CLOCK_VIEW or self.screen_held() or self.pending_wifi is not None:
+            return False
+        if self._net_work_pending() or self.link.busy or self.http_busy: return False
+        # 開蓋去彈跳中或還有事件沒處理就不睡
+        return self.lids.settled()
+
+    def ms_until_wake(self):
+        now = time.time()
+        ms = (60 - (now + UTC_OFFSET) % 60) * 1000
+        if self.sched.next_fire != NEVER: ms = min(ms, (self.sched.next_fire - now) * 1000)
+        if self.get_user_id(): ms = min(ms, self.poll_left_ms())
+        return max(0, min(ms, MAX_SLEEP_MS))
+
+    # 省電：睡到下一分鐘 / 下一次鬧鐘，旋鈕、按鍵或藥盒開關改變會提早喚醒
+    async def power_task(self):
+        pm = self.pm; lcd = self.lcd
+        last_report = rt.ticks_ms()
+        while True:
+            await rt.sleep_ms(100)
+            if not self.can_sleep() or pm.idle_ms() < DIM_AFTER_MS:
+                if pm.low_power:
+                    pm.low_power = False
+                    lcd.power(True); lcd.contrast(NORMAL_CONTRAST)
+                    print("離開省電模式:", pm.report())
+                continue
+            if not pm.low_power:
+                pm.low_power = True
+                lcd.contrast(DIM_CONTRAST); self.draw_clock()
+            if BLANK_AFTER_MS and pm.idle_ms() > BLANK_AFTER_MS: lcd.power(False)
+            # 睡眠期間沒有 task 能餵狗，睡前先餵 (最長睡眠小於 WDT_TIMEOUT_MS)
+            if self.wdt: self.wdt.feed()
+            why = pm.sleep(self.ms_until_wake())
+            if why == 'input': pm.activity()
+            # 睡眠中 GPIO 18/19 的邊緣中斷可能遺失，醒來後補一次去彈跳取樣
+            elif why == 'pin': self.lids.kick()
+            if rt.ticks_diff(rt.ticks_ms(), last_report) > DUTY_REPORT_MS:
+                last_report = rt.ticks_ms()
+                print("省電統計:", pm.report())
+
+    # UI：旋鈕 / 按鍵事件後重畫
+    async def ui_task(self):
+        st = self.stats
+        while True:
+            if self.display_needs_update:
+                self.display_needs_update = False
+                t0 = st.start(); self.update_ui(); st.stop(STAGE_RENDER, t0)
+            await self.ui_flag.wait()
+
+    # 看門狗：鬧鐘與時鐘 task 都正常運作才餵；事件迴圈被卡住或 task 停擺就由硬體重置
+    async def wdt_task(self):
+        self.wdt = self.hal.wdt(WDT_TIMEOUT_MS)
+        while True:
+            now = rt.ticks_ms()
+            if rt.ticks_diff(now, self.beat_alarm) < WDT_STALL_MS and rt.ticks_diff(now, self.beat_clock) < WDT_STALL_MS:
+                self.wdt.feed()
+            await rt.sleep_ms(WDT_FEED_MS)
+
+    # 統計定時印到序列埠
+    async def stats_task(self):
+        while True:
+            await rt.sleep_ms(STATS_REPORT_MS)
+            if self.stats.enabled: print("效能統計:\n" + self.stats.report())
+            print("時間:", self.tk.report())
+            print("重開機:", self.snap.report())
+
+    # -----------------------------
+    # 10. 主程式
+    # -----------------------------
+    async def main(self):
+        gc.enable()
+        saved_ssid, saved_pass = self.store.load()
+        self.tk.restore()
+        self.reload_schedule()
+
+        # 有存 WiFi 就直接進時鐘畫面，由 link 在背景連線 (期間時鐘與鬧鐘照常運作)
+        if saved_ssid and saved_pass:
+            self.current_state = CLOCK_VIEW
+            self.draw_clock()
+            self.stats.mark(BOOT_CLOCK)
+            self.boot_sync = True
+            self.link.start(saved_ssid, saved_pass)
+        else:
+            self.current_state = SCAN_VIEW
+            self.wlan.active(True)
+            self.wifi_list = self.scan_wifi()
+
+        # 軟重置 / 看門狗 / 當機後接續響鈴與排程狀態
+        self.restore_snapshot()
+        self.save_snapshot()
+
+        self.tasks = [rt.spawn(c) for c in (
+            self.clock_task(), self.alarm_task(), self.lid_task(), self.net_task(), self.ui_task(),
+            self.config_task(), self.power_task(), self.input_task(), self.stats_task(),
+            self.link.run(), self.tk.run(), self.alert_task(), self.wdt_task())]
+        try:
+            await rt.asyncio.gather(*self.tasks)
+        except Exception as e:
+            # 任一 task 拋出未處理的例外：記下快照後重置，重開機接續 (裝置上 reset 不會返回)
+            print("當機:", repr(e))
+            self.save_snapshot(crash=True)
+            self.hal.reset()
+
+    def run(self):
+        rt.run(self.main())
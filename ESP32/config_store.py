@@ -0,0 +1,166 @@
+# ==========================================
+# 設定儲存 (開機讀一次，之後都從 RAM 讀)
+# ==========================================
+# 管理 wifi.txt / alarm.json / user_id.txt / clock.txt (最後可信的時間與 RTC 漂移率，開機時還原 RTC) /
+# link.txt (上次連上的 AP 與 DHCP 租約，供快速重連)。
+# 修改只標記 dirty，由 commit() 合併寫入；寫檔先寫 .tmp 再改名，
+# 斷電時不會留下寫到一半的 alarm.json。
+import os
+import json
+
+WIFI_FILE = "wifi.txt"
+ALARM_FILE = "alarm.json"
+USER_ID_FILE = "user_id.txt"
+CLOCK_FILE = "clock.txt"
+LINK_FILE = "link.txt"
+
+DIRTY_WIFI = 1
+DIRTY_ALARM = 2
+DIRTY_USER = 4
+DIRTY_CLOCK = 8
+DIRTY_LINK = 16
+
+
+def default_dose():
+    return {"hour": 8, "minute": 0, "days": [False]*7, "box": 0}
+
+
+def default_alarm():
+    return {"enabled": False, "doses": [default_dose()]}
+
+
+def migrate_alarm(alarm):
+    # 舊版 alarm.json 只有單一 hour / minute / days，轉成 doses 清單
+    if "doses" not in alarm:
+        dose = default_dose()
+        for k in ("hour", "minute", "days"):
+            if k in alarm: dose[k] = alarm.pop(k)
+        alarm["doses"] = [dose]
+    if not alarm["doses"]: alarm["doses"] = [default_dose()]
+    alarm.setdefault("enabled", False)
+
+
+def _read(name):
+    # 主檔不見時，用上次改名前留下的 .tmp 補救
+    for path in (name, name + ".tmp"):
+        try:
+            with open(path, "r") as f: return f.read()
+        except OSError: pass
+    return None
+
+
+def atomic_write(name, data):
+    tmp = name + ".tmp"
+    with open(tmp, "w") as f: f.write(data)
+    try:
+        os.rename(tmp, name)
+    except OSError:
+        # FAT 不能覆蓋既有檔案，先刪再改名 (載入時會用 .tmp 補救)
+        os.remove(name); os.rename(tmp, name)
+
+
+class ConfigStore:
+    def __init__(self, on_dirty=None):
+        self.wifi = (None, None)
+        self.alarm = default_alarm()
+        self.user_id = None
+        self.clock = 0          # 最後可信的 epoch 秒，0 = 從未校時
+        self.drift = 0.0        # RTC 漂移率 (ppm)
+        self.clock_ok = False   # clock 寫入時 RTC 是否已校時 (False = 還原後尚未校時)
+        self.link = None        # (ssid, bssid hex, 頻道, ip, mask, gw, dns, 取得租約的 epoch 秒)
+        self.dirty = 0
+        self.flash_writes = 0
+        self.on_dirty = on_dirty
+
+    def load(self):
+        data = _read(WIFI_FILE)
+        if data:
+            lines = data.split("\n")
+            if len(lines) >= 2: self.wifi = (lines[0].strip(), lines[1].strip())
+
+        data = _read(ALARM_FILE)
+        if data:
+            try:
+                alarm = json.loads(data)
+                migrate_alarm(alarm)
+                # 就地更新，讓外部持有的 dict 參考不失效
+                self.alarm.clear(); self.alarm.update(alarm)
+            except (ValueError, TypeError, AttributeError): pass
+
+        data = _read(USER_ID_FILE)
+        if data: self.user_id = data.strip() or None
+
+        data = _read(CLOCK_FILE)
+        if data:
+            # 時間,漂移率,已校時 (舊版只有時間)
+            f = data.strip().split(",")
+            try:
+                self.clock = int(f[0])
+                if len(f) >= 3: self.drift = float(f[1]); self.clock_ok = f[2] == "1"
+            except ValueError: pass
+
+        data = _read(LINK_FILE)
+        if data:
+            # 第一行 SSID (可能含逗號)，第二行其餘欄位
+            try:
+                ssid, rest = data.split("\n", 1)
+                f = rest.strip().split(",")
+                self.link = (ssid, f[0], int(f[1]), f[2], f[3], f[4], f[5], int(f[6]))
+            except (ValueError, IndexError): pass
+        return self.wifi
+
+    def _mark(self, bit):
+        was_clean = not self.dirty
+        self.dirty |= bit
+        if was_clean and self.on_dirty: self.on_dirty()
+
+    def set_wifi(self, ssid, pwd):
+        if self.wifi == (ssid, pwd): return
+        self.wifi = (ssid, pwd)
+        self._mark(DIRTY_WIFI)
+
+    def set_user_id(self, uid):
+        if self.user_id == uid: return
+        self.user_id = uid
+        self._mark(DIRTY_USER)
+
+    def set_clock(self, t, drift, ok):
+        self.clock = int(t); self.drift = drift; self.clock_ok = ok
+        self._mark(DIRTY_CLOCK)
+
+    def set_link(self, link):
+        if self.link == link: return
+        self.link = link
+        self._mark(DIRTY_LINK)
+
+    def mark_alarm(self):
+        # alarm dict 由呼叫端直接修改，改完呼叫這裡
+        self._mark(DIRTY_ALARM)
+
+    def commit(self):
+        d = self.dirty
+        if not d: return
+        self.dirty = 0
+        try:
+            if d & DIRTY_WIFI:
+                atomic_write(WIFI_FILE, f"{self.wifi[0]}\n{self.wifi[1]}"); self.flash_writes += 1
+                d &= ~DIRTY_WIFI
+            if d & DIRTY_ALARM:
+                atomic_write(ALARM_FILE, json.dumps(self.alarm)); self.flash_writes += 1
+                d &= ~DIRTY_ALARM
+            if d & DIRTY_USER:
+                atomic_write(USER_ID_FILE, self.user_id or ""); self.flash_writes += 1
+                d &= ~DIRTY_USER
+            if d & DIRTY_CLOCK:
+                data = f"{self.clock},{self.drift:.2f},{1 if self.clock_ok else 0}"
+                atomic_write(CLOCK_FILE, data); self.flash_writes += 1
+                d &= ~DIRTY_CLOCK
+            if d & DIRTY_LINK:
+                l = self.link
+                data = (l[0] + "\n" + ",".join(str(v) for v in l[1:])) if l else ""
+                atomic_write(LINK_FILE, data); self.flash_writes += 1
+                d &= ~DIRTY_LINK
+        except OSError:
+            # 沒寫成功的留到下次
+            self.dirty |= d
+            raise
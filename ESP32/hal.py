@@ -0,0 +1,114 @@
+# ==========================================
+# 硬體抽象層 (裝置)
+# ==========================================
+# app.py 只透過 Board 取得硬體：腳位、PWM、OLED 的 I2C、WLAN、計時器、SNTP / RTC、HTTP 客戶端、light sleep、
+# 看門狗 / 重置 / RTC 記憶體。
+# 電腦上由 host/sim.py 的 SimBoard 提供同名方法，韌體不需修改即可在 CPython 執行。
+from machine import Pin, SoftI2C, Timer, PWM
+import machine
+import time
+import socket
+import struct
+import network
+import ssd1306py
+from httpc import HttpClient
+
+NTP_HOST = "pool.ntp.org"
+NTP_TIMEOUT_S = 1
+# NTP 從 1900 年起算；MicroPython 的 epoch 可能是 2000 年 (與 ntptime 相同的判斷)
+NTP_DELTA = 3155673600 if time.gmtime(0)[0] == 2000 else 2208988800
+
+
+class Board:
+    def pin_in(self, n):
+        return Pin(n, Pin.IN, Pin.PULL_UP)
+
+    def pin_out(self, n):
+        return Pin(n, Pin.OUT)
+
+    def pwm(self, n):
+        # 蜂鳴器：LEDC PWM，duty 0 = 靜音
+        return PWM(Pin(n), freq=2000, duty_u16=0)
+
+    def display_i2c(self, scl, sda, width, height):
+        # ssd1306py 只負責送初始化序列，之後畫面由 render.Screen 直接寫 I2C
+        i2c = SoftI2C(scl=Pin(scl), sda=Pin(sda))
+        try: ssd1306py.init_i2c(scl, sda, width, height, i2c=i2c)
+        except:
+            try: ssd1306py.init_i2c(scl, sda, width, height)
+            except: pass
+        return i2c
+
+    def timer(self, n):
+        return Timer(n)
+
+    def wlan(self):
+        return network.WLAN(network.STA_IF)
+
+    # ---- RTC (UTC，毫秒) ----
+    def time_ms(self):
+        try: return time.time_ns() // 1000000
+        except AttributeError: return time.time() * 1000
+
+    def set_time_ms(self, ms):
+        # 與 ntptime.settime 相同的方式寫入 RTC，最後一欄是微秒
+        tm = time.gmtime(ms // 1000)
+        machine.RTC().datetime((tm[0], tm[1], tm[2], tm[6] + 1, tm[3], tm[4], tm[5], ms % 1000 * 1000))
+
+    def ntp_sample(self):
+        # 一次 SNTP 請求，回傳 (伺服器時間 - RTC 的毫秒差, 往返 ms)；逾時丟出 OSError
+        addr = getattr(self, "_ntp_addr", None)
+        if addr is None: addr = self._ntp_addr = socket.getaddrinfo(NTP_HOST, 123)[0][-1]
+        q = bytearray(48); q[0] = 0x1B
+        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            s.settimeout(NTP_TIMEOUT_S)
+            t0 = time.ticks_ms()
+            s.sendto(q, addr)
+            msg = s.recv(48)
+            rtt = time.ticks_diff(time.ticks_ms(), t0)
+            local = self.time_ms()
+        finally:
+            s.close()
+        # 伺服器送出時間 (transmit timestamp) + 單程延遲 ≈ 收到時的真實時間
+        secs, frac = struct.unpack("!II", msg[40:48])
+        server = (secs - NTP_DELTA) * 1000 + (frac * 1000 >> 32) + rtt // 2
+        return server - local, rtt
+
+    def http_client(self, keep_alive):
+        # get(url, headers) 回傳的物件需有 status_code / json() / close()
+        return HttpClient(keep_alive=keep_alive)
+
+    def wake_on_input(self, button, clk):
+        try:
+            import esp32
+            esp32.wake_on_ext0(pin=button, level=esp32.WAKEUP_ALL_LOW)
+            esp32.wake_on_ext1(pins=(clk,), level=esp32.WAKEUP_ALL_LOW)
+        except Exception as e:
+            print("無法設定喚醒腳位:", e)
+
+    def woke_by_input(self):
+        return machine.wake_reason() in (machine.EXT0_WAKE, machine.EXT1_WAKE)
+
+    def lightsleep(self, ms):
+        machine.lightsleep(ms)
+
+    # ---- 看門狗 / 重置 ----
+    def wdt(self, timeout_ms):
+        # 啟用後無法關閉；回傳的物件需有 feed()
+        return machine.WDT(timeout=timeout_ms)
+
+    def reset(self):
+        machine.reset()
+
+    def reset_cause(self):
+        c = machine.reset_cause()
+        for name, attr in (("power", "PWRON_RESET"), ("hard", "HARD_RESET"), ("wdt", "WDT_RESET"),
+                           ("deepsleep", "DEEPSLEEP_RESET"), ("soft", "SOFT_RESET")):
+            if c == getattr(machine, attr, None): return name
+        return "power"
+
+    # RTC 記憶體 (約 2 KB)：軟重置 / 看門狗重置後保留，斷電清除
+    def rtc_memory(self, data=None):
+        if data is None: return machine.RTC().memory()
+        machine.RTC().memory(data)
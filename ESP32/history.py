@@ -0,0 +1,170 @@
+# ==========================================
+# 服藥歷史 (flash 上的固定長度二進位環形檔)
+# ==========================================
+# 每筆事件 10 位元組：seq (uint32) / 時間 (unix 秒, uint32) / 種類<<4 | 藥格 / 來源<<5 | 時段
+# 檔案最多 SIZE 筆，第 seq 筆固定寫在 (seq - 1) % SIZE 的位置，滿了就覆蓋最舊的；
+# 每次只寫一筆 (10 位元組)，不重寫檔案。開機讀一次建立：
+#   - 下一個 seq (位置對不上 seq 的紀錄視為斷電寫壞，略過；結尾不滿一筆的部分忽略，
+#     下一筆固定寫在 (seq - 1) % SIZE 的位置，會把它蓋掉，之後的紀錄不會錯位)
+#   - 依當地日期的 RAM 索引 (最近 DAYS 天)：應服 / 按時服用 / 吃藥次數，
+#     今天 / 昨天有沒有吃藥是 O(1)，7 / 30 天服藥率只加總索引
+# 離線上傳 (journal.py) 直接從這裡依 seq 讀需要的幾筆，不必讀整個檔。
+import os
+import time
+import struct
+from array import array
+
+HISTORY_FILE = "history.bin"
+REC = 10
+SIZE = 1024                 # 約 10 KB；一天 2 個時段約 4~5 筆，可存半年以上
+DAYS = 32                   # RAM 索引天數 (30 天統計 + 今天)
+NO_SLOT = 31
+
+# 種類
+K_TAKE = 1                  # 吃藥 (開蓋 / 響鈴時按鈕 / 選單 Log Now)
+K_ALARM = 2                 # 鬧鐘響 (時段到期)
+K_REPEAT = 3                # 沒人回應，貪睡後再響
+K_SKIP = 4                  # 時段到期但已提早吃過，不響
+K_MISS = 5                  # 響滿仍沒人回應
+K_LATE = 6                  # 時段到期時忙碌 / 關機，超過補響時間沒響
+# 來源 (K_TAKE)
+SRC_LID = 0
+SRC_BUTTON = 1
+SRC_MENU = 2
+
+# ESP32 的 time.time() 從 2000-01-01 起算，紀錄一律存 unix 秒
+EPOCH_OFFSET = 946684800 if time.gmtime(0)[0] == 2000 else 0
+
+
+def pack(buf, off, seq, ts, kind, box, src, slot):
+    struct.pack_into("<IIBB", buf, off, seq, ts, kind << 4 | box & 15, src << 5 | slot & 31)
+
+
+def unpack(buf, off):
+    # 回傳 (seq, ts, 種類, 藥格, 來源, 時段)
+    seq, ts, a, b = struct.unpack_from("<IIBB", buf, off)
+    return seq, ts, a >> 4, a & 15, b >> 5, b & 31
+
+
+class History:
+    def __init__(self, utc_offset=0, path=HISTORY_FILE, size=SIZE):
+        self.path = path
+        self.size = size
+        self.utc_offset = utc_offset
+        self.next_seq = 1
+        self.last_upload = 0        # 最後一筆要上傳 (吃藥 / 鬧鐘) 的 seq
+        self.hold = 0               # 上傳已確認到此 seq，覆蓋更新的紀錄算遺失
+        self.dropped = 0
+        self.rec = bytearray(REC)
+        # 每天一格：day % DAYS；day 不符就是別天 (或還沒有紀錄)
+        self.i_day = array('i', [-1] * DAYS)
+        self.i_due = bytearray(DAYS)
+        self.i_ok = bytearray(DAYS)
+        self.i_take = bytearray(DAYS)
+        self._load()
+
+    def day(self, ts):
+        # unix 秒 -> 當地日期編號
+        return (ts + self.utc_offset) // 86400
+
+    def today(self):
+        return self.day(int(time.time()) + EPOCH_OFFSET)
+
+    def _load(self):
+        try: n = os.stat(self.path)[6] // REC
+        except OSError: return
+        buf = bytearray(REC * 32)
+        mv = memoryview(buf)
+        pos = 0
+        with open(self.path, "rb") as f:
+            while pos < n:
+                got = f.readinto(mv[:min(32, n - pos) * REC]) // REC
+                if not got: break
+                for k in range(got):
+                    r = unpack(buf, k * REC)
+                    if r[0] < 1 or (r[0] - 1) % self.size != pos + k or not K_TAKE <= r[2] <= K_LATE: continue
+                    if r[0] >= self.next_seq: self.next_seq = r[0] + 1
+                    if r[2] in (K_TAKE, K_ALARM, K_REPEAT) and r[0] > self.last_upload: self.last_upload = r[0]
+                    self._index(r[1], r[2], r[5])
+                pos += got
+
+    def _index(self, ts, kind, slot):
+        d = self.day(ts)
+        i = d % DAYS
+        if self.i_day[i] != d:
+            if self.i_day[i] > d: return    # 比索引還舊
+            self.i_day[i] = d
+            self.i_due[i] = 0; self.i_ok[i] = 0; self.i_take[i] = 0
+        # K_ALARM / K_SKIP / K_LATE 各代表一次到期；按時 = 提早吃過或回應響鈴
+        if kind == K_ALARM or kind == K_SKIP or kind == K_LATE:
+            self.i_due[i] = min(255, self.i_due[i] + 1)
+        if kind == K_SKIP or (kind == K_TAKE and slot != NO_SLOT):
+            self.i_ok[i] = min(255, self.i_ok[i] + 1)
+        if kind == K_TAKE: self.i_take[i] = min(255, self.i_take[i] + 1)
+
+    def add(self, kind, box=0, src=0, slot=NO_SLOT, ts=None):
+        # 寫入一筆並更新索引，回傳 seq；slot 為時段索引 (NO_SLOT = 與鬧鐘無關)
+        if ts is None: ts = int(time.time()) + EPOCH_OFFSET
+        seq = self.next_seq
+        self.next_seq += 1
+        pack(self.rec, 0, seq, ts, kind, box, src, slot)
+        if seq > self.size and seq - self.size > self.hold: self.dropped += 1
+        # 不用 "ab"：斷電留下的半筆會讓之後的附加全部錯位
+        try: f = open(self.path, "r+b")
+        except OSError: f = open(self.path, "wb")
+        with f:
+            f.seek((seq - 1) % self.size * REC); f.write(self.rec)
+        if kind in (K_TAKE, K_ALARM, K_REPEAT): self.last_upload = seq
+        self._index(ts, kind, slot)
+        return seq
+
+    def read(self, first, limit, kinds=None):
+        # 從 first 起依 seq 讀最多 limit 筆 (只讀需要的位置)；已被覆蓋的從最舊的開始
+        first = max(first, self.next_seq - self.size, 1)
+        out = []
+        if first >= self.next_seq: return out
+        rec = self.rec
+        with open(self.path, "rb") as f:
+            seq = first
+            f.seek((seq - 1) % self.size * REC)
+            while seq < self.next_seq and len(out) < limit:
+                if (seq - 1) % self.size == 0: f.seek(0)
+                if f.readinto(rec) != REC: break
+                r = unpack(rec, 0)
+                seq += 1
+                if r[0] != seq - 1: continue
+                if kinds is None or r[2] in kinds: out.append(r)
+        return out
+
+    # ---- 查詢 (只用 RAM 索引) ----
+    def _slot(self, d):
+        i = d % DAYS
+        return i if self.i_day[i] == d else -1
+
+    def taken(self, d):
+        i = self._slot(d)
+        return i >= 0 and self.i_take[i] > 0
+
+    def day_counts(self, d):
+        # (按時服用, 應服)
+        i = self._slot(d)
+        return (self.i_ok[i], self.i_due[i]) if i >= 0 else (0, 0)
+
+    def summary(self, d, n):
+        # 含 d 在內往前 n 天 (n <= DAYS) 的 (按時服用, 應服)
+        ok = due = 0
+        for k in range(min(n, DAYS)):
+            i = self._slot(d - k)
+            if i >= 0: ok += self.i_ok[i]; due += self.i_due[i]
+        return ok, due
+
+    def streak(self, d):
+        # 連續全部按時服用的天數 (今天還沒吃完不中斷)
+        n = 0
+        for k in range(DAYS):
+            ok, due = self.day_counts(d - k)
+            if ok < due:
+                if k: break
+                continue
+            if due: n += 1
+        return n
@@ -0,0 +1,394 @@
+# ==========================================
+# HTTP 客戶端 (保持連線 + TLS session 重用)
+# ==========================================
+# 取代 urequests.get：
+#   1. 同一個 host 的 socket 在一串請求之間保持連線 (HTTP/1.1 keep-alive)，
+#      省下每次 TLS 握手的 CPU 時間與數十 KB heap。
+#   2. 需要重新連線時，若 ssl 模組支援 session (CPython) 就恢復上一次的 TLS session；
+#      MicroPython 的 ssl 沒有 session API，只能靠保持連線。
+#   3. Apps Script 每次都 302 轉址到 script.googleusercontent.com，
+#      轉址目標的連線同樣留在連線池，下一次直接沿用。
+#   4. 回應以串流讀取 (Content-Length / chunked)，readinto() 一次只用固定大小的緩衝區。
+#   5. 非阻塞：socket 設為 setblocking(False)，連線、TLS 握手、讀寫遇到「會阻塞」就
+#      await sleep_ms(POLL_MS) 讓出 CPU 再試，等待伺服器 (數秒) 期間鬧鐘、旋鈕、畫面照常執行；
+#      每個步驟超過 timeout 秒沒有進展丟出 OSError(ETIMEDOUT)。只有 DNS 查詢會阻塞 (結果會快取)。
+# keep_alive=False 時送 Connection: close 並在每次回應後斷線，與原本 urequests 相同。
+# 沿用閒置連線前先非阻塞讀一次：伺服器已關閉 (讀到結尾 / 錯誤) 就丟掉換新的，不必等送出失敗；
+# 送出後才發現連線已壞，仍自動重連一次 (GET 可安全重送)。
+import socket
+import select
+import json
+import runtime as rt
+try:
+    import ssl
+except ImportError:
+    import ussl as ssl
+try:
+    import errno
+except ImportError:
+    import uerrno as errno
+
+MAX_REDIRECTS = 3
+MAX_CONNS = 2           # script.google.com + 轉址目標
+BUF_SIZE = 512
+DRAIN_LIMIT = 4096      # 關閉回應時，剩餘內容超過這個量就直接斷線，不讀完
+TIMEOUT_S = 10
+POLL_MS = 10            # socket 還沒就緒時多久再試一次 (比網路往返短很多)
+
+# CPython 的 SSL socket 以例外表示「需要再讀 / 寫」；MicroPython 回傳 None
+_WANT = tuple(getattr(ssl, n) for n in ("SSLWantReadError", "SSLWantWriteError") if hasattr(ssl, n))
+
+
+def _blocked(e):
+    # 非阻塞操作還沒辦法完成 (不是錯誤)
+    return isinstance(e, _WANT) or (len(e.args) > 0 and e.args[0] in (errno.EAGAIN, errno.EINPROGRESS))
+
+
+def _handshake(s):
+    s.do_handshake()
+    return True
+
+
+def split_url(url):
+    # -> (https, host, port, path)
+    proto, _, rest = url.partition("://")
+    host, _, path = rest.partition("/")
+    https = proto == "https"
+    port = 443 if https else 80
+    if ":" in host:
+        host, p = host.split(":", 1)
+        port = int(p)
+    return https, host, port, "/" + path
+
+
+class Conn:
+    def __init__(self, client, https, host, port):
+        self.client = client
+        self.key = (https, host, port)
+        self.s = None
+        self.buf = bytearray(BUF_SIZE)
+        self.mv = memoryview(self.buf)
+        self.pos = 0
+        self.end = 0
+        self.requests = 0
+
+    async def open(self):
+        # 非阻塞連線 (+ TLS 握手)；失敗時關閉 socket 再丟出
+        https, host, port = self.key
+        client = self.client
+        s = socket.socket()
+        try:
+            s.setblocking(False)
+            try: s.connect(client._addr(host, port))
+            except OSError as e:
+                if not _blocked(e): raise
+            await self._writable(s)
+            if https:
+                s = client._wrap(s, host)
+                s.setblocking(False)
+                # CPython 在這裡完成握手；MicroPython 沒有 do_handshake，握手在第一次讀寫時進行
+                if hasattr(s, "do_handshake"): await self.io(_handshake, s)
+                if getattr(s, "session_reused", False): client.resumed += 1
+        except Exception:
+            s.close()
+            raise
+        self.s = s
+        self._recv = s.readinto if hasattr(s, "readinto") else s.recv_into
+        self._send = s.write if hasattr(s, "write") else s.send
+
+    async def _writable(self, s):
+        # 等非阻塞 connect 完成 (socket 可寫)；被拒絕 / 重置時 poll 回報 POLLERR / POLLHUP
+        p = select.poll()
+        p.register(s, select.POLLOUT)
+        deadline = rt.ticks_add(rt.ticks_ms(), self.client.timeout * 1000)
+        while True:
+            ev = p.poll(0)
+            if ev:
+                if ev[0][1] & (select.POLLERR | select.POLLHUP): raise OSError(errno.ECONNRESET)
+                return
+            if rt.ticks_diff(deadline, rt.ticks_ms()) <= 0: raise OSError(errno.ETIMEDOUT)
+            await rt.sleep_ms(POLL_MS)
+
+    async def io(self, fn, arg):
+        # 呼叫 fn(arg) 直到完成：會阻塞 (None / EAGAIN / SSL want) 就讓出 CPU，POLL_MS 後再試
+        deadline = rt.ticks_add(rt.ticks_ms(), self.client.timeout * 1000)
+        while True:
+            try:
+                n = fn(arg)
+                if n is not None: return n
+            except OSError as e:
+                if not _blocked(e): raise
+            if rt.ticks_diff(deadline, rt.ticks_ms()) <= 0: raise OSError(errno.ETIMEDOUT)
+            await rt.sleep_ms(POLL_MS)
+
+    def alive(self):
+        # 閒置中的連線：非阻塞讀一次，「會阻塞」才表示還連著；讀到結尾 (伺服器已關閉)、錯誤或多餘資料都不能沿用
+        if self.pos < self.end: return False
+        try: n = self._recv(self.buf)
+        except OSError as e: return _blocked(e)
+        return n is None
+
+    async def write(self, data):
+        mv = memoryview(data)
+        while mv:
+            n = await self.io(self._send, mv)
+            mv = mv[n:]
+        self.client.bytes_out += len(data)
+
+    async def fill(self):
+        n = await self.io(self._recv, self.buf)
+        if not n: raise OSError("connection closed")
+        self.pos = 0
+        self.end = n
+        self.client.bytes_in += n
+
+    async def readline(self):
+        # 讀一行 (含 \r\n)，只用在狀態列與表頭
+        line = bytearray()
+        buf = self.buf
+        while True:
+            if self.pos >= self.end: await self.fill()
+            i = self.pos
+            while i < self.end and buf[i] != 10: i += 1
+            if i < self.end:
+                line += self.mv[self.pos:i + 1]
+                self.pos = i + 1
+                return bytes(line)
+            line += self.mv[self.pos:self.end]
+            self.pos = self.end
+            if len(line) > 2048: raise OSError("header too long")
+
+    async def readinto(self, mv):
+        # 至少讀 1 byte，最多 len(mv)
+        if self.pos >= self.end:
+            # 緩衝區空了：大的讀取直接進呼叫端的緩衝區
+            if len(mv) >= BUF_SIZE:
+                n = await self.io(self._recv, mv)
+                if not n: raise OSError("connection closed")
+                self.client.bytes_in += n
+                return n
+            await self.fill()
+        n = min(len(mv), self.end - self.pos)
+        mv[:n] = self.mv[self.pos:self.pos + n]
+        self.pos += n
+        return n
+
+    def close(self):
+        if self.s is None: return
+        self.client._save_session(self)
+        try: self.s.close()
+        except Exception: pass
+        self.s = None
+
+
+class Response:
+    def __init__(self, client, conn):
+        self.client = client
+        self.conn = conn
+
+    async def head(self):
+        # 讀狀態列與表頭
+        conn = self.conn
+        client = self.client
+        line = await conn.readline()
+        parts = line.split(None, 2)
+        if len(parts) < 2: raise OSError("bad status line")
+        self.status_code = int(parts[1])
+        self.location = None
+        self.keep = client.keep_alive and not line.startswith(b"HTTP/1.0")
+        self._left = None       # Content-Length 剩餘量；None = 讀到斷線
+        self._chunked = False
+        self._chunk_started = False
+        while True:
+            h = await conn.readline()
+            if h in (b"\r\n", b"\n"): break
+            k, _, v = h.partition(b":")
+            k = k.strip().lower(); v = v.strip()
+            if k == b"content-length": self._left = int(v)
+            elif k == b"transfer-encoding": self._chunked = b"chunked" in v.lower()
+            elif k == b"connection" and v.lower() == b"close": self.keep = False
+            elif k == b"location": self.location = v.decode()
+        if self._chunked: self._left = 0
+        elif self._left is None: self.keep = False
+        self.done = not self._chunked and self._left == 0
+
+    async def _next_chunk(self):
+        c = self.conn
+        if self._chunk_started: await c.readline()   # 上一段結尾的 \r\n
+        self._chunk_started = True
+        size = int((await c.readline()).split(b";")[0].strip(), 16)
+        if size == 0:
+            # 結尾 (可能帶 trailer)
+            while await c.readline() not in (b"\r\n", b"\n"): pass
+            self.done = True
+        self._left = size
+
+    async def readinto(self, buf):
+        # 串流讀取內容，回傳讀到的 byte 數，0 = 結束
+        if self.done: return 0
+        mv = memoryview(buf)
+        if self._chunked and self._left == 0:
+            await self._next_chunk()
+            if self.done: return 0
+        want = len(mv) if self._left is None else min(len(mv), self._left)
+        try:
+            n = await self.conn.readinto(mv[:want])
+        except OSError:
+            if self._left is None:
+                # 沒有長度：讀到斷線就是結尾
+                self.done = True
+                return 0
+            raise
+        if self._left is not None:
+            self._left -= n
+            if self._left == 0 and not self._chunked: self.done = True
+        return n
+
+    async def read(self, limit=-1):
+        out = bytearray()
+        buf = bytearray(BUF_SIZE)
+        while limit < 0 or len(out) < limit:
+            n = await self.readinto(buf)
+            if not n: break
+            out += buf[:n]
+        return bytes(out)
+
+    async def text(self):
+        return (await self.read()).decode()
+
+    async def json(self):
+        return json.loads(await self.read())
+
+    async def close(self):
+        if self.conn is None: return
+        # 內容還沒讀完：不多就讀完好沿用連線，太多就斷線
+        if not self.done and self.keep:
+            buf = bytearray(BUF_SIZE)
+            left = DRAIN_LIMIT
+            try:
+                while left > 0 and not self.done:
+                    n = await self.readinto(buf)
+                    if not n: break
+                    left -= n
+            except OSError: self.keep = False
+            if not self.done: self.keep = False
+        self.client._release(self.conn, self.keep)
+        self.conn = None
+
+
+class HttpClient:
+    def __init__(self, keep_alive=True, resume=True, ssl_context=None, max_conns=MAX_CONNS, timeout=TIMEOUT_S):
+        self.keep_alive = keep_alive
+        self.resume = resume
+        if ssl_context is None and hasattr(ssl, "create_default_context"):
+            ssl_context = ssl.create_default_context()
+        self.ssl_context = ssl_context
+        self.max_conns = max_conns
+        self.timeout = timeout
+        self.pool = []          # 閒置中的 Conn，最新的在最後
+        self.addrs = {}         # (host, port) -> getaddrinfo 結果
+        self.sessions = {}      # host -> TLS session
+        # 統計
+        self.requests = 0
+        self.handshakes = 0
+        self.resumed = 0
+        self.reused = 0
+        self.redirects = 0
+        self.stale = 0          # 沿用前發現已被伺服器關閉的閒置連線
+        self.bytes_out = 0
+        self.bytes_in = 0
+
+    # ---- 連線 ----
+    def _addr(self, host, port):
+        a = self.addrs.get((host, port))
+        if a is None:
+            a = socket.getaddrinfo(host, port)[0][-1]
+            self.addrs[(host, port)] = a
+        return a
+
+    def _wrap(self, s, host):
+        # 只包裝不握手 (非阻塞握手由 Conn.open / 第一次讀寫完成)
+        ctx = self.ssl_context
+        self.handshakes += 1
+        if ctx is None:
+            # MicroPython：與 urequests 相同的呼叫方式
+            return ssl.wrap_socket(s, server_hostname=host, do_handshake=False)
+        sess = self.sessions.get(host) if self.resume else None
+        if sess is not None:
+            try:
+                return ctx.wrap_socket(s, server_hostname=host, session=sess, do_handshake_on_connect=False)
+            except TypeError: pass
+        return ctx.wrap_socket(s, server_hostname=host, do_handshake_on_connect=False)
+
+    def _save_session(self, conn):
+        if not self.resume or conn.s is None: return
+        sess = getattr(conn.s, "session", None)
+        if sess is not None: self.sessions[conn.key[1]] = sess
+
+    def _take(self, key):
+        # 取出同一個 host 的閒置連線；已被伺服器關閉的直接丟掉
+        i = len(self.pool)
+        while i:
+            i -= 1
+            c = self.pool[i]
+            if c.key != key: continue
+            self.pool.pop(i)
+            if c.alive(): return c
+            self.stale += 1
+            c.close()
+        return None
+
+    def _release(self, conn, keep):
+        if not keep:
+            conn.close(); return
+        self.pool.append(conn)
+        while len(self.pool) > self.max_conns: self.pool.pop(0).close()
+
+    def close(self):
+        # 關閉所有閒置連線 (一串請求結束後呼叫，釋放 TLS 佔用的 heap)
+        while self.pool: self.pool.pop().close()
+
+    # ---- 請求 ----
+    async def _request(self, url, headers):
+        https, host, port, path = split_url(url)
+        key = (https, host, port)
+        conn = self._take(key)
+        req = "GET %s HTTP/1.1\r\nHost: %s\r\nConnection: %s\r\n" % (
+            path, host, "keep-alive" if self.keep_alive else "close")
+        if headers:
+            for k in headers: req += "%s: %s\r\n" % (k, headers[k])
+        req = (req + "\r\n").encode()
+        while True:
+            fresh = conn is None
+            if fresh:
+                conn = Conn(self, https, host, port)
+                await conn.open()
+            else: self.reused += 1
+            try:
+                await conn.write(req)
+                conn.requests += 1
+                resp = Response(self, conn)
+                await resp.head()
+                return resp
+            except OSError:
+                conn.close()
+                # 保持中的連線被伺服器關掉：換一條新的再送一次
+                if fresh: raise
+                conn = None
+
+    async def get(self, url, headers=None):
+        self.requests += 1
+        for _ in range(MAX_REDIRECTS + 1):
+            resp = await self._request(url, headers)
+            if resp.status_code not in (301, 302, 303, 307, 308) or not resp.location: return resp
+            loc = resp.location
+            await resp.close()
+            self.redirects += 1
+            if loc.startswith("/"):
+                https, host, port, _ = split_url(url)
+                loc = "%s://%s:%d%s" % ("https" if https else "http", host, port, loc)
+            url = loc
+        return resp
+
+    def report(self):
+        return f"req={self.requests} handshakes={self.handshakes} resumed={self.resumed} reused={self.reused} stale={self.stale} redirects={self.redirects} out={self.bytes_out}B in={self.bytes_in}B"
@@ -0,0 +1,111 @@
+# ==========================================
+# 輸入事件佇列 (旋鈕正交解碼 + 按鍵)
+# ==========================================
+# 中斷處理只做兩件事：更新解碼狀態、把精簡事件放進預先配置的環形緩衝區。
+# 狀態機 (選單、輸入密碼、連 WiFi ...) 全部在主程式的 task 裡消化事件。
+#
+# 旋鈕：CLK / DT 兩腳都綁雙邊緣中斷，用 4x4 轉換表解碼。
+# 靜止位置為 CLK=1, DT=1；回到靜止位置且累積至少半格才算一格，
+# 彈跳造成的來回抵銷，漏掉一兩個邊緣也不會反向。
+from runtime import ticks_ms, ticks_diff
+
+EV_CW = 1        # 順時針一格 (+1)
+EV_CCW = 2       # 逆時針一格 (-1)
+EV_PRESS = 3     # 按鍵按下
+
+QUEUE_SIZE = 64
+PRESS_DEBOUNCE_MS = 200
+REST = 0b11
+
+# index = (上一個 AB << 2) | 目前 AB，A = CLK、B = DT
+# CLK 先下降 (11 -> 01 -> 00 -> 10 -> 11) 為 -1，與原本 rotary_handler 的方向一致
+_TABLE = (0, 1, -1, 0,
+          -1, 0, 0, 1,
+          1, 0, 0, -1,
+          0, -1, 1, 0)
+
+
+class InputQueue:
+    def __init__(self, size=QUEUE_SIZE):
+        self.size = size
+        self.q_kind = bytearray(size)
+        self.q_dt = bytearray(size)     # 距離上一格的毫秒數 (上限 255)，給加速用
+        self.head = 0
+        self.tail = 0
+        self.dropped = 0
+        self.notify = None
+
+    def push(self, kind, dt=255):
+        # 單一生產者 (中斷) / 單一消費者 (task)：滿了就丟新事件，不動 tail
+        nxt = (self.head + 1) % self.size
+        if nxt == self.tail:
+            self.dropped += 1
+            return
+        self.q_kind[self.head] = kind
+        self.q_dt[self.head] = dt if dt < 255 else 255
+        self.head = nxt
+        if self.notify: self.notify()
+
+    def get(self):
+        # 回傳 (kind, dt)，沒有事件回傳 None
+        if self.tail == self.head: return None
+        i = self.tail
+        ev = (self.q_kind[i], self.q_dt[i])
+        self.tail = (i + 1) % self.size
+        return ev
+
+
+class Encoder:
+    def __init__(self, clk, dt, queue):
+        self.clk = clk
+        self.dt = dt
+        self.queue = queue
+        self.ab = (clk.value() << 1) | dt.value()
+        self.acc = 0
+        self.last_step = ticks_ms()
+        self.steps = 0
+
+    def attach(self):
+        trig = self.clk.IRQ_FALLING | self.clk.IRQ_RISING
+        self.clk.irq(trigger=trig, handler=self.edge)
+        self.dt.irq(trigger=trig, handler=self.edge)
+
+    def edge(self, pin=None):
+        ab = (self.clk.value() << 1) | self.dt.value()
+        if ab == self.ab: return
+        self.acc += _TABLE[(self.ab << 2) | ab]
+        self.ab = ab
+        if ab == REST:
+            acc = self.acc
+            self.acc = 0
+            if -2 < acc < 2: return
+            now = ticks_ms()
+            d = ticks_diff(now, self.last_step)
+            self.last_step = now
+            self.steps += 1
+            self.queue.push(EV_CW if acc > 0 else EV_CCW, d)
+
+
+class Button:
+    def __init__(self, pin, queue, debounce_ms=PRESS_DEBOUNCE_MS):
+        self.pin = pin
+        self.queue = queue
+        self.debounce_ms = debounce_ms
+        self.last = None
+
+    def attach(self):
+        self.pin.irq(trigger=self.pin.IRQ_FALLING, handler=self.edge)
+
+    def edge(self, pin=None):
+        if self.pin.value() != 0: return  # 放開時的彈跳
+        now = ticks_ms()
+        if self.last is not None and ticks_diff(now, self.last) < self.debounce_ms: return
+        self.last = now
+        self.queue.push(EV_PRESS)
+
+
+def accel(dt):
+    # 轉得越快一格代表越多步 (只用在選項很多的畫面)
+    if dt < 20: return 4
+    if dt < 50: return 2
+    return 1
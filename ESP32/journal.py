@@ -0,0 +1,76 @@
+# ==========================================
+# 離線事件上傳 (資料在 history.bin)
+# ==========================================
+# 吃藥 / 鬧鐘事件寫入 history.py 的環形檔，網路恢復後由背景批次上傳；
+# 這裡只記錄已確認到哪個 seq，每次依 seq 從環形檔讀出需要的幾筆。
+# 中繼檔格式：<journal id> <已確認 seq>
+# seq 單調遞增 (中間的 K_SKIP / K_MISS 等不上傳，跳號無妨)，後端以 (journal id, seq) 去除重送的事件。
+import os
+from history import K_TAKE, K_ALARM, K_REPEAT
+
+META_FILE = "journal.meta"
+BATCH_SIZE = 16        # 每次 HTTP 最多帶幾筆
+UPLOAD_KINDS = (K_TAKE, K_ALARM, K_REPEAT)
+
+
+def _exists(name):
+    try:
+        os.stat(name)
+        return True
+    except OSError:
+        return False
+
+
+def action_of(rec):
+    # 環形檔紀錄 -> 後端的 action (eat / eat:藥格 / notify_alarm)
+    if rec[2] != K_TAKE: return 'notify_alarm'
+    return f'eat:{rec[3]}' if rec[3] else 'eat'
+
+
+class Journal:
+    def __init__(self, hist, meta=META_FILE):
+        self.hist = hist
+        self.meta = meta
+        self.jid = None
+        self.acked = 0
+        self._load()
+        hist.hold = self.acked
+
+    def _load(self):
+        if _exists(self.meta):
+            try:
+                with open(self.meta, "r") as f:
+                    jid, acked = f.read().split()
+                self.acked = int(acked); self.jid = jid
+            except Exception: pass
+        if not self.jid:
+            self.jid = "".join("%02x" % b for b in os.urandom(4))
+            self.acked = 0
+            self._save_meta()
+
+    def _save_meta(self):
+        with open(self.meta, "w") as f:
+            f.write(f"{self.jid} {self.acked}")
+
+    @property
+    def dropped(self):
+        return self.hist.dropped
+
+    def pending(self, limit=BATCH_SIZE):
+        # [(seq, action, unix 秒)]，只讀未確認的那一段
+        return [(r[0], action_of(r), r[1]) for r in self.hist.read(self.acked + 1, limit, UPLOAD_KINDS)]
+
+    def has_pending(self):
+        h = self.hist
+        return h.last_upload > self.acked and h.last_upload >= h.next_seq - h.size
+
+    def ack(self, seq):
+        if seq <= self.acked: return
+        self.acked = seq
+        self.hist.hold = seq
+        self._save_meta()
+
+
+def encode_batch(records):
+    # GET 參數用的精簡格式：seq.action.ts,seq.action.ts,...
+    return ",".join(f"{s}.{a}.{t}" for s, a, t in records)
@@ -0,0 +1,167 @@
+# ==========================================
+# 串流 JSON 取值 (記憶體用量固定)
+# ==========================================
+# 後端回應只需要少數頂層欄位 (status / userId / doses ...)。
+# JsonPicker 以固定大小的緩衝區分段讀取回應，逐 byte 掃描頂層物件：
+#   - 不需要的欄位只追蹤括號深度與字串，直接跳過，不配置記憶體
+#   - 需要的欄位把原始內容複製到預先配置的擷取緩衝區，結束後只對這一段 json.loads
+# 整個回應超過 limit、單一欄位超過 value_limit 或格式錯誤都丟出 ValueError。
+# 尖峰記憶體 = 讀取緩衝區 + 擷取緩衝區 + 取出的值，與回應總長度無關。
+import json
+
+BODY_LIMIT = 8192
+VALUE_LIMIT = 1024
+CHUNK = 128
+KEY_MAX = 32
+
+# 掃描狀態
+_OPEN = 0       # 等待 '{'
+_KEY = 1        # 等待鍵的 '"' 或 '}'
+_KEYSTR = 2     # 讀取鍵
+_COLON = 3      # 等待 ':'
+_VALUE = 4      # 掃描值
+_NEXT = 5       # 等待 ',' 或 '}'
+_DONE = 6
+
+_WS = b" \t\r\n"
+_SCALAR_END = b" \t\r\n,}]"
+
+
+class JsonPicker:
+    def __init__(self, limit=BODY_LIMIT, value_limit=VALUE_LIMIT, chunk=CHUNK):
+        self.limit = limit
+        self.buf = bytearray(chunk)
+        self.key = bytearray(KEY_MAX)
+        self.cap = bytearray(value_limit)
+        self.slots = []
+
+    def pick(self, resp, keys):
+        # resp 需有 readinto(buf)；回傳 {鍵: 值}，只含有出現的鍵
+        self._begin(keys)
+        while self.state != _DONE:
+            if not self._take(resp.readinto(self.buf)): break
+        return self._result(keys)
+
+    async def apick(self, resp, keys):
+        # 同 pick，resp.readinto 是 coroutine (httpc 的非阻塞回應)
+        self._begin(keys)
+        while self.state != _DONE:
+            if not self._take(await resp.readinto(self.buf)): break
+        return self._result(keys)
+
+    def _begin(self, keys):
+        self.want = [k.encode() for k in keys]
+        self.slots = [None] * len(keys)
+        self.found = [False] * len(keys)
+        self.total = 0
+        self._reset()
+
+    def _take(self, n):
+        if not n: return False
+        self.total += n
+        if self.total > self.limit: raise ValueError("body too large")
+        self._feed(self.buf, n, self.want, self.slots, self.found)
+        return True
+
+    def _result(self, keys):
+        if self.state != _DONE: raise ValueError("truncated")
+        out = {}
+        for i, k in enumerate(keys):
+            if self.found[i]: out[k] = self.slots[i]
+        return out
+
+    def _reset(self):
+        self.state = _OPEN
+        self.klen = 0
+        self.sel = -1           # 目前值對應的 slot，-1 = 跳過
+        self.clen = 0
+        self.vstart = False
+        self.depth = 0
+        self.in_str = False
+        self.esc = False
+        self.scalar = False
+
+    def _feed(self, buf, n, want, slots, found):
+        i = 0
+        key = self.key; cap = self.cap
+        while i < n:
+            c = buf[i]
+            st = self.state
+            if st == _VALUE:
+                if not self.vstart:
+                    if c in _WS: i += 1; continue
+                    self.vstart = True
+                    self.depth = 0; self.in_str = False; self.esc = False; self.scalar = False
+                    if c == 34: self.in_str = True          # "
+                    elif c == 123 or c == 91: self.depth = 1  # { [
+                    else: self.scalar = True
+                    self._cap(c); i += 1; continue
+                if self.scalar:
+                    if c in _SCALAR_END:
+                        self._end(want, slots, found); continue   # 這個字元交給 _NEXT
+                    self._cap(c); i += 1; continue
+                self._cap(c); i += 1
+                if self.in_str:
+                    if self.esc: self.esc = False
+                    elif c == 92: self.esc = True                  # \
+                    elif c == 34:
+                        self.in_str = False
+                        if self.depth == 0: self._end(want, slots, found)
+                elif c == 34: self.in_str = True
+                elif c == 123 or c == 91: self.depth += 1
+                elif c == 125 or c == 93:
+                    self.depth -= 1
+                    if self.depth == 0: self._end(want, slots, found)
+                continue
+            i += 1
+            if st == _KEYSTR:
+                if self.esc: self.esc = False
+                elif c == 92: self.esc = True
+                elif c == 34:
+                    self.state = _COLON; continue
+                if self.klen < KEY_MAX: key[self.klen] = c
+                self.klen += 1
+                continue
+            if c in _WS: continue
+            if st == _OPEN:
+                if c != 123: raise ValueError("not an object")
+                self.state = _KEY
+            elif st == _KEY:
+                if c == 125 : self.state = _DONE; return
+                if c != 34: raise ValueError("bad key")
+                self.klen = 0; self.esc = False; self.state = _KEYSTR
+            elif st == _COLON:
+                if c != 58: raise ValueError("expected ':'")
+                self.sel = self._match(want)
+                self.clen = 0; self.vstart = False; self.state = _VALUE
+            elif st == _NEXT:
+                if c == 44: self.state = _KEY
+                elif c == 125: self.state = _DONE; return
+                else: raise ValueError("expected ',' or '}'")
+            elif st == _DONE:
+                raise ValueError("trailing data")
+
+    def _match(self, want):
+        kl = self.klen
+        if kl > KEY_MAX: return -1
+        key = self.key
+        for j, k in enumerate(want):
+            if len(k) != kl: continue
+            m = 0
+            while m < kl and key[m] == k[m]: m += 1
+            if m == kl: return j
+        return -1
+
+    def _cap(self, c):
+        if self.sel < 0: return
+        if self.clen >= len(self.cap): raise ValueError("value too large")
+        self.cap[self.clen] = c
+        self.clen += 1
+
+    def _end(self, want, slots, found):
+        j = self.sel
+        if j >= 0:
+            slots[j] = json.loads(bytes(memoryview(self.cap)[:self.clen]))
+            found[j] = True
+        self.sel = -1
+        self.state = _NEXT
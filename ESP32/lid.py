@@ -0,0 +1,81 @@
+# ==========================================
+# 藥盒開關 (中斷 + 計時器去彈跳)
+# ==========================================
+# 任何一個開關有邊緣變化就 (重新) 啟動單次計時器，DEBOUNCE_MS 內沒有新的
+# 變化才取樣所有開關；和上次確認的狀態不同的藥格產生一筆 開 / 關 事件，
+# 連同時間放進固定大小的環形緩衝區，由主程式的 task 取出處理。
+# 中斷與計時器回呼都不配置記憶體、不阻塞。
+from array import array
+import time
+
+DEBOUNCE_MS = 500
+QUEUE_SIZE = 16
+
+
+class LidMonitor:
+    def __init__(self, pins, timer, notify=None, debounce_ms=DEBOUNCE_MS, size=QUEUE_SIZE):
+        # pins[i] 對應藥格 i+1 (低電位 = 開蓋)；timer 需支援 init(mode, period, callback)
+        self.pins = pins
+        self.timer = timer
+        self.notify = notify
+        self.debounce_ms = debounce_ms
+        self.open = bytearray(len(pins))
+        for i, p in enumerate(pins): self.open[i] = 1 if p.value() == 0 else 0
+        # 環形緩衝區：藥格、開(1)/關(0)、時間 (RTC 秒)
+        self.size = size
+        self.q_box = bytearray(size)
+        self.q_open = bytearray(size)
+        self.q_ts = array('i', [0] * size)
+        self.head = 0
+        self.tail = 0
+        self.dropped = 0
+        self.pending = False
+        self._settle_cb = self._settle
+        for p in pins: p.irq(trigger=p.IRQ_FALLING | p.IRQ_RISING, handler=self._edge)
+
+    def _edge(self, pin):
+        self.kick()
+
+    def kick(self):
+        # 重新開始去彈跳計時 (邊緣中斷或省電喚醒時呼叫)
+        self.pending = True
+        self.timer.init(mode=self.timer.ONE_SHOT, period=self.debounce_ms, callback=self._settle_cb)
+
+    def _settle(self, t):
+        self.pending = False
+        now = int(time.time())
+        changed = False
+        for i, p in enumerate(self.pins):
+            v = 1 if p.value() == 0 else 0
+            if v != self.open[i]:
+                self.open[i] = v
+                self._push(i + 1, v, now)
+                changed = True
+        if changed and self.notify: self.notify()
+
+    def _push(self, box, opened, ts):
+        # 單一生產者 (計時器回呼) / 單一消費者 (task)：滿了就丟新事件，只有 get() 會動 tail
+        nxt = (self.head + 1) % self.size
+        if nxt == self.tail:
+            self.dropped += 1
+            return
+        self.q_box[self.head] = box
+        self.q_open[self.head] = opened
+        self.q_ts[self.head] = ts
+        self.head = nxt
+
+    def get(self):
+        # 取出一筆 (藥格, 是否開蓋, 時間)，沒有事件回傳 None
+        if self.tail == self.head: return None
+        i = self.tail
+        ev = (self.q_box[i], self.q_open[i] == 1, self.q_ts[i])
+        self.tail = (i + 1) % self.size
+        return ev
+
+    def any_open(self):
+        for v in self.open:
+            if v: return True
+        return False
+
+    def settled(self):
+        return not self.pending and self.tail == self.head
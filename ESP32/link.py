@@ -0,0 +1,171 @@
+# ==========================================
+# WiFi 連線管理
+# ==========================================
+# run() 在背景監看連線，斷線時自動重連：
+#   1. 快速重連：用快取的 BSSID / 頻道直接連 (省去掃描所有頻道)，
+#      DHCP 租約還沒過 LEASE_S 就沿用同一組 IP (省去 DHCP)
+#   2. 失敗時掃描，挑訊號最強的同名 AP 重新連線並以 DHCP 取得 IP，成功後更新快取 (ConfigStore.link)
+#   3. 還是失敗就指數退避 (最多 RETRY_MAX_MS，AP 恢復後最多晚這麼久才連上)，之後再從 1. 開始；
+#      掃描看得到 AP 卻連不上 (AP 剛開機、還在啟動) 就不加倍，下次以 RETRY_MIN_MS 重試
+# 請求端用 wait_up() 等待連線恢復，不必盲目重試；
+# 斷線到重新連上的時間記在 stats 的 link 階段，另計斷線次數與快速重連成功次數。
+import time
+from binascii import hexlify, unhexlify
+import runtime as rt
+from stats import STAGE_LINK, LINK_DROPS, LINK_FAST
+
+CHECK_MS = 5000             # 連線中多久檢查一次狀態
+FAST_TIMEOUT_MS = 4000
+FULL_TIMEOUT_MS = 15000
+RETRY_MIN_MS = 5000
+RETRY_MAX_MS = 120000
+LEASE_S = 12 * 3600         # 沿用 IP 的期限，之後重連改走 DHCP (家用路由器租約通常 >= 24 小時)
+POLL_MS = 100
+
+
+class Link:
+    def __init__(self, wlan, store, stats, on_up=None):
+        self.wlan = wlan
+        self.store = store
+        self.stats = stats
+        self.on_up = on_up          # 連上時呼叫 (例如喚醒網路 task)
+        self.ssid = None            # None = 不自動重連 (尚未設定或正在 WiFi 設定畫面)
+        self.pwd = None
+        self.target = None          # 正在嘗試的 SSID，stop() 時清掉讓嘗試中止
+        self.online = False
+        self.busy = False           # 連線中 (不進 light sleep)
+        self.ups = 0                # 連上次數，網路 task 用來偵測「剛恢復」
+        self.retry_ms = RETRY_MIN_MS
+        self.seen = False           # 上一次嘗試的掃描有看到 AP
+        self.down_t0 = None         # 斷線起點 (stats.start())，None = 未在計時
+        self.up_flag = rt.Flag()
+        self.kick_flag = rt.Flag()
+
+    def start(self, ssid, pwd):
+        self.ssid = ssid; self.pwd = pwd
+        self.retry_ms = RETRY_MIN_MS
+        if not self.online and self.down_t0 is None: self.down_t0 = self.stats.start()
+        self.kick_flag.set()
+
+    def stop(self):
+        self.ssid = None; self.target = None
+
+    def kick(self):
+        # 請求失敗時呼叫：連線看似正常就立即重新檢查 (斷線中不打斷退避)
+        if self.online: self.kick_flag.set()
+
+    async def wait_up(self, ms):
+        # 等待連線，逾時或未設定 WiFi 回傳 False
+        deadline = rt.ticks_add(rt.ticks_ms(), ms)
+        while not self.online:
+            left = rt.ticks_diff(deadline, rt.ticks_ms())
+            if left <= 0 or self.ssid is None: return False
+            await self.up_flag.wait_ms(left)
+        return True
+
+    # WiFi 設定畫面輸入新帳密：只做一次完整連線，成功後交給 run() 維持
+    async def join(self, ssid, pwd):
+        self.stop()
+        if self.online: self._down(False)
+        if self.down_t0 is None: self.down_t0 = self.stats.start()
+        ok = await self.connect(ssid, pwd)
+        if ok: self.start(ssid, pwd)
+        return ok
+
+    async def run(self):
+        wlan = self.wlan
+        while True:
+            if wlan.isconnected():
+                # ESP32 自己重連成功也算
+                if not self.online: self._up(False)
+                await self.kick_flag.wait_ms(CHECK_MS); continue
+            if self.online: self._down(True)
+            if self.ssid is None or self.busy:
+                await self.kick_flag.wait_ms(CHECK_MS); continue
+            if await self.connect(self.ssid, self.pwd): continue
+            if self.ssid is None: continue
+            print(f"WiFi 連線失敗，{self.retry_ms // 1000} 秒後重試")
+            await self.kick_flag.wait_ms(self.retry_ms)
+            if self.seen: self.retry_ms = RETRY_MIN_MS
+            else: self.retry_ms = min(self.retry_ms * 2, RETRY_MAX_MS)
+
+    async def connect(self, ssid, pwd):
+        self.target = ssid
+        self.busy = True
+        try:
+            cache = self.store.link
+            if cache and cache[0] == ssid:
+                age = time.time() - cache[7]
+                static = 0 <= age < LEASE_S
+                if await self._assoc(ssid, pwd, cache[1], cache[2], cache[3:7] if static else None,
+                                     FAST_TIMEOUT_MS):
+                    if not static: self._remember(ssid, cache[1], cache[2])
+                    self._up(True); return True
+                if self.target != ssid: return False
+                print("快速重連失敗，重新掃描")
+            ap = self._scan(ssid)
+            self.seen = ap is not None
+            bssid, ch = ap if ap else (None, 0)
+            if await self._assoc(ssid, pwd, bssid, ch, None, FULL_TIMEOUT_MS):
+                if bssid: self._remember(ssid, bssid, ch)
+                self._up(False); return True
+            return False
+        finally:
+            self.busy = False
+
+    # 連線一次並等待結果；bssid (hex) / ifcfg 為 None 時由驅動掃描 / DHCP
+    async def _assoc(self, ssid, pwd, bssid, ch, ifcfg, timeout_ms):
+        wlan = self.wlan
+        wlan.active(True)
+        wlan.disconnect()
+        try: wlan.ifconfig(tuple(ifcfg) if ifcfg else 'dhcp')
+        except: pass
+        try:
+            if bssid:
+                try: wlan.config(channel=ch)
+                except: pass
+                wlan.connect(ssid, pwd, bssid=unhexlify(bssid))
+            else: wlan.connect(ssid, pwd)
+        except: return False
+        waited = 0
+        while waited < timeout_ms:
+            if wlan.isconnected(): return True
+            if self.target != ssid: break
+            await rt.sleep_ms(POLL_MS); waited += POLL_MS
+        wlan.disconnect()
+        return False
+
+    # 掃描所有頻道 (裝置上會阻塞約 2 秒)，回傳訊號最強的同名 AP (bssid hex, 頻道)
+    def _scan(self, ssid):
+        try: nets = self.wlan.scan()
+        except: return None
+        name = ssid.encode()
+        best = None
+        for ap in nets:
+            if ap[0] == name and (best is None or ap[3] > best[3]): best = ap
+        return (hexlify(best[1]).decode(), best[2]) if best else None
+
+    def _remember(self, ssid, bssid, ch):
+        # 剛由 DHCP 取得 IP 才記錄，flash 最多約每 LEASE_S 寫一次
+        try: cfg = self.wlan.ifconfig()
+        except: return
+        self.store.set_link((ssid, bssid, ch) + tuple(cfg) + (int(time.time()),))
+
+    def _up(self, fast):
+        if self.online: return
+        self.online = True
+        self.ups += 1
+        self.retry_ms = RETRY_MIN_MS
+        st = self.stats
+        if fast: st.inc(LINK_FAST)
+        if self.down_t0 is not None:
+            st.stop(STAGE_LINK, self.down_t0); self.down_t0 = None
+        self.up_flag.set()
+        if self.on_up: self.on_up()
+
+    def _down(self, lost):
+        self.online = False
+        if lost:
+            print("WiFi 斷線")
+            self.stats.inc(LINK_DROPS)
+        self.down_t0 = self.stats.start()
@@ -0,0 +1,69 @@
+# ==========================================
+# 省電模式 (light sleep)
+# ==========================================
+# 閒置一段時間後螢幕調暗，CPU 進入 light sleep，直到下列任一事件：
+#   1. 下一次鬧鐘 / 時鐘分鐘跳動 (timer)
+#   2. 旋鈕轉動或按下 (ext0 / ext1，GPIO 32 / 4 屬於 RTC 腳位)
+#   3. 藥盒開關改變
+# 藥盒開關接在 GPIO 18 / 19，不是 RTC 腳位，不能當 ext0 / ext1 喚醒來源，
+# 所以睡眠切成 SLICE_MS 的小段，每段醒來取樣一次 (遠小於 500ms 的開蓋確認時間)。
+from runtime import ticks_ms, ticks_diff
+
+SLICE_MS = 100
+
+
+class Power:
+    def __init__(self, sleep_fn, watch_pins=(), input_wake=None, slice_ms=SLICE_MS):
+        # sleep_fn(ms) 進入睡眠；input_wake() 判斷上一次是否被旋鈕 / 按鍵喚醒
+        self.sleep_fn = sleep_fn
+        self.watch_pins = watch_pins
+        self.input_wake = input_wake
+        self.slice_ms = slice_ms
+        self.last_activity = ticks_ms()
+        self.low_power = False
+        # 清醒 / 睡眠時間分開累加 (ticks 會溢位，不能用開機到現在的差值)
+        self.mark = ticks_ms()
+        self.awake_ms = 0
+        self.slept_ms = 0
+        self.sleeps = 0
+
+    def activity(self):
+        self.last_activity = ticks_ms()
+
+    def idle_ms(self):
+        return ticks_diff(ticks_ms(), self.last_activity)
+
+    def _account_awake(self):
+        now = ticks_ms()
+        self.awake_ms += ticks_diff(now, self.mark)
+        self.mark = now
+
+    def sleep(self, ms):
+        # 睡 ms 毫秒，回傳提早醒來的原因：None (時間到) / 'input' / 'pin'
+        self._account_awake()
+        levels = [p.value() for p in self.watch_pins]
+        left = ms
+        why = None
+        while left > 0 and why is None:
+            step = self.slice_ms if self.watch_pins and left > self.slice_ms else left
+            t0 = ticks_ms()
+            self.sleep_fn(step)
+            self.slept_ms += ticks_diff(ticks_ms(), t0)
+            self.sleeps += 1
+            left -= step
+            if self.input_wake and self.input_wake(): why = 'input'
+            for i, p in enumerate(self.watch_pins):
+                if p.value() != levels[i]: why = 'pin'
+        self.mark = ticks_ms()
+        return why
+
+    def duty(self):
+        # (睡眠比例, 總時間 ms)
+        self._account_awake()
+        total = self.awake_ms + self.slept_ms
+        if total <= 0: return 0, 0
+        return self.slept_ms / total, total
+
+    def report(self):
+        ratio, total = self.duty()
+        return f"sleep {ratio * 100:.1f}% / awake {(1 - ratio) * 100:.1f}% over {total // 1000}s ({self.sleeps} sleeps)"
@@ -0,0 +1,240 @@
+# ==========================================
+# OLED 差異更新 (只送有變動的頁 / 欄)
+# ==========================================
+# 自己持有 128x64 framebuffer，並保留上一張送出的畫面。
+# show() 逐頁 (8 像素高) 比對，只把變動的欄位範圍寫到 SSD1306，
+# 相鄰頁的範圍會合併成一個視窗以省下命令位元組。
+# 介面與 ssd1306py 的 clear / text / show 相同，可直接取代 lcd。
+#
+# 文字不再每次逐字點陣化：Glyphs 把用過的字元存成 8x8 點陣 (MONO_VLSB 的 8 個欄位元組)，
+# 固定標題 (label=True) 整串另存 (LRU)；其他文字逐字從字元快取畫，常變的字串 (時鐘、百分比) 不會擠掉標題。
+# field() 依字元位置比對，只重畫內容有變的字格 (時鐘每秒通常只換 1 格)。
+# y 對齊 8 (剛好一頁) 時直接複製位元組進 framebuffer，其餘用 FrameBuffer.blit；
+# 常更新的欄位 (時鐘、響鈴訊息) 因此放在 8 的倍數，差異更新也只需送一頁。
+import framebuf
+
+SSD1306_ADDR = 0x3C
+HEADER_BYTES = 11   # 一次視窗寫入的額外成本：命令 (位址+控制+6) + 資料 (位址+控制)
+GLYPH_FIRST = 32    # 快取可列印 ASCII，其他字元顯示為 127 (與 framebuf.text 相同)
+GLYPH_COUNT = 96
+STRING_CACHE = 12   # 整串點陣的 LRU 筆數 (每筆 8 x 字數 位元組)
+
+
+class Glyphs:
+    def __init__(self, limit=STRING_CACHE):
+        self.font = bytearray(GLYPH_COUNT * 8)     # 每個字 8 個欄位元組
+        self.fv = memoryview(self.font)            # 切片不複製
+        self.have = bytearray(GLYPH_COUNT)         # 1 = 已點陣化
+        self.scratch = bytearray(8)
+        self.scratch_fb = framebuf.FrameBuffer(self.scratch, 8, 8, framebuf.MONO_VLSB)
+        self.strings = {}                          # 字串 -> [最後使用, FrameBuffer, bytearray]
+        self.limit = limit
+        self.tick = 0
+        self.rasterized = 0                        # 量測用：實際點陣化的字數
+
+    def offset(self, c):
+        # 字元點陣在 font 中的位置，第一次用到時點陣化
+        i = ord(c) - GLYPH_FIRST
+        if i < 0 or i >= GLYPH_COUNT: i = GLYPH_COUNT - 1
+        o = i * 8
+        if not self.have[i]:
+            fb = self.scratch_fb
+            fb.fill(0); fb.text(chr(i + GLYPH_FIRST), 0, 0, 1)
+            self.font[o:o + 8] = self.scratch
+            self.have[i] = 1
+            self.rasterized += 1
+        return o
+
+    def glyph_fb(self, c):
+        # 單一字的 FrameBuffer (共用 scratch，用完即丟)
+        o = self.offset(c)
+        self.scratch[:] = self.fv[o:o + 8]
+        return self.scratch_fb
+
+    def string(self, s):
+        # 回傳 (FrameBuffer, bytearray)；最久沒用的先淘汰
+        self.tick += 1
+        e = self.strings.get(s)
+        if e is None:
+            if len(self.strings) >= self.limit:
+                old = min(self.strings, key=lambda k: self.strings[k][0])
+                del self.strings[old]
+            buf = bytearray(len(s) * 8)
+            fv = self.fv
+            for i in range(len(s)):
+                o = self.offset(s[i])
+                buf[i * 8:i * 8 + 8] = fv[o:o + 8]
+            e = [0, framebuf.FrameBuffer(buf, len(s) * 8, 8, framebuf.MONO_VLSB), buf]
+            self.strings[s] = e
+        e[0] = self.tick
+        return e[1], e[2]
+
+
+class Screen:
+    def __init__(self, i2c, width=128, height=64, addr=SSD1306_ADDR):
+        self.i2c = i2c
+        self.addr = addr
+        self.width = width
+        self.pages = height // 8
+        self.buf = bytearray(width * self.pages)
+        self.prev = bytearray(width * self.pages)
+        self.fb = framebuf.FrameBuffer(self.buf, width, height, framebuf.MONO_VLSB)
+        self._cmd = bytearray(7)
+        self._cmd[0] = 0x00; self._cmd[1] = 0x21; self._cmd[4] = 0x22
+        self.full_refresh = False   # True = 每次都送整張 (量測用)
+        self._stale = True          # 第一次 show 不知道面板內容，送整張
+        self.view = None
+        self.fields = {}
+        self.on = True
+        self.cache = True           # False = 每次以 framebuf.text 點陣化 (量測用)
+        self.glyphs = Glyphs()
+        self.bytes_sent = 0
+        self.flushes = 0
+        self.cells = 0              # 量測用：畫了幾個字格
+
+    # ---- 與 ssd1306py 相同的繪圖介面 ----
+    def clear(self):
+        self.fb.fill(0)
+        self.view = None
+
+    # label = True：固定文字 (標題、提示)，整串從 LRU 貼上
+    def text(self, s, x, y, size=8, label=False):
+        if self.cache and s:
+            if label: self.blit_string(s, x, y)
+            else:
+                for i in range(len(s)): self.blit_glyph(s[i], x + i * 8, y)
+        else:
+            self.cells += len(s)
+            self.fb.text(s, x, y, 1)
+
+    # ---- 點陣快取 ----
+    def _aligned(self, x, y, w):
+        return not y & 7 and x >= 0 and x + w <= self.width and 0 <= y < self.pages * 8
+
+    def blit_glyph(self, c, x, y):
+        # 整格覆蓋 (含背景)，不必先清除
+        self.cells += 1
+        g = self.glyphs
+        if self._aligned(x, y, 8):
+            o = g.offset(c)
+            base = (y >> 3) * self.width + x
+            self.buf[base:base + 8] = g.fv[o:o + 8]
+        else: self.fb.blit(g.glyph_fb(c), x, y)
+
+    def blit_string(self, s, x, y):
+        self.cells += len(s)
+        sfb, sbuf = self.glyphs.string(s)
+        n = len(sbuf)
+        if self._aligned(x, y, n):
+            base = (y >> 3) * self.width + x
+            self.buf[base:base + n] = sbuf
+        else: self.fb.blit(sfb, x, y)
+
+    def fill_rect(self, x, y, w, h, c):
+        self.fb.fill_rect(x, y, w, h, c)
+
+    # ---- 保留式版面：每個畫面的欄位只在內容改變時重畫 ----
+    def begin(self, view):
+        # 換到另一個畫面時清空並回傳 True (呼叫端畫固定標題)
+        if self.view == view: return False
+        self.fb.fill(0)
+        self.view = view
+        self.fields = {}
+        return True
+
+    # label = True：固定文字 (選單項目、提示)，內容改變時整串從 LRU 貼上
+    def field(self, key, s, x, y, label=False):
+        new = (s, x, y)
+        old = self.fields.get(key)
+        if old == new: return
+        self.fields[key] = new
+        if not self.cache:
+            if old: self.fb.fill_rect(old[1], old[2], len(old[0]) * 8, 8, 0)
+            self.cells += len(s)
+            self.fb.text(s, x, y, 1)
+            return
+        if old and (old[1] != x or old[2] != y):
+            self.fb.fill_rect(old[1], old[2], len(old[0]) * 8, 8, 0)
+            old = None
+        prev = old[0] if old else ""
+        n = len(s); m = len(prev)
+        if label:
+            if m > n: self.fb.fill_rect(x + n * 8, y, (m - n) * 8, 8, 0)
+            if s: self.blit_string(s, x, y)
+            return
+        # 依位置比對：只重畫變動的字格，變短的部分以空白格蓋掉
+        for i in range(max(n, m)):
+            c = s[i] if i < n else " "
+            if i < m and prev[i] == c: continue
+            self.blit_glyph(c, x + i * 8, y)
+
+    def invalidate(self):
+        self._stale = True
+
+    # ---- 面板控制 (省電用) ----
+    def _command(self, *cmds):
+        self.i2c.writeto(self.addr, bytes((0x00,) + cmds))
+
+    def contrast(self, v):
+        self._command(0x81, v)
+
+    def power(self, on):
+        # 關閉時 show() 只更新 framebuffer，重新開啟後送整張
+        if on == self.on: return
+        self._command(0xAF if on else 0xAE)
+        self.on = on
+        if on: self._stale = True
+
+    # ---- 傳送 ----
+    def _window(self, x0, x1, p0, p1):
+        c = self._cmd
+        c[2] = x0; c[3] = x1; c[5] = p0; c[6] = p1
+        self.i2c.writeto(self.addr, c)
+        w = self.width
+        mv = memoryview(self.buf)
+        if p0 == p1:
+            self.i2c.writevto(self.addr, (b"\x40", mv[p0 * w + x0:p0 * w + x1 + 1]))
+        else:
+            # 多頁視窗：各頁片段依序送出 (同一個 I2C 交易)
+            parts = [b"\x40"]
+            for p in range(p0, p1 + 1):
+                parts.append(mv[p * w + x0:p * w + x1 + 1])
+            self.i2c.writevto(self.addr, parts)
+        self.bytes_sent += HEADER_BYTES + (x1 - x0 + 1) * (p1 - p0 + 1)
+
+    def _diff_page(self, p):
+        w = self.width
+        base = p * w
+        buf = self.buf; prev = self.prev
+        if buf[base:base + w] == prev[base:base + w]: return None
+        x0 = 0
+        while buf[base + x0] == prev[base + x0]: x0 += 1
+        x1 = w - 1
+        while buf[base + x1] == prev[base + x1]: x1 -= 1
+        return x0, x1
+
+    def show(self):
+        if not self.on: return
+        w = self.width
+        if self._stale or self.full_refresh:
+            self._window(0, w - 1, 0, self.pages - 1)
+            self._stale = False
+        else:
+            run = None  # 目前合併中的視窗 [x0, x1, p0, p1]
+            for p in range(self.pages):
+                d = self._diff_page(p)
+                if d is None:
+                    if run: self._window(*run); run = None
+                    continue
+                if run:
+                    # 合併後多送的位元組比再開一個視窗便宜就合併
+                    nx0 = min(run[0], d[0]); nx1 = max(run[1], d[1])
+                    merged = (nx1 - nx0 + 1) * (p - run[2] + 1)
+                    separate = (run[1] - run[0] + 1) * (run[3] - run[2] + 1) + (d[1] - d[0] + 1) + HEADER_BYTES
+                    if merged <= separate:
+                        run = [nx0, nx1, run[2], p]; continue
+                    self._window(*run)
+                run = [d[0], d[1], p, p]
+            if run: self._window(*run)
+        self.prev[:] = self.buf
+        self.flushes += 1
@@ -0,0 +1,99 @@
+# ==========================================
+# 協作式排程 (uasyncio / CPython asyncio 通用)
+# ==========================================
+# 裝置上使用 uasyncio，主機端 (CPython) 使用標準 asyncio，
+# 讓同一套 task 可以在電腦上量測 UI 延遲與鬧鐘抖動。
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+
+try:
+    from time import ticks_ms, ticks_us, ticks_diff, ticks_add
+except ImportError:
+    # CPython 沒有 ticks_*，用單調時鐘代替 (不會溢位，直接相減即可)
+    import time as _time
+    _clock = _time.monotonic
+
+    def set_clock(fn):
+        # 模擬器換成虛擬時鐘 (回傳秒數的函式)
+        global _clock
+        _clock = fn
+
+    def ticks_ms():
+        return int(_clock() * 1000)
+
+    def ticks_us():
+        return int(_clock() * 1000000)
+
+    def ticks_diff(a, b):
+        return a - b
+
+    def ticks_add(a, b):
+        return a + b
+
+
+async def sleep_ms(ms):
+    await asyncio.sleep(ms / 1000)
+
+
+def spawn(coro):
+    return asyncio.create_task(coro)
+
+
+def run(coro):
+    asyncio.run(coro)
+
+
+# -----------------------------
+# Flag: 中斷 / 其他 task 通知等待中的 task
+# -----------------------------
+# 裝置上用 ThreadSafeFlag (可在 IRQ 中 set)，主機端退回 Event。
+class Flag:
+    def __init__(self):
+        if hasattr(asyncio, "ThreadSafeFlag"):
+            self._f = asyncio.ThreadSafeFlag()
+            self._tsf = True
+        else:
+            self._f = asyncio.Event()
+            self._tsf = False
+
+    def set(self):
+        self._f.set()
+
+    async def wait(self):
+        await self._f.wait()
+        if not self._tsf: self._f.clear()
+
+    async def wait_ms(self, ms):
+        # 等待旗標或逾時，回傳 True 表示旗標被觸發
+        try:
+            await asyncio.wait_for(self.wait(), ms / 1000)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+
+# -----------------------------
+# Meter: 記錄延遲 / 抖動 (單位 ms)
+# -----------------------------
+class Meter:
+    def __init__(self, name):
+        self.name = name
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.total = 0
+        self.worst = 0
+
+    def add(self, v):
+        self.count += 1
+        self.total += v
+        if v > self.worst: self.worst = v
+
+    def avg(self):
+        return self.total / self.count if self.count else 0
+
+    def __str__(self):
+        return f"{self.name}: n={self.count} avg={self.avg():.1f}ms max={self.worst}ms"
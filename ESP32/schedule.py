@@ -0,0 +1,117 @@
+# ==========================================
+# 鬧鐘排程 (多次服藥，預先算好下一次觸發時間)
+# ==========================================
+# 每個服藥時段 = (時, 分, 星期遮罩, 藥格)。星期遮罩 bit0 = 週一 ... bit6 = 週日，
+# 藥格 0 表示不指定。各時段的下一次觸發時間 (epoch 秒) 放在 heap 裡，
+# 主迴圈每次只要比較 now >= next_fire 一個整數。
+# heap 的鍵是絕對時間，跨日不需重算；只有設定改變或時鐘被重設 (NTP) 時才 rebuild()。
+# 提早吃藥記在時段上 (skip)：開蓋的藥格相符、接下來 window 秒內到期的那一次觸發不響；
+# 剛回應過響鈴 (since) 時，離下一次比離回應還近才算提早吃藥 (回應後再開蓋屬於剛才那一次)。
+try:
+    import heapq
+except ImportError:
+    import uheapq as heapq
+import time
+
+DAY = 86400
+CATCHUP_S = 30 * 60   # 錯過 30 分鐘內的鬧鐘仍補響，更早的只記為錯過
+NEVER = 1 << 62
+
+
+def days_to_mask(days):
+    m = 0
+    for i in range(7):
+        if days[i]: m |= 1 << i
+    return m
+
+
+def doses_from_config(cfg):
+    # alarm.json 的 doses 清單 -> [(hour, minute, mask, box)]
+    out = []
+    for d in cfg.get("doses", []):
+        try:
+            out.append((int(d["hour"]) % 24, int(d["minute"]) % 60,
+                        days_to_mask(d["days"]), int(d.get("box", 0))))
+        except (KeyError, ValueError, TypeError, IndexError): continue
+    return out
+
+
+class Schedule:
+    def __init__(self, utc_offset=0):
+        self.utc_offset = utc_offset
+        self.entries = []
+        self.heap = []
+        self.last_fire = []     # 每個時段上一次觸發的時間，避免時鐘倒退時重響
+        self.skip = []          # 每個時段已提早吃過的那一次觸發時間
+        self.next_fire = NEVER
+
+    def _next_after(self, i, after):
+        # 時段 i 在 after 之後 (不含) 的下一次觸發時間，沒有勾選星期則回傳 None
+        h, m, mask, box = self.entries[i]
+        if not mask: return None
+        local = after + self.utc_offset
+        day0 = local - local % DAY
+        wday = time.gmtime(day0)[6]
+        for k in range(8):
+            t = day0 + k * DAY + h * 3600 + m * 60
+            if t > local and mask & (1 << ((wday + k) % 7)):
+                return t - self.utc_offset
+        return None
+
+    def set_entries(self, entries, now):
+        if entries != self.entries:
+            self.entries = list(entries)
+            self.last_fire = [0] * len(self.entries)
+            self.skip = [0] * len(self.entries)
+        self.rebuild(now)
+
+    def rebuild(self, now, since=None):
+        # 從 now 重新計算每個時段的下一次觸發；since 之後、上次觸發之後到期的也排入
+        # (重開機補響、時鐘往前跳)，由 poll() 依 CATCHUP_S 判斷補響或錯過
+        self.heap = []
+        for i in range(len(self.entries)):
+            after = max(now - 1, self.last_fire[i])
+            if since is not None: after = max(since, self.last_fire[i])
+            t = self._next_after(i, after)
+            if t is not None: self.heap.append((t, i))
+        heapq.heapify(self.heap)
+        self.next_fire = self.heap[0][0] if self.heap else NEVER
+
+    def resume(self, fires, skips, now):
+        # 重開機接續：還原各時段上次觸發時間與提早吃藥 (快照)，已觸發過的不重響，重開期間到期的照補響規則
+        for i in range(min(len(fires), len(self.entries))):
+            if fires[i]: self.last_fire[i] = fires[i]
+            self.skip[i] = skips[i]
+        self.rebuild(now, now - CATCHUP_S)
+
+    def take_early(self, box, now, window, since=0):
+        # 提早吃藥：藥格相符 (任一方為 0 視為相符)、window 秒內最早到期且還沒記過的時段，回傳時段或 -1
+        best = -1; bt = now + window + 1
+        if since: bt = min(bt, now + (now - since))
+        for t, i in self.heap:
+            b = self.entries[i][3]
+            if t < bt and self.skip[i] != t and (not box or not b or b == box):
+                best = i; bt = t
+        if best >= 0: self.skip[best] = bt
+        return best
+
+    def skipped(self, i, t):
+        return self.skip[i] == t
+
+    def poll(self, now):
+        # 回傳到期的 [(觸發時間, 時段, 是否準時)]；沒有到期時只做一次比較
+        if now < self.next_fire: return None
+        fired = []
+        heap = self.heap
+        while heap and heap[0][0] <= now:
+            t, i = heapq.heappop(heap)
+            self.last_fire[i] = t
+            fired.append((t, i, now - t <= CATCHUP_S))
+            n = self._next_after(i, t)
+            if n is not None: heapq.heappush(heap, (n, i))
+        self.next_fire = heap[0][0] if heap else NEVER
+        return fired
+
+    def upcoming(self):
+        # (epoch, 時段) 或 None，給畫面顯示下一次鬧鐘
+        return self.heap[0] if self.heap else None
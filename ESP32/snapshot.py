@@ -0,0 +1,76 @@
+# ==========================================
+# 執行狀態快照 (當機 / 看門狗重置後接續)
+# ==========================================
+# 把重開機後需要接續的狀態打包成固定長度的位元組，存在 RTC 記憶體
+# (軟重置 / 看門狗重置都會保留，斷電才清除)：
+#   旗標 (響鈴中、待處理的網路動作)、響鈴中的時段、上一次觸發的鬧鐘、回應響鈴的時間、
+#   各時段上一次觸發時間 (避免已處理的鬧鐘重響、重開期間到期的鬧鐘補響)、
+#   各時段提早吃過的那一次觸發時間、重置次數與原因
+# 結尾是 CRC32；長度、版本或 CRC 不符就當作沒有快照 (斷電或韌體更新)。
+# save() 先打包到預先配置的緩衝區，和上次寫入的內容相同就不寫。
+import struct
+from binascii import crc32
+
+VERSION = 2
+MAX_SLOTS = 8
+HEAD = "<BBBBHII"           # 版本、旗標、響鈴時段、原因、重置次數、上一次觸發、回應響鈴
+FMT = HEAD + "I" * (MAX_SLOTS * 2)
+BODY = struct.calcsize(FMT)
+SIZE = BODY + 4
+
+# 旗標
+F_RINGING = 1
+F_SYNC_CONFIG = 2
+
+# 重置原因 (hal.reset_cause() 回傳的名稱)
+CAUSES = ("power", "hard", "wdt", "deepsleep", "soft", "crash")
+
+
+class Snapshot:
+    def __init__(self, read, write):
+        # read() 回傳上次寫入的 bytes；write(buf) 寫入 (裝置上是 RTC 記憶體)
+        self.read = read
+        self.write = write
+        self.buf = bytearray(SIZE)
+        self.last = bytearray(SIZE)
+        self.writes = 0
+        self.resets = 0             # 上次斷電以來的重置次數
+        self.cause = 0              # 本次開機的原因 (CAUSES 的索引)
+
+    def load(self, cause):
+        # 回傳 (旗標, 響鈴時段, 上一次觸發, 回應響鈴, 各時段上次觸發, 各時段提早吃藥) 或 None
+        self.cause = CAUSES.index(cause) if cause in CAUSES else 0
+        try: data = self.read()
+        except Exception: data = None
+        if not data or len(data) < SIZE: return None
+        data = bytes(data[:SIZE])
+        if struct.unpack_from("<I", data, BODY)[0] != crc32(data[:BODY]) & 0xFFFFFFFF: return None
+        f = struct.unpack_from(FMT, data, 0)
+        if f[0] != VERSION: return None
+        # 當機後由程式呼叫 reset，硬體回報的是軟重置：以快照裡記下的原因為準
+        if f[3] and CAUSES[self.cause] == "soft": self.cause = f[3]
+        self.resets = f[4] + 1
+        self.last[:] = data
+        return f[1], f[2], f[5], f[6], f[7:7 + MAX_SLOTS], f[7 + MAX_SLOTS:]
+
+    def save(self, flags, slot, last_fire, answered, fires, skips, crash=False):
+        # fires / skips：各時段上一次觸發、提早吃過的觸發時間 (epoch 秒)，超過 MAX_SLOTS 的不保存
+        buf = self.buf
+        n = min(len(fires), MAX_SLOTS)
+        struct.pack_into(HEAD, buf, 0, VERSION, flags, slot, CAUSES.index("crash") if crash else 0,
+                         min(self.resets, 65535), int(last_fire), int(answered))
+        off = struct.calcsize(HEAD)
+        for i in range(MAX_SLOTS):
+            struct.pack_into("<I", buf, off + i * 4, int(fires[i]) if i < n else 0)
+            struct.pack_into("<I", buf, off + (MAX_SLOTS + i) * 4, int(skips[i]) if i < n else 0)
+        struct.pack_into("<I", buf, BODY, crc32(memoryview(buf)[:BODY]) & 0xFFFFFFFF)
+        if buf == self.last: return False
+        try: self.write(buf)
+        except Exception as e:
+            print("快照寫入失敗:", e); return False
+        self.last[:] = buf
+        self.writes += 1
+        return True
+
+    def report(self):
+        return f"reset={CAUSES[self.cause]} count={self.resets} snapshot writes={self.writes}"
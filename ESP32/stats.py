@@ -0,0 +1,115 @@
+# ==========================================
+# 效能統計 (固定大小，關閉時幾乎零成本)
+# ==========================================
+# 記錄四類資料，全部放在開機時配置好的 array 裡，執行中不再配置記憶體：
+#   1. 各階段耗時 (ticks_us)：次數、累計、最大值；link 是每次 WiFi 斷線到重新連上的時間
+#   2. HTTP 計數：嘗試、重試、失敗、Error 16；WiFi 斷線次數、快速重連成功次數
+#   3. 每次 api_request 前後的 gc.mem_free() 最低點與 gc.mem_alloc() 最高點
+#   4. 開機里程碑：重置後多少 ms 顯示時鐘 / 連上網路 / 取得雲端設定 (0 = 尚未達到)
+# report() 給序列埠看；compact() 是一行短字串，可附在下一次後端請求的 st= 參數。
+#
+# compact 格式 (以 _ 分隔，數字以 . 分隔)：
+#   <階段0 次數.平均us.最大us>_..._<階段N>_<http 嘗試.重試.失敗.err16.斷線.快速重連>_<mem_free 最低.mem_alloc 最高>
+#   _<開機 clock.online.config ms>
+from array import array
+import gc
+from runtime import ticks_us, ticks_ms, ticks_diff
+
+STAGE_LID = 0
+STAGE_NET = 1
+STAGE_ALARM = 2
+STAGE_RENDER = 3
+STAGE_INPUT = 4
+STAGE_LINK = 5
+STAGE_NAMES = ("lid", "net", "alarm", "render", "input", "link")
+
+HTTP_ATTEMPTS = 0
+HTTP_RETRIES = 1
+HTTP_FAILS = 2
+HTTP_ERR16 = 3
+LINK_DROPS = 4
+LINK_FAST = 5
+COUNTER_NAMES = ("http", "retry", "fail", "err16", "drop", "fast")
+
+BOOT_CLOCK = 0
+BOOT_ONLINE = 1
+BOOT_CONFIG = 2
+BOOT_NAMES = ("clock", "online", "config")
+
+TOTAL_LIMIT = 1 << 30   # 累計超過就次數與累計都減半 (平均值不變，不會溢位)
+
+_mem_free = getattr(gc, "mem_free", None)
+_mem_alloc = getattr(gc, "mem_alloc", None)
+
+
+class Stats:
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        n = len(STAGE_NAMES)
+        self.count = array('I', [0] * n)
+        self.total = array('I', [0] * n)
+        self.worst = array('I', [0] * n)
+        self.counters = array('I', [0] * len(COUNTER_NAMES))
+        self.mem_low = 0        # 0 = 尚未取樣
+        self.alloc_high = 0
+        # 開機里程碑只記一次，reset() 不清除
+        self.boot = array('I', [0] * len(BOOT_NAMES))
+
+    # ---- 階段耗時 ----
+    def start(self):
+        return ticks_us() if self.enabled else 0
+
+    def stop(self, stage, t0):
+        if not self.enabled: return
+        dt = ticks_diff(ticks_us(), t0)
+        if dt < 0: dt = 0
+        if self.total[stage] + dt >= TOTAL_LIMIT:
+            self.total[stage] >>= 1; self.count[stage] >>= 1
+        self.count[stage] += 1
+        self.total[stage] += dt
+        if dt > self.worst[stage]: self.worst[stage] = dt
+
+    # ---- 計數 / 記憶體 ----
+    def inc(self, counter):
+        if self.enabled: self.counters[counter] += 1
+
+    def mem(self):
+        # 取樣目前 heap，保留最低可用量與最高使用量
+        if not self.enabled or _mem_free is None: return
+        f = _mem_free()
+        if self.mem_low == 0 or f < self.mem_low: self.mem_low = f
+        a = _mem_alloc()
+        if a > self.alloc_high: self.alloc_high = a
+
+    def mark(self, milestone):
+        # ticks_ms 從重置開始計時，包含 import 與初始化的時間
+        if not self.boot[milestone]: self.boot[milestone] = max(1, ticks_ms())
+
+    def reset(self):
+        for a in (self.count, self.total, self.worst, self.counters):
+            for i in range(len(a)): a[i] = 0
+        self.mem_low = 0
+        self.alloc_high = 0
+
+    def avg(self, stage):
+        c = self.count[stage]
+        return self.total[stage] // c if c else 0
+
+    # ---- 輸出 ----
+    def report(self):
+        lines = []
+        for i, name in enumerate(STAGE_NAMES):
+            lines.append(f"{name:<7}n={self.count[i]:<6} avg={self.avg(i)}us max={self.worst[i]}us")
+        lines.append(" ".join(f"{COUNTER_NAMES[i]}={self.counters[i]}" for i in range(len(COUNTER_NAMES))))
+        lines.append(f"mem_free low={self.mem_low} mem_alloc high={self.alloc_high}")
+        lines.append("boot " + " ".join(f"{BOOT_NAMES[i]}={self.boot[i]}ms" for i in range(len(BOOT_NAMES))))
+        return "\n".join(lines)
+
+    def compact(self):
+        parts = []
+        for i in range(len(STAGE_NAMES)):
+            parts.append(f"{self.count[i]}.{self.avg(i)}.{self.worst[i]}")
+        parts.append(".".join(str(c) for c in self.counters))
+        parts.append(f"{self.mem_low}.{self.alloc_high}")
+        parts.append(".".join(str(t) for t in self.boot))
+        return "_".join(parts)
@@ -0,0 +1,135 @@
+# ==========================================
+# 時間維護：定期 NTP 校時 + RTC 漂移補償
+# ==========================================
+# ESP32 的 RTC 一天會差好幾秒 (light sleep 時改用內部 RC 振盪器，誤差更大)。
+#   1. 校時：一次送 NTP_SAMPLES 個 SNTP 請求，採用往返最短的回覆 (網路延遲造成的誤差最小)
+#   2. 漂移：兩次校時之間量到的誤差 / 經過時間 = 漂移率 (ppm)，依間隔長短加權平均後保存
+#      (短間隔受網路延遲影響大，權重小)；兩次校時之間每 CORRECT_MS 依漂移率微調 RTC
+#   3. 補償後的殘差小於 STABLE_MS 就把校時間隔加倍 (RESYNC_MIN_S -> RESYNC_MAX_S)，網路流量不增加
+#   4. 校時成功與之後每 SAVE_S 把時間、漂移率寫入 clock.txt；
+#      斷電重開 (RTC 歸零) 又沒有網路時先用它還原，時間大致合理但標為未校時
+# synced = False 時時間不可信：鬧鐘與跨日重置暫停，直到校時成功。
+import runtime as rt
+
+NTP_SAMPLES = 4
+NTP_GAP_MS = 200
+RESYNC_MIN_S = 3600
+RESYNC_MAX_S = 86400
+RETRY_MS = 300000           # 校時失敗 (有網路但 NTP 不通) 後多久再試
+CORRECT_MS = 600000
+CORRECT_STEP_MS = 20        # 累積到這麼多才改 RTC
+DRIFT_MIN_S = 1800          # 間隔太短量不準，不更新漂移率
+DRIFT_MAX_PPM = 1000
+STABLE_MS = 250             # 殘差小於此值才把校時間隔加倍
+SAVE_S = 3600
+
+
+class TimeKeeper:
+    def __init__(self, hal, store, link, on_step=None):
+        self.hal = hal
+        self.store = store
+        self.link = link
+        self.on_step = on_step      # RTC 被校正後呼叫 on_step(舊的 RTC 秒)，校正前時間不可信則傳 None
+        self.synced = False
+        self.drift = 0.0            # ppm，正 = RTC 走太慢 (restore() 從 clock.txt 載入)
+        self.sync_ms = 0            # 本次開機上一次校時的 RTC 毫秒，0 = 尚未
+        self.corr_ms = 0            # 上一次補償的 RTC 毫秒，0 = 時間不可信，不補償
+        self.resid = 0.0            # 還沒套用到 RTC 的補償量 (ms)
+        self.interval_s = RESYNC_MIN_S
+        self.due = rt.ticks_ms()    # 下一次校時 (未校時前一連上網路就校)
+        self.saved = rt.ticks_ms()
+        self.flag = rt.Flag()
+        self.syncs = 0
+        self.fails = 0
+        self.offset = 0             # 上一次校時量到的誤差 (ms)
+
+    # 開機：RTC 從上次校時一直在走 (軟重置 / 看門狗) 就直接可信；
+    # RTC 斷電歸零則用 clock.txt 還原到上次的時間，等網路校時
+    def restore(self):
+        st = self.store
+        self.drift = st.drift
+        now = self.hal.time_ms() // 1000
+        if st.clock and now >= st.clock:
+            self.synced = st.clock_ok
+            if self.synced: self.corr_ms = self.hal.time_ms()
+            return
+        if not st.clock: return
+        try:
+            self.hal.set_time_ms(st.clock * 1000)
+            print("RTC 已還原到上次校時的時間")
+        except Exception as e: print("RTC 還原失敗:", e)
+        # 記下「目前是還原的時間」，再次軟重置時不會誤判為已校時
+        if st.clock_ok: st.set_clock(st.clock, self.drift, False)
+
+    def kick(self):
+        self.flag.set()
+
+    def due_ms(self):
+        return rt.ticks_diff(self.due, rt.ticks_ms())
+
+    async def sync(self):
+        hal = self.hal
+        best = None
+        for i in range(NTP_SAMPLES):
+            if i: await rt.sleep_ms(NTP_GAP_MS)
+            try: s = hal.ntp_sample()
+            except Exception: continue
+            if best is None or s[1] < best[1]: best = s
+        if best is None:
+            self.fails += 1
+            self.due = rt.ticks_add(rt.ticks_ms(), RETRY_MS)
+            print("NTP 校時失敗")
+            return False
+        off = best[0]
+        now = hal.time_ms()
+        old = now // 1000 if self.synced else None
+        if self.sync_ms and now - self.sync_ms >= DRIFT_MIN_S * 1000:
+            # 上次校時後已依 drift 補償過，off 是剩下的殘差；第一次量測直接採用
+            span = now - self.sync_ms
+            r = off * 1000000 / span
+            gain = span / (span + RESYNC_MIN_S * 1000) if self.drift else 1
+            self.drift = max(-DRIFT_MAX_PPM, min(DRIFT_MAX_PPM, self.drift + r * gain))
+            if abs(off) < STABLE_MS: self.interval_s = min(self.interval_s * 2, RESYNC_MAX_S)
+            else: self.interval_s = RESYNC_MIN_S
+        if off: hal.set_time_ms(now + off)
+        self.sync_ms = self.corr_ms = now + off
+        self.resid = 0.0
+        self.offset = off
+        self.syncs += 1
+        self.synced = True
+        self.due = rt.ticks_add(rt.ticks_ms(), self.interval_s * 1000)
+        self.save()
+        if self.on_step: self.on_step(old)
+        return True
+
+    def correct(self):
+        # 依漂移率補償上次補償之後的時間
+        if not self.corr_ms or not self.drift: return
+        now = self.hal.time_ms()
+        self.resid += (now - self.corr_ms) * self.drift / 1000000
+        self.corr_ms = now
+        step = int(self.resid)
+        if abs(step) < CORRECT_STEP_MS: return
+        self.hal.set_time_ms(now + step)
+        self.corr_ms += step
+        self.resid -= step
+        if self.on_step: self.on_step(now // 1000)
+
+    def save(self):
+        self.saved = rt.ticks_ms()
+        self.store.set_clock(self.hal.time_ms() // 1000, self.drift, True)
+
+    # 背景：定時補償漂移、到期且有網路就校時、每小時保存時間
+    async def run(self):
+        while True:
+            self.correct()
+            if self.due_ms() <= 0 and self.link.online:
+                await self.sync(); continue
+            if self.synced and rt.ticks_diff(rt.ticks_ms(), self.saved) > SAVE_S * 1000: self.save()
+            wait = CORRECT_MS
+            if self.link.online: wait = min(wait, max(self.due_ms(), 0))
+            await self.flag.wait_ms(wait)
+
+    def report(self):
+        return (f"ntp syncs={self.syncs} fails={self.fails} offset={self.offset}ms "
+                f"drift={self.drift:.1f}ppm interval={self.interval_s}s synced={self.synced}")
@@ -4,9 +4,19 @@ var SHEET_ID = 'google試算表的網址';
 // ==========================================
 // 1. doGet (ESP32 讀取用)
 // ==========================================
+// 紀錄與推播只放進佇列 (一次 Script Properties 寫入) 就回應裝置，
+// 由 drainOutbox 觸發器批次寫入試算表並以 fetchAll 推播
 function doGet(e) {
+  var out = handleGet(e);
+  flushOutbox();
+  return out;
+}
+
+function handleGet(e) {
   if (!e || !e.parameter) return ContentService.createTextOutput("No Params");
   var action = e.parameter.action;
+  // 裝置附帶的效能統計 (ESP32 stats.py 的 compact 格式)
+  if (e.parameter.st) logDeviceStats(e.parameter.userId, e.parameter.st);
   
   if (action === 'bind') {
     var result = verifyCode(e.parameter.code);
@@ -24,11 +34,20 @@ function doGet(e) {
 
   else if (action === 'get_config') {
     var userId = e.parameter.userId;
+    // 裝置帶上已知版本：版本沒變就只回 not_modified，不讀 Users 表
+    var known = e.parameter.ver;
+    if (known) {
+      var current = getConfigVersion(userId);
+      if (current && current === known) return responseJSON({ 'status': 'not_modified', 'version': current });
+    }
     var config = getUserConfig(userId); 
+    // hour / minute / days 保留給舊版韌體 (= 第一個時段)，新版讀 doses
     if (config) {
-      return responseJSON({ 'status': 'success', 'hour': config.hour, 'minute': config.minute, 'enabled': true, 'days': config.days });
+      setConfigVersion(userId, config.version);
+      return responseJSON({ 'status': 'success', 'hour': config.hour, 'minute': config.minute, 'enabled': true, 'days': config.days, 'doses': config.doses, 'version': config.version });
     } else {
-      return responseJSON({ 'status': 'success', 'hour': 8, 'minute': 0, 'enabled': false, 'days': [false,false,false,false,false,false,false] });
+      setConfigVersion(userId, '0');
+      return responseJSON({ 'status': 'success', 'hour': 8, 'minute': 0, 'enabled': false, 'days': [false,false,false,false,false,false,false], 'doses': [], 'version': '0' });
     }
   }
 
@@ -39,6 +58,15 @@ function doGet(e) {
        return responseJSON({ 'status': 'success' });
      }
   }
+
+  else if (action === 'batch') {
+    // 離線日誌批次上傳：events=seq.action.ts,seq.action.ts,...
+    var userId = e.parameter.userId;
+    if (userId) {
+      var events = parseBatchEvents(e.parameter.events);
+      return responseJSON(applyBatch(userId, e.parameter.jid, events));
+    }
+  }
   return ContentService.createTextOutput("GAS Online");
 }
 
@@ -46,7 +74,18 @@ function doGet(e) {
 // 2. doPost (LINE 寫入用)
 // ==========================================
 function doPost(e) {
+  var out = handlePost(e);
+  flushOutbox();
+  return out;
+}
+
+function handlePost(e) {
   var msg = JSON.parse(e.postData.contents);
+  // 裝置端批次上傳：{ action: 'batch', userId, jid, events: [{seq, action, ts}] }
+  if (msg.action === 'batch') {
+    if (!msg.userId) return responseJSON({ 'status': 'error', 'message': 'No userId' });
+    return responseJSON(applyBatch(msg.userId, msg.jid, msg.events || []));
+  }
   if (msg.events) { 
     var event = msg.events[0];
     if (event.type === 'message') {
@@ -64,9 +103,10 @@ function doPost(e) {
       else {
          var result = parseNaturalLanguage(text);
          if (result.isValid) {
-           saveUserConfig(userId, result.hour, result.minute, result.days);
+           saveUserConfig(userId, result.hour, result.minute, result.days, result.doses);
            var dayStr = getDayString(result.days);
-           replyLine(event.replyToken, "✅ 設定成功！\n⏰ 時間：" + pad(result.hour) + ":" + pad(result.minute) + "\n📅 頻率：" + dayStr + "\n\n(請記得按 ESP32 的 Sync Cloud 同步)");
+           var timeStr = result.doses.map(function(d) { return pad(d.hour) + ":" + pad(d.minute); }).join("、");
+           replyLine(event.replyToken, "✅ 設定成功！\n⏰ 時間：" + timeStr + "\n📅 頻率：" + dayStr + "\n\n(藥盒會在幾分鐘內自動更新)");
          } else {
            if (text.includes("點") || text.includes("時") || text.includes(":")) {
              replyLine(event.replyToken, "🤔 我聽不太懂時間，請試著說：\n「每天早上9點吃藥」\n「每週一三五晚上8點半」");
@@ -81,57 +121,161 @@ function doPost(e) {
 // ==========================================
 // 3. 儲存與讀取 
 // ==========================================
-function saveUserConfig(userId, h, m, daysConfig) {
+// doses: [{hour, minute, days, box}]，第一個時段同時寫入舊的 AlarmHour / AlarmMinute / AlarmDays 欄
+// 每次儲存都換一個新版本 (ConfigVersion 欄 + Script Properties)，裝置輪詢時比對
+// 列號由 findUserRow 查索引取得，只讀寫該列
+var USER_COLS = 8;
+
+function saveUserConfig(userId, h, m, daysConfig, doses) {
   var sheet = SpreadsheetApp.openById(SHEET_ID).getSheetByName('Users');
-  var data = sheet.getDataRange().getValues();
-  var rowIndex = -1;
+  if (!doses) doses = [{ hour: h, minute: m, days: daysConfig, box: 0 }];
   
-  if (data[0].length < 6) { 
-    sheet.getRange(1, 4).setValue("AlarmHour"); 
-    sheet.getRange(1, 5).setValue("AlarmMinute"); 
-    sheet.getRange(1, 6).setValue("AlarmDays"); 
+  if (sheet.getLastColumn() < USER_COLS) { 
+    sheet.getRange(1, 4, 1, 5).setValues([["AlarmHour", "AlarmMinute", "AlarmDays", "AlarmDoses", "ConfigVersion"]]);
   }
 
-  for (var i = 1; i < data.length; i++) {
-    if (data[i][0] == userId) {
-      rowIndex = i + 1;
-      break;
+  var lock = LockService.getScriptLock();
+  lock.waitLock(10000);
+  try {
+    var found = findUserRow(sheet, userId, 1);
+    var rowIndex = found ? found.row : -1;
+    if (rowIndex == -1) {
+      sheet.appendRow([userId, 'User', new Date(), '', '', '', '', '']);
+      rowIndex = sheet.getLastRow();
+      setRowIndex('urow_' + userId, rowIndex, CACHE_MAX_S);
     }
-  }
 
-  if (rowIndex == -1) {
-    sheet.appendRow([userId, 'User', new Date(), '', '', '']);
-    rowIndex = sheet.getLastRow();
+    // 強制設定格式為整數 "0"，避免 Google 雞婆轉成時間格式；版本用文字格式
+    var version = String(new Date().getTime());
+    sheet.getRange(rowIndex, 4, 1, 5)
+      .setNumberFormats([["0", "0", "@", "@", "@"]])
+      .setValues([[h, m, JSON.stringify(daysConfig), JSON.stringify(doses), version]]);
+    setConfigVersion(userId, version);
+  } finally {
+    lock.releaseLock();
   }
+}
 
-  // 強制設定格式為整數 "0"，避免 Google 雞婆轉成時間格式
-  sheet.getRange(rowIndex, 4).setNumberFormat("0").setValue(h);
-  sheet.getRange(rowIndex, 5).setNumberFormat("0").setValue(m);
-  sheet.getRange(rowIndex, 6).setValue(JSON.stringify(daysConfig)); 
+// 版本號放在 Script Properties，輪詢時不必讀整張 Users 表
+function getConfigVersion(userId) {
+  return PropertiesService.getScriptProperties().getProperty('cfgver_' + userId);
+}
+function setConfigVersion(userId, version) {
+  var props = PropertiesService.getScriptProperties();
+  var key = 'cfgver_' + userId;
+  if (props.getProperty(key) !== version) props.setProperty(key, version);
 }
 
 function getUserConfig(userId) {
   var sheet = SpreadsheetApp.openById(SHEET_ID).getSheetByName('Users');
-  var data = sheet.getDataRange().getValues();
+  var found = findUserRow(sheet, userId, USER_COLS);
+  if (!found) return null;
+  var row = found.values;
+
+  var hour = parseInt(row[3]);
+  var minute = parseInt(row[4]);
   
-  for (var i = 1; i < data.length; i++) {
-    if (data[i][0] == userId) {
-      var hour = parseInt(data[i][3]);
-      var minute = parseInt(data[i][4]);
-      
-      if (isNaN(hour)) hour = 0;
-      if (isNaN(minute)) minute = 0;
+  if (isNaN(hour)) hour = 0;
+  if (isNaN(minute)) minute = 0;
 
-      var daysStr = data[i][5];
-      var days = [false,false,false,false,false,false,false];
-      try { if(daysStr) days = JSON.parse(daysStr); } catch(e){}
+  var daysStr = row[5];
+  var days = [false,false,false,false,false,false,false];
+  try { if(daysStr) days = JSON.parse(daysStr); } catch(e){}
 
-      return { hour: hour, minute: minute, days: days };
+  // 舊資料沒有 AlarmDoses 欄，用單一時段補上
+  var doses = null;
+  try { if (row[6]) doses = JSON.parse(row[6]); } catch(e){}
+  if (!doses || !doses.length) doses = [{ hour: hour, minute: minute, days: days, box: 0 }];
+
+  // 舊資料沒有 ConfigVersion：用 "1"，下次儲存時換成新版本
+  var version = row[7] ? String(row[7]) : '1';
+  return { hour: hour, minute: minute, days: days, doses: doses, version: version };
+}
+
+// ------------------------------------------
+// 列號索引
+// ------------------------------------------
+// userId -> 列號、綁定碼 -> 列號都存在 Script Cache (過期後掃描一次第一欄重建)；
+// 不放 Script Properties，總容量留給版本號、seq 與寫入佇列 (見第 6 節)。
+// 查到列號後一次讀出該列 cols 欄 ({row, values})，第一欄就是驗證：
+// 索引因手動編輯或壓縮而過時時，改掃描第一欄並更新索引。
+var CODE_CACHE_S = 15 * 60;
+var CACHE_MAX_S = 6 * 3600;  // Script Cache 的最長保存時間
+
+function getRowIndex(key) {
+  var v = CacheService.getScriptCache().get(key);
+  return v ? parseInt(v) : -1;
+}
+function setRowIndex(key, row, ttl) {
+  CacheService.getScriptCache().put(key, String(row), ttl);
+}
+
+function readIndexedRow(sheet, key, cols) {
+  var row = getRowIndex(key);
+  if (row < 1) return null;
+  return { row: row, values: sheet.getRange(row, 1, 1, cols).getValues()[0] };
+}
+
+function findUserRow(sheet, userId, cols) {
+  var key = 'urow_' + userId;
+  var found = readIndexedRow(sheet, key, cols);
+  if (found && found.row > 1 && found.values[0] == userId) return found;
+  // 索引沒有或過時：掃描第一欄
+  var ids = sheet.getRange(1, 1, sheet.getLastRow(), 1).getValues();
+  for (var i = 1; i < ids.length; i++) {
+    if (ids[i][0] == userId) {
+      setRowIndex(key, i + 1, CACHE_MAX_S);
+      return { row: i + 1, values: sheet.getRange(i + 1, 1, 1, cols).getValues()[0] };
+    }
+  }
+  return null;
+}
+
+function findCodeRow(sheet, code, cols) {
+  var key = 'crow_' + code;
+  var found = readIndexedRow(sheet, key, cols);
+  if (found && found.values[0].toString() === code) return found;
+  // 快取沒有：從最新的一列往回掃第一欄
+  var codes = sheet.getRange(1, 1, Math.max(sheet.getLastRow(), 1), 1).getValues();
+  for (var i = codes.length - 1; i >= 0; i--) {
+    if (codes[i][0].toString() === code) {
+      setRowIndex(key, i + 1, CODE_CACHE_S);
+      return { row: i + 1, values: sheet.getRange(i + 1, 1, 1, cols).getValues()[0] };
     }
   }
   return null;
 }
 
+// 刪除已使用或過期的綁定碼 (由 setupTriggers 建立的每小時觸發器呼叫)。
+// 列號會移動，壓縮後重建剩餘代碼的快取索引
+function compactCodes() {
+  var sheet = SpreadsheetApp.openById(SHEET_ID).getSheetByName('Codes');
+  var lock = LockService.getScriptLock();
+  lock.waitLock(10000);
+  try {
+    var last = sheet.getLastRow();
+    if (last < 1) return 0;
+    var data = sheet.getRange(1, 1, last, 4).getValues();
+    var now = new Date().getTime();
+    // 到期時間不是數字的列 (標題列) 保留
+    var keep = data.filter(function(r) { return typeof r[2] !== 'number' || (r[3] !== "USED" && now <= r[2]); });
+    if (keep.length === data.length) return 0;
+    sheet.getRange(1, 1, last, 4).clearContent();
+    if (keep.length) sheet.getRange(1, 1, keep.length, 4).setValues(keep);
+    var rows = {};
+    for (var i = 0; i < keep.length; i++) rows['crow_' + keep[i][0]] = String(i + 1);
+    CacheService.getScriptCache().putAll(rows, CODE_CACHE_S);
+    return data.length - keep.length;
+  } finally {
+    lock.releaseLock();
+  }
+}
+
+function setupTriggers() {
+  ScriptApp.newTrigger('compactCodes').timeBased().everyHours(1).create();
+  ScriptApp.newTrigger('drainOutbox').timeBased().everyMinutes(1).create();
+}
+
 // ==========================================
 // 4. 其他輔助函式
 // ==========================================
@@ -171,7 +315,27 @@ function parseNaturalLanguage(text) {
   }
 
   if (hour >= 24) hour = 0; if (minute >= 60) minute = 0;
-  return { isValid: isValid, hour: hour, minute: minute, days: days };
+  var doses = isValid ? parseDoseTimes(text, days) : [];
+  if (doses.length < 2) doses = [{ hour: hour, minute: minute, days: days, box: 0 }];
+  else { hour = doses[0].hour; minute = doses[0].minute; }
+  return { isValid: isValid, hour: hour, minute: minute, days: days, doses: doses };
+}
+
+// 一句話裡有多個時間 (例如「每天早上8點和晚上8點半」) 時，每個時間各成一個時段；
+// 上午 / 下午只看該時間前面那一段文字
+function parseDoseTimes(text, days) {
+  var re = /(\d{1,2})[:：點時](\d{1,2}|半)?/g;
+  var doses = []; var last = 0; var m;
+  while ((m = re.exec(text)) !== null) {
+    var seg = text.substring(last, m.index);
+    last = re.lastIndex;
+    var h = parseInt(m[1]); var min = 0;
+    if (m[2] === '半') min = 30; else if (m[2]) min = parseInt(m[2]);
+    if (/下午|晚上|晚間|PM|pm/.test(seg) && h < 12) h += 12;
+    if (h >= 24) h = 0; if (min >= 60) min = 0;
+    doses.push({ hour: h, minute: min, days: days, box: 0 });
+  }
+  return doses;
 }
 
 function responseJSON(data) {
@@ -187,26 +351,119 @@ function generateCode(userId) {
   var code = Math.floor(100000 + Math.random() * 900000).toString();
   var sheet = SpreadsheetApp.openById(SHEET_ID).getSheetByName('Codes');
   var expireTime = new Date().getTime() + 5*60*1000; 
-  sheet.appendRow([code, userId, expireTime, "WAIT"]); 
+  var lock = LockService.getScriptLock();
+  lock.waitLock(10000);
+  try {
+    sheet.appendRow([code, userId, expireTime, "WAIT"]); 
+    setRowIndex('crow_' + code, sheet.getLastRow(), CODE_CACHE_S);
+  } finally {
+    lock.releaseLock();
+  }
   return code;
 }
 function verifyCode(inputCode) {
+  if (!inputCode) return { status: 'error', message: 'Code not found' };
   var sheet = SpreadsheetApp.openById(SHEET_ID).getSheetByName('Codes');
-  var data = sheet.getDataRange().getValues();
-  var now = new Date().getTime();
-  for (var i = data.length - 1; i >= 0; i--) {
-    if (data[i][0].toString() === inputCode.toString()) {
-      if (data[i][3] === "USED") return { status: 'error', message: 'Code already used' };
-      if (now > data[i][2]) return { status: 'error', message: 'Code expired' };
-      sheet.getRange(i + 1, 4).setValue("USED");
-      return { status: 'success', userId: data[i][1] };
-    }
+  // 與 compactCodes 同一把鎖：壓縮會搬動列，查列號到標記 USED 之間不能被搬走
+  var lock = LockService.getScriptLock();
+  lock.waitLock(10000);
+  try {
+    var found = findCodeRow(sheet, inputCode.toString(), 4);
+    if (!found) return { status: 'error', message: 'Code not found' };
+    var rowIndex = found.row; var row = found.values;
+    var now = new Date().getTime();
+    if (row[3] === "USED") return { status: 'error', message: 'Code already used' };
+    if (now > row[2]) return { status: 'error', message: 'Code expired' };
+    sheet.getRange(rowIndex, 4).setValue("USED");
+    return { status: 'success', userId: row[1] };
+  } finally {
+    lock.releaseLock();
+  }
+}
+function logAction(userId, note, when, type) {
+  queueRow('Logs', [(when || new Date()).getTime(), userId, type || 'Eat', note]);
+}
+function logDeviceStats(userId, st) {
+  queueRow('Stats', [new Date().getTime(), userId || '', st]);
+}
+
+// ==========================================
+// 5. 離線日誌批次處理
+// ==========================================
+var BATCH_FRESH_MS = 10 * 60 * 1000; // 超過 10 分鐘的事件只記錄，不再推播
+var SEQ_JIDS = 2;                    // 每位使用者保留幾個 journal id 的 seq (裝置清 flash 後換新的 jid)
+
+function parseBatchEvents(str) {
+  var events = [];
+  if (!str) return events;
+  var parts = str.split(',');
+  for (var i = 0; i < parts.length; i++) {
+    var p = parts[i].split('.');
+    if (p.length !== 3) continue;
+    events.push({ seq: parseInt(p[0]), action: p[1], ts: parseInt(p[2]) });
+  }
+  return events;
+}
+
+// seq_<userId> = "jid:seq jid:seq"，最近上傳的 journal id 在前，最多 SEQ_JIDS 個 (每位使用者只佔一個屬性)
+function readSeqs(v) {
+  var out = [];
+  if (!v) return out;
+  v.split(' ').forEach(function(p) {
+    var i = p.lastIndexOf(':');
+    if (i >= 0) out.push([p.substring(0, i), parseInt(p.substring(i + 1)) || 0]);
+  });
+  return out;
+}
+function writeSeqs(seqs, jid, seq) {
+  var out = [jid + ':' + seq];
+  for (var i = 0; i < seqs.length && out.length < SEQ_JIDS; i++) {
+    if (seqs[i][0] !== jid) out.push(seqs[i][0] + ':' + seqs[i][1]);
   }
-  return { status: 'error', message: 'Code not found' };
+  return out.join(' ');
 }
-function logAction(userId, note) {
-  var sheet = SpreadsheetApp.openById(SHEET_ID).getSheetByName('Logs');
-  sheet.appendRow([new Date(), userId, 'Eat', note]);
+
+// 依 seq 去重後寫入，回傳已處理到的最大 seq 讓裝置清掉日誌
+function applyBatch(userId, jid, events) {
+  var props = PropertiesService.getScriptProperties();
+  var key = 'seq_' + userId;
+  jid = jid || '';
+  var lock = LockService.getScriptLock();
+  lock.waitLock(10000);
+  try {
+    var seqs = readSeqs(props.getProperty(key));
+    var lastSeq = 0;
+    seqs.forEach(function(p) { if (p[0] === jid) lastSeq = p[1]; });
+    var acked = lastSeq;
+    var now = new Date().getTime();
+    events.sort(function(a, b) { return a.seq - b.seq; });
+    for (var i = 0; i < events.length; i++) {
+      var ev = events[i];
+      if (isNaN(ev.seq) || ev.seq <= lastSeq) continue; // 重送
+      var when = new Date(ev.ts * 1000);
+      var fresh = (now - when.getTime()) < BATCH_FRESH_MS;
+      // eat:N = 開啟第 N 格藥盒，單純 eat = 按鈕 / 選單紀錄
+      var parts = String(ev.action).split(':');
+      if (parts[0] === 'eat' && parts.length > 1) {
+        logAction(userId, "ESP32開蓋(藥格" + parts[1] + ")", when);
+        if (fresh) pushMessageToUser(userId, "✅ 偵測到第 " + parts[1] + " 格藥盒已打開，吃藥紀錄成功！");
+      } else if (ev.action === 'eat') {
+        logAction(userId, "ESP32按鈕(批次)", when);
+        if (fresh) pushMessageToUser(userId, "✅ 您已按下實體按鈕，吃藥紀錄成功！");
+      } else if (ev.action === 'notify_alarm') {
+        logAction(userId, "ESP32鬧鐘(批次)", when, 'Alarm');
+        if (fresh) pushMessageToUser(userId, "⏰ 時間到了！請記得吃藥 💊\n(若已服藥，請打開藥盒蓋子或按下按鈕)");
+      }
+      acked = ev.seq;
+    }
+    // 佇列與 seq 同一次寫入：不會有已確認卻沒記錄的事件
+    var extra = {};
+    if (acked > lastSeq) extra[key] = writeSeqs(seqs, jid, acked);
+    flushOutbox(extra);
+    return { 'status': 'success', 'acked': acked };
+  } finally {
+    lock.releaseLock();
+  }
 }
 function replyLine(replyToken, text) {
   UrlFetchApp.fetch('https://api.line.me/v2/bot/message/reply', {
@@ -216,11 +473,133 @@ function replyLine(replyToken, text) {
   });
 }
 function pushMessageToUser(userId, text) {
+  OUTBOX.push({ p: userId, t: text, n: 0 });
+}
+function pushRequest(userId, text) {
+  return {
+    'url': 'https://api.line.me/v2/bot/message/push',
+    'headers': { 'Content-Type': 'application/json', 'Authorization': 'Bearer ' + CHANNEL_ACCESS_TOKEN },
+    'method': 'post',
+    'muteHttpExceptions': true,
+    'payload': JSON.stringify({ 'to': userId, 'messages': [{'type': 'text', 'text': text}] })
+  };
+}
+
+// ==========================================
+// 6. 寫入 / 推播佇列
+// ==========================================
+// 一次執行中的紀錄列與推播先收集在 OUTBOX，回應前以 flushOutbox 寫成一個 q_ 屬性 (一次寫入)；
+// drainOutbox 每分鐘把所有 q_ 取出：同一工作表的列一次 setValues，推播一次 fetchAll。
+// 推播遇到 429 / 5xx 重新排入佇列，最多 PUSH_TRIES 次。
+// Script Properties 總容量約 500KB，版本號與 seq 也在裡面：用量估計 (Script Cache 的 props_bytes，
+// drainOutbox 每分鐘以實際內容重算) 加上這次的佇列超過 PROPS_BUDGET 時不排入，
+// 直接寫入試算表並推播 (較慢，但 setProperties 不會因容量不足丟出例外)。
+var OUTBOX = [];
+var OUTBOX_CHUNK = 8000;  // 單一屬性值上限 9KB
+var PUSH_TRIES = 3;
+var PROPS_BUDGET = 400 * 1024;
+
+function queueRow(sheetName, row) {
+  OUTBOX.push({ s: sheetName, r: row });
+}
+
+function byteLength(s) {
+  return unescape(encodeURIComponent(s)).length;
+}
+
+// extra：要一起寫入的其他屬性 (例如 applyBatch 的 seq)，與佇列同一次寫入
+function flushOutbox(extra) {
+  var items = {};
+  if (extra) for (var k in extra) items[k] = extra[k];
+  var queue = OUTBOX;
+  OUTBOX = [];
+  if (queue.length) {
+    var base = 'q_' + new Date().getTime() + '_' + Math.floor(Math.random() * 1e6) + '_';
+    var chunks = {}; var part = []; var size = 0; var n = 0; var bytes = 0;
+    for (var i = 0; i <= queue.length; i++) {
+      var json = i < queue.length ? JSON.stringify(queue[i]) : null;
+      if (part.length && (json === null || size + json.length > OUTBOX_CHUNK)) {
+        var v = '[' + part.join(',') + ']';
+        chunks[base + n] = v;
+        bytes += byteLength(base + n) + byteLength(v);
+        n++; part = []; size = 0;
+      }
+      if (json !== null) { part.push(json); size += json.length + 1; }
+    }
+    var cache = CacheService.getScriptCache();
+    var used = parseInt(cache.get('props_bytes')) || 0;
+    if (used + bytes > PROPS_BUDGET) {
+      // 佇列太大：直接寫入，推播失敗的不再重試
+      sendPushes(writeRows(queue));
+    } else {
+      for (var k in chunks) items[k] = chunks[k];
+      cache.put('props_bytes', String(used + bytes), CACHE_MAX_S);
+    }
+  }
+  if (Object.keys(items).length) PropertiesService.getScriptProperties().setProperties(items);
+}
+
+// 佇列項目中的列寫入試算表 (同一工作表一次 setValues)，回傳其中的推播
+function writeRows(items) {
+  var rows = {}; var pushes = [];
+  items.forEach(function(it) {
+    if (it.s) {
+      it.r[0] = new Date(it.r[0]);
+      (rows[it.s] = rows[it.s] || []).push(it.r);
+    } else if (it.p) pushes.push(it);
+  });
+  var ss = SpreadsheetApp.openById(SHEET_ID);
+  for (var name in rows) {
+    var sheet = ss.getSheetByName(name);
+    if (!sheet) continue; // 沒有建立 Stats 工作表就不記錄
+    var r = rows[name];
+    sheet.getRange(sheet.getLastRow() + 1, 1, r.length, r[0].length).setValues(r);
+  }
+  return pushes;
+}
+
+// 推播一次 fetchAll，回傳遇到 429 / 5xx 可以再試的項目
+function sendPushes(pushes) {
+  var retry = [];
+  if (!pushes.length) return retry;
+  var res = null;
+  try { res = UrlFetchApp.fetchAll(pushes.map(function(it) { return pushRequest(it.p, it.t); })); }
+  catch (e) {} // 網路錯誤：全部視為可重試
+  for (var i = 0; i < pushes.length; i++) {
+    var code = res ? res[i].getResponseCode() : 599;
+    if ((code === 429 || code >= 500) && pushes[i].n + 1 < PUSH_TRIES) {
+      retry.push({ p: pushes[i].p, t: pushes[i].t, n: pushes[i].n + 1 });
+    }
+  }
+  return retry;
+}
+
+function drainOutbox() {
+  var lock = LockService.getScriptLock();
+  if (!lock.tryLock(1000)) return; // 上一次還在處理
   try {
-    UrlFetchApp.fetch('https://api.line.me/v2/bot/message/push', {
-      'headers': { 'Content-Type': 'application/json', 'Authorization': 'Bearer ' + CHANNEL_ACCESS_TOKEN },
-      'method': 'post',
-      'payload': JSON.stringify({ 'to': userId, 'messages': [{'type': 'text', 'text': text}] })
+    var props = PropertiesService.getScriptProperties();
+    var all = props.getProperties();
+    var keys = []; var used = 0;
+    for (var k in all) {
+      if (k.indexOf('q_') === 0) keys.push(k);
+      else used += byteLength(k) + byteLength(all[k]);
+    }
+    // 佇列清空後的用量 (之後 flushOutbox 再往上加)
+    CacheService.getScriptCache().put('props_bytes', String(used), CACHE_MAX_S);
+    if (!keys.length) return;
+    keys.sort();
+    var items = [];
+    keys.forEach(function(k) {
+      try { items = items.concat(JSON.parse(all[k])); } catch(e) {}
     });
-  } catch(e) {}
+
+    var pushes = writeRows(items);
+    // 列已寫入：先刪除佇列，推播失敗的重新排入
+    keys.forEach(function(k) { props.deleteProperty(k); });
+    OUTBOX = sendPushes(pushes);
+    if (OUTBOX.length) flushOutbox();
+  } finally {
+    lock.releaseLock();
+  }
 }
\ No newline at end of file
@@ -0,0 +1,105 @@
+# ==========================================
+# 主機端量測：旋鈕解碼吞吐量 (CPython)
+# ==========================================
+# 以假腳位產生正交邊緣序列 (含接點彈跳)，直接呼叫 Encoder.edge 模擬中斷，
+# 消費端每 DRAIN_MS 才取一次佇列 (模擬主程式忙碌)，檢查：
+#   1. 每一格都有事件、方向正確 (沒有漏格 / 反向)
+#   2. 佇列沒有溢位
+# 任一速率失敗則以非零狀態結束。
+#
+#   python host/bench_encoder.py [格數]
+import os
+import random
+import sys
+import time
+
+HERE = os.path.dirname(__file__)
+sys.path.insert(0, os.path.join(HERE, "..", "ESP32"))
+import inputq  # noqa: E402
+from inputq import InputQueue, Encoder, EV_CW  # noqa: E402
+
+RATES = (50, 200, 500, 1000, 2000)   # 每秒格數
+DRAIN_MS = 20
+BOUNCE = 0.3                         # 每個邊緣附帶彈跳的機率
+
+# 逆時針 (CLK 先下降) 一格的 (CLK, DT) 序列，順時針反過來走
+CCW_SEQ = ((0, 1), (0, 0), (1, 0), (1, 1))
+CW_SEQ = ((1, 0), (0, 0), (0, 1), (1, 1))
+
+
+class FakePin:
+    IRQ_FALLING = 1
+    IRQ_RISING = 2
+
+    def __init__(self, v=1):
+        self.v = v
+
+    def value(self):
+        return self.v
+
+    def irq(self, trigger=None, handler=None):
+        pass
+
+
+class SimClock:
+    def __init__(self):
+        self.us = 0
+
+    def ticks_ms(self):
+        return self.us // 1000
+
+
+def run(rate, steps, rng):
+    clock = SimClock()
+    inputq.ticks_ms = clock.ticks_ms
+    clk, dt = FakePin(), FakePin()
+    q = InputQueue()
+    enc = Encoder(clk, dt, q)
+    edge_us = 1000000 // (rate * 4)
+    next_drain = DRAIN_MS * 1000
+    expected = []
+    got = []
+
+    def drain():
+        while True:
+            ev = q.get()
+            if ev is None: break
+            got.append(1 if ev[0] == EV_CW else -1)
+
+    def set_pins(a, b):
+        clk.v, dt.v = a, b
+        enc.edge(clk)
+
+    direction = 1
+    for _ in range(steps):
+        if rng.random() < 0.05: direction = -direction  # 偶爾換方向
+        prev = (clk.v, dt.v)
+        for a, b in (CW_SEQ if direction > 0 else CCW_SEQ):
+            if rng.random() < BOUNCE:
+                # 變化的那隻腳先抖動一次再穩定
+                set_pins(a, b); set_pins(*prev)
+            set_pins(a, b)
+            prev = (a, b)
+            clock.us += edge_us
+            if clock.us >= next_drain:
+                drain()
+                next_drain += DRAIN_MS * 1000
+        expected.append(direction)
+    drain()
+    return expected, got, q.dropped
+
+
+if __name__ == "__main__":
+    steps = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    rng = random.Random(1)
+    ok = True
+    print(f"{'steps/s':>8}{'sent':>8}{'got':>8}{'wrong':>8}{'dropped':>9}{'host us/edge':>14}")
+    for rate in RATES:
+        t0 = time.perf_counter()
+        expected, got, dropped = run(rate, steps, rng)
+        per_edge = (time.perf_counter() - t0) * 1e6 / (steps * 4)
+        wrong = sum(1 for a, b in zip(expected, got) if a != b) + abs(len(expected) - len(got))
+        print(f"{rate:>8}{len(expected):>8}{len(got):>8}{wrong:>8}{dropped:>9}{per_edge:>14.2f}")
+        if wrong or dropped: ok = False
+    print("OK" if ok else "FAIL")
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,146 @@
+# ==========================================
+# 主機端量測：Apps Script 後端 列號索引 vs 整表掃描 (CPython)
+# ==========================================
+# 以 mock_gas.MockGAS 重播同一串裝置 / LINE 請求，比較兩種查詢方式：
+#   scan  : 舊版 Code.gs，getUserConfig / saveUserConfig / verifyCode 每次讀整張表
+#   index : userId / 綁定碼 -> 列號 (Script Cache)，只讀寫單列
+# 統計每個請求的試算表呼叫次數、讀取儲存格數與 Python 執行時間；兩種方式的回應必須完全相同。
+# 接著對 Codes 表執行 compactCodes，確認壓縮後綁定照常運作。
+# 最後比較裝置事件 (batch) 的處理：
+#   direct : 每筆紀錄 appendRow + 每則推播 fetch，都在回應裝置之前
+#   queued : 回應前只寫一次佇列屬性，觸發器每分鐘批次 setValues + fetchAll
+# 裝置等待的是「請求路徑上的服務呼叫」，兩種方式最後寫入的紀錄與推播必須相同。
+#
+#   python host/bench_gas.py [使用者數] [請求數]
+import random
+import sys
+import time
+
+from mock_gas import MockGAS
+
+DOSES = [{"hour": 8, "minute": 0, "days": [True] * 7, "box": 1},
+         {"hour": 20, "minute": 30, "days": [True] * 5 + [False] * 2, "box": 2}]
+OLD_CODES_PER_USER = 5      # 每位使用者過去產生過的綁定碼 (Codes 表從未清理)
+START = 1767225600
+
+
+class Clock:
+    def __init__(self):
+        self.t = START
+
+    def __call__(self):
+        return self.t
+
+
+def seed(gas, users, rng):
+    for i in range(users):
+        gas.add_user(f"U{i:05d}", DOSES)
+    for i in range(users * OLD_CODES_PER_USER):
+        code = gas.generate_code(f"U{rng.randrange(users):05d}")
+        if rng.random() < 0.7: gas.verify_code(code)
+
+
+def workload(users, n, rng):
+    # (action, userId)；一半以上是開機 / 手動同步的完整 get_config
+    out = []
+    for _ in range(n):
+        uid = f"U{rng.randrange(users):05d}"
+        r = rng.random()
+        if r < 0.55: out.append(("get_config", uid))
+        elif r < 0.75: out.append(("poll", uid))
+        elif r < 0.85: out.append(("batch", uid))
+        elif r < 0.95: out.append(("line_edit", uid))
+        else: out.append(("bind", uid))
+    return out
+
+
+def service_calls(gas):
+    return gas.prop_writes + gas.row_writes + gas.fetch_calls
+
+
+def run_events(queued, users, reqs):
+    # 每個請求是一批 1~3 個新事件；觸發器在請求之間照時間執行
+    clock = Clock()
+    gas = MockGAS(clock=clock, queued=queued)
+    rng = random.Random(4)
+    seqs = {}
+    path = 0
+    trigger = 0
+    for _ in range(reqs):
+        clock.t += rng.randint(1, 5)
+        uid = f"U{rng.randrange(users):05d}"
+        events = []
+        for _ in range(rng.randint(1, 3)):
+            seqs[uid] = seqs.get(uid, 0) + 1
+            events.append(f"{seqs[uid]}.{rng.choice(['eat', 'eat:1', 'eat:2', 'notify_alarm'])}.{clock.t}")
+        c0 = service_calls(gas)
+        gas._tick()
+        c1 = service_calls(gas)
+        gas._handle_get({"action": "batch", "userId": uid, "jid": "j", "events": ",".join(events)})
+        if queued: gas.flush_outbox()
+        trigger += c1 - c0
+        path += service_calls(gas) - c1
+    c0 = service_calls(gas)
+    gas.drain_outbox()
+    trigger += service_calls(gas) - c0
+    return gas, path / reqs, trigger / reqs
+
+
+def run(indexed, users, reqs):
+    clock = Clock()
+    gas = MockGAS(clock=clock, indexed=indexed, rng=random.Random(1))
+    seed(gas, users, random.Random(2))
+    calls0, cells0 = gas.sheet_calls(), gas.cells_read()
+    replies = []
+    t0 = time.perf_counter()
+    for i, (action, uid) in enumerate(workload(users, reqs, random.Random(3))):
+        clock.t += 1
+        if action == "get_config":
+            r = gas.do_get({"action": "get_config", "userId": uid})
+        elif action == "poll":
+            r = gas.do_get({"action": "get_config", "userId": uid, "ver": gas.get_config_version(uid) or "1"})
+        elif action == "batch":
+            r = gas.do_get({"action": "batch", "userId": uid, "jid": "j", "events": f"{i}.eat:1.{clock.t}"})
+        elif action == "line_edit":
+            r = gas.save_user_config(uid, DOSES)
+        else:
+            r = gas.do_get({"action": "bind", "code": gas.generate_code(uid)})
+        replies.append(r)
+    wall = time.perf_counter() - t0
+    return gas, replies, (gas.sheet_calls() - calls0) / reqs, (gas.cells_read() - cells0) / reqs, wall / reqs * 1e6
+
+
+if __name__ == "__main__":
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    reqs = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    print(f"{users} users, {users * OLD_CODES_PER_USER} old codes, {reqs} requests")
+    print(f"{'mode':<8}{'calls/req':>11}{'cells read/req':>16}{'us/req':>10}")
+    results = {}
+    for name, indexed in (("scan", False), ("index", True)):
+        gas, replies, calls, cells, us = run(indexed, users, reqs)
+        results[name] = (gas, replies)
+        print(f"{name:<8}{calls:>11.2f}{cells:>16.1f}{us:>10.1f}")
+    ok = results["scan"][1] == results["index"][1]
+    print("replies identical:", ok)
+
+    # Codes 表壓縮：過期 / 已使用的代碼刪除後，新的綁定碼仍可用 (索引重建)
+    gas = results["index"][0]
+    before = len(gas.codes.rows)
+    gas.clock.t += 3600
+    removed = gas.compact_codes()
+    code = gas.generate_code("U00000")
+    bound = gas.verify_code(code)["status"] == "success"
+    print(f"compactCodes: {before} -> {len(gas.codes.rows)} rows (removed {removed}), bind after compaction: {bound}")
+    ok = ok and bound and len(gas.codes.rows) < before
+
+    print(f"{'events':<8}{'request-path calls/req':>24}{'trigger calls/req':>19}")
+    done = {}
+    for name, queued in (("direct", False), ("queued", True)):
+        g, path, trig = run_events(queued, users, reqs)
+        done[name] = (sorted(g.logs), sorted(g.pushes))
+        print(f"{name:<8}{path:>24.2f}{trig:>19.2f}")
+    same = done["direct"] == done["queued"]
+    print("logs / pushes identical:", same)
+    ok = ok and same
+    print("OK" if ok else "FAIL")
+    sys.exit(0 if ok else 1)
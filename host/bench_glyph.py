@@ -0,0 +1,56 @@
+# ==========================================
+# 主機端量測：每幀繪圖時間，點陣快取 vs framebuf.text (CPython)
+# ==========================================
+# 重播 bench_render 的四個畫面 (時鐘 / 響鈴 / 選單 / 密碼輸入)，
+# Screen.cache 開關各跑一次，比較每幀 (不含 I2C 傳送) 的繪圖時間與畫過的字格數。
+# 主機端 framebuf 是純 Python，時間差距比裝置上誇張；字格數與裝置上的工作量成正比。
+# 兩種模式的 framebuffer 每幀都必須相同 (點陣快取不改變畫面)。
+#
+#   python host/bench_glyph.py [秒數]
+import sys
+import time
+
+from bench_render import CountingI2C, VIEWS
+from render import Screen
+
+
+class TimedScreen(Screen):
+    # show() 只記下畫面與時間，不計入 I2C 傳送
+    def __init__(self, i2c):
+        super().__init__(i2c)
+        self.frames = []
+        self.draw_s = 0.0
+        self._t0 = time.perf_counter()
+
+    def show(self):
+        self.draw_s += time.perf_counter() - self._t0
+        self.frames.append(bytes(self.buf))
+        super().show()
+        self._t0 = time.perf_counter()
+
+
+def measure(view, seconds, cache):
+    scr = TimedScreen(CountingI2C())
+    scr.cache = cache
+    scr.clear()
+    scr._t0 = time.perf_counter()
+    view(scr, seconds)
+    return scr
+
+
+if __name__ == "__main__":
+    secs = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    ok = True
+    print(f"{'view':<10}{'frames':>7}{'text us':>10}{'cache us':>10}{'cells/frame':>16}{'rasterized':>12}")
+    for name, view in VIEWS:
+        plain = measure(view, secs, False)
+        cached = measure(view, secs, True)
+        n = len(plain.frames)
+        same = plain.frames == cached.frames
+        ok = ok and same
+        us = lambda s: s.draw_s * 1e6 / n
+        print(f"{name:<10}{n:>7}{us(plain):>10.0f}{us(cached):>10.0f}"
+              f"{plain.cells / n:>8.1f}->{cached.cells / n:>5.1f}{cached.glyphs.rasterized:>12}"
+              f"{'' if same else '  畫面不同!'}")
+    print("OK" if ok else "FAIL")
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,191 @@
+# ==========================================
+# 主機端量測：HTTPS 連線方式比較 (CPython)
+# ==========================================
+# 在本機架兩個 TLS 伺服器模擬 Apps Script：
+#   script  : /macros/s/.../exec -> 302 轉址到 usercontent
+#   echo    : 轉址目標，chunked 回傳 JSON
+# 每個伺服器前面有一個 TCP 轉送器，計算線上位元組並加入單程延遲 (RTT / 2)。
+# 以 ESP32/httpc.py 重播「數串請求，串與串之間閒置斷線」，比較：
+#   close      : 每次請求都重新連線 (原本 urequests + Connection: close)
+#   keep-alive : 一串請求共用連線
+#   resume     : keep-alive + 重新連線時恢復 TLS session
+#   idle-close : resume，但串與串之間由伺服器端關閉閒置連線 (客戶端不知道)；
+#                沿用前的非阻塞檢查要發現連線已關 (stale)，不能等送出失敗才重連
+# 握手次數以伺服器端的 TCP 連線數為準；ESP32 估計值 = 量測延遲 + 握手數 x ESP32_HANDSHAKE_MS。
+#
+#   python host/bench_https.py [串數] [RTT ms]
+import os
+import shutil
+import socket
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "ESP32"))
+import runtime as rt  # noqa: E402
+from httpc import HttpClient  # noqa: E402
+
+BURST = ("get_config", "batch", "batch")   # 一串請求：開機同步 + 兩次日誌上傳
+ESP32_HANDSHAKE_MS = 1500                  # ESP32 上一次完整 TLS 握手的 CPU 時間 (估計)
+CONFIG_BODY = (b'{"status":"success","hour":8,"minute":0,"enabled":true,'
+               b'"days":[true,true,true,true,true,false,false],'
+               b'"doses":[{"hour":8,"minute":0,"days":[true,true,true,true,true,false,false],"box":1},'
+               b'{"hour":20,"minute":30,"days":[true,true,true,true,true,true,true],"box":2}]}')
+BATCH_BODY = b'{"status":"success","acked":12}'
+
+
+def make_cert(d):
+    if not shutil.which("openssl"): sys.exit("需要 openssl 產生測試憑證")
+    crt = os.path.join(d, "c.pem"); key = os.path.join(d, "k.pem")
+    subprocess.run(["openssl", "req", "-x509", "-newkey", "ec", "-pkeyopt", "ec_paramgen_curve:prime256v1",
+                    "-nodes", "-keyout", key, "-out", crt, "-days", "1", "-subj", "/CN=localhost",
+                    "-addext", "subjectAltName=DNS:localhost,IP:127.0.0.1"],
+                   check=True, capture_output=True)
+    return crt, key
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *a):
+        pass
+
+    def do_GET(self):
+        srv = self.server
+        if srv.role == "script":
+            key = os.urandom(64).hex()
+            body = b"<HTML><HEAD><TITLE>Moved Temporarily</TITLE></HEAD><BODY>The document has moved.</BODY></HTML>"
+            self.send_response(302)
+            self.send_header("Location", f"https://localhost:{srv.echo_port}/macros/echo?user_content_key={key}&lib=M")
+            self.send_header("Content-Type", "text/html; charset=UTF-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            body = CONFIG_BODY if b"get_config" in self.path.encode() else BATCH_BODY
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            half = len(body) // 2
+            for part in (body[:half], body[half:]):
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(part), part))
+            self.wfile.write(b"0\r\n\r\n")
+        if self.headers.get("Connection", "").lower() == "close": self.close_connection = True
+
+
+def tls_server(role, ctx, echo_port=0):
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    srv.daemon_threads = True
+    srv.socket = ctx.wrap_socket(srv.socket, server_side=True)
+    srv.role = role
+    srv.echo_port = echo_port
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv
+
+
+class DelayProxy:
+    # TCP 轉送：每個封包延遲 one_way 秒，統計連線數與位元組
+    def __init__(self, upstream_port, one_way):
+        self.upstream = ("127.0.0.1", upstream_port)
+        self.one_way = one_way
+        self.conns = 0
+        self.bytes = 0
+        self.open = []
+        self.lock = threading.Lock()
+        self.ls = socket.socket()
+        self.ls.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.ls.bind(("127.0.0.1", 0))
+        self.ls.listen(16)
+        self.port = self.ls.getsockname()[1]
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            c, _ = self.ls.accept()
+            u = socket.create_connection(self.upstream)
+            for s in (c, u): s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            with self.lock: self.conns += 1; self.open += [c, u]
+            threading.Thread(target=self._pump, args=(c, u), daemon=True).start()
+            threading.Thread(target=self._pump, args=(u, c), daemon=True).start()
+
+    def _pump(self, src, dst):
+        try:
+            while True:
+                data = src.recv(16384)
+                if not data: break
+                time.sleep(self.one_way)
+                with self.lock: self.bytes += len(data)
+                dst.sendall(data)
+        except OSError: pass
+        for s in (src, dst):
+            try: s.shutdown(socket.SHUT_RDWR)
+            except OSError: pass
+
+    def reset(self):
+        with self.lock: self.conns = 0; self.bytes = 0
+
+    def drop_idle(self):
+        # 伺服器關閉閒置連線：兩端都送 FIN
+        with self.lock: socks, self.open = self.open, []
+        for s in socks:
+            try: s.shutdown(socket.SHUT_RDWR)
+            except OSError: pass
+
+
+async def run_mode(name, client, script_url, proxies, bursts, server_close):
+    for p in proxies: p.reset()
+    lat = []
+    for _ in range(bursts):
+        for action in BURST:
+            t0 = time.perf_counter()
+            r = await client.get(f"{script_url}?device=esp32&action={action}&userId=U1", {"User-Agent": "Mozilla/5.0"})
+            data = await r.json()
+            await r.close()
+            lat.append((time.perf_counter() - t0) * 1000)
+            assert data["status"] == "success"
+        # 串與串之間閒置：連線關閉 (客戶端自己關，或伺服器端關掉閒置連線)
+        if server_close:
+            for p in proxies: p.drop_idle()
+            await rt.sleep_ms(100)
+        else: client.close()
+    await rt.sleep_ms(200)  # 等轉送器把關閉前的資料算完
+    n = len(lat)
+    conns = sum(p.conns for p in proxies)
+    wire = sum(p.bytes for p in proxies)
+    avg = sum(lat) / n
+    est = avg + conns / n * ESP32_HANDSHAKE_MS
+    print(f"{name:<12}{conns / n:>10.2f}{client.resumed:>9}{client.stale:>7}{wire / n:>11.0f}{avg:>10.1f}{max(lat):>9.1f}{est:>12.0f}")
+
+
+if __name__ == "__main__":
+    bursts = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    rtt = int(sys.argv[2]) if len(sys.argv) > 2 else 60
+    tmp = tempfile.mkdtemp()
+    crt, key = make_cert(tmp)
+    sctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    sctx.load_cert_chain(crt, key)
+
+    echo = tls_server("echo", sctx)
+    echo_proxy = DelayProxy(echo.server_address[1], rtt / 2000)
+    script = tls_server("script", sctx, echo_port=echo_proxy.port)
+    script_proxy = DelayProxy(script.server_address[1], rtt / 2000)
+    url = f"https://localhost:{script_proxy.port}/macros/s/TEST/exec"
+
+    print(f"{bursts} bursts x {len(BURST)} requests, RTT {rtt} ms, ESP32 handshake {ESP32_HANDSHAKE_MS} ms (est.)")
+    print(f"{'mode':<12}{'hs/req':>10}{'resumed':>9}{'stale':>7}{'bytes/req':>11}{'avg ms':>10}{'max ms':>9}{'ESP32 est':>12}")
+    ok = True
+    for name, ka, resume, server_close in (("close", False, False, False), ("keep-alive", True, False, False),
+                                           ("resume", True, True, False), ("idle-close", True, True, True)):
+        cctx = ssl.create_default_context(cafile=crt)
+        client = HttpClient(keep_alive=ka, resume=resume, ssl_context=cctx)
+        rt.run(run_mode(name, client, url, (script_proxy, echo_proxy), bursts, server_close))
+        # 伺服器關掉的連線每串開頭都要在送出前被發現 (兩個 host 各一條)
+        if server_close and client.stale < (bursts - 1) * 2: ok = False
+    shutil.rmtree(tmp, ignore_errors=True)
+    print("OK" if ok else "FAIL")
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,124 @@
+# ==========================================
+# 主機端量測：串流 JSON 取值 vs 整包解析 (CPython)
+# ==========================================
+# 1. 正確性：隨機產生的回應以各種分段大小餵給 JsonPicker，結果須與 json.loads 相同；
+#    截斷、格式錯誤、超過上限的回應必須丟出 ValueError。
+# 2. 記憶體：get_config 回應附帶越來越大的無關欄位，以 tracemalloc 量測尖峰配置：
+#    read + json.loads (原本 res.json()) 隨回應長度成長，JsonPicker 維持固定。
+# 任一檢查失敗則以非零狀態結束。
+#
+#   python host/bench_json.py
+import json
+import os
+import random
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "ESP32"))
+from jsonstream import JsonPicker  # noqa: E402
+
+KEYS = ("status", "hour", "minute", "days", "doses")
+DOSES = [{"hour": 8, "minute": 0, "days": [True] * 7, "box": 1},
+         {"hour": 20, "minute": 30, "days": [True] * 5 + [False] * 2, "box": 2}]
+SIZES = (256, 1024, 4096, 16384, 65536)
+READ_BUF = 512      # httpc.BUF_SIZE
+
+
+class BodyStream:
+    # 以固定分段大小吐出內容 (模擬 Response.readinto)
+    def __init__(self, body, step):
+        self.body = body
+        self.step = step
+        self.pos = 0
+
+    def readinto(self, buf):
+        n = min(len(buf), self.step, len(self.body) - self.pos)
+        buf[:n] = self.body[self.pos:self.pos + n]
+        self.pos += n
+        return n
+
+    def read(self):
+        out = bytearray()
+        buf = bytearray(READ_BUF)
+        while True:
+            n = self.readinto(buf)
+            if not n: return bytes(out)
+            out += buf[:n]
+
+
+def rand_value(rng, depth=0):
+    r = rng.random()
+    if depth > 2 or r < 0.4:
+        return rng.choice([0, -12, 3.5, 1e3, True, False, None, "", "a\"b\\c", "時段", "x}y]", "é"])
+    if r < 0.7: return [rand_value(rng, depth + 1) for _ in range(rng.randint(0, 4))]
+    return {rng.choice(["a", "status", "k\"q", "doses"]): rand_value(rng, depth + 1) for _ in range(rng.randint(0, 3))}
+
+
+def check_correct():
+    rng = random.Random(3)
+    picker = JsonPicker(limit=1 << 20)
+    names = ["status", "userId", "acked", "hour", "msg", "days", "st\\u0061tus"]
+    for _ in range(500):
+        doc = {rng.choice(names) + rng.choice(["", "", "x"]): rand_value(rng) for _ in range(rng.randint(0, 6))}
+        body = json.dumps(doc, ensure_ascii=rng.random() < 0.5, indent=rng.choice([None, 1])).encode()
+        want = {k: doc[k] for k in ("status", "userId", "acked", "days") if k in doc}
+        for step in (1, 3, 7, 64, 4096):
+            got = picker.pick(BodyStream(body, step), ("status", "userId", "acked", "days"))
+            if got != want:
+                print("MISMATCH", body, step, got, want)
+                return False
+    bad = [b'', b'{"status":"ok"', b'[1,2]', b'{"a" 1}', b'{"a":1 "b":2}', b'GAS Online',
+           b'{"status":"' + b"x" * 2000 + b'"}']
+    for body in bad:
+        try:
+            JsonPicker(limit=1 << 20).pick(BodyStream(body, 16), ("status",))
+            print("NOT REJECTED", body[:40])
+            return False
+        except ValueError: pass
+    try:
+        JsonPicker(limit=100).pick(BodyStream(b'{"x":"' + b"y" * 200 + b'"}', 64), ("status",))
+        print("LIMIT NOT ENFORCED")
+        return False
+    except ValueError: pass
+    return True
+
+
+def config_body(pad):
+    # 真正需要的欄位在前後，中間是無關的大欄位 (例如後端日後加上的歷史紀錄)
+    head = {"status": "success", "hour": 8, "minute": 0, "enabled": True}
+    tail = {"days": DOSES[0]["days"], "doses": DOSES}
+    filler = []
+    body = b""
+    while len(body) < pad:
+        filler.append({"ts": 1767225600 + len(filler), "type": "Eat", "note": "ESP32開蓋(藥格1)"})
+        body = json.dumps({**head, "history": filler, "message": "ok", **tail}).encode()
+    return body
+
+
+def peak(fn):
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    result = fn()
+    p = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return p, result
+
+
+if __name__ == "__main__":
+    ok = check_correct()
+    print("correctness (500 docs x 5 chunk sizes, malformed, limits):", "ok" if ok else "FAILED")
+
+    picker = JsonPicker(limit=1 << 20)
+    print(f"{'body B':>8}{'json.loads peak':>17}{'picker peak':>13}")
+    peaks = []
+    for size in SIZES:
+        body = config_body(size)
+        p_full, full = peak(lambda: json.loads(BodyStream(body, READ_BUF).read()))
+        p_pick, got = peak(lambda: picker.pick(BodyStream(body, READ_BUF), KEYS))
+        if got != {k: full[k] for k in KEYS}: ok = False
+        peaks.append(p_pick)
+        print(f"{len(body):>8}{p_full:>17}{p_pick:>13}")
+    # 最大與最小回應的尖峰差距不超過 1 KB：與回應長度無關
+    if max(peaks) - min(peaks) > 1024: ok = False
+    print("OK" if ok else "FAIL")
+    sys.exit(0 if ok else 1)
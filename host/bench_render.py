@@ -0,0 +1,102 @@
+# ==========================================
+# 主機端量測：OLED 每秒 I2C 傳輸量 (CPython)
+# ==========================================
+# 以 render.Screen 重播時鐘 / 選單 / 密碼輸入三個畫面，
+# 比較「每次整張重送」(原本 lcd.clear + lcd.show) 與差異更新的位元組數。
+#
+#   python host/bench_render.py [秒數]
+import os
+import sys
+
+HERE = os.path.dirname(__file__)
+sys.path.insert(0, os.path.join(HERE, "..", "ESP32"))
+sys.path.insert(0, HERE)  # 主機端 framebuf 替身
+from render import Screen  # noqa: E402
+
+I2C_HZ = 400000
+BITS_PER_BYTE = 9  # 8 bit + ACK
+
+MENU_ITEMS = ["Set Time", "Set Days", "Sync Cloud", "Bind User", "Log Now", "WiFi Setup", "Back"]
+PASSWORD_CHARS = "0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ!@#$%^&*()_+-=[]{};:'\",.<>/?~`"
+CONTROL_OPTIONS = ["OK", "DEL", "BACK"]
+ENCODER_STEPS_PER_SEC = 4
+
+
+class CountingI2C:
+    def __init__(self):
+        self.bytes = 0
+
+    def writeto(self, addr, buf):
+        self.bytes += 1 + len(buf)
+
+    def writevto(self, addr, bufs):
+        self.bytes += 1 + sum(len(b) for b in bufs)
+
+
+def clock_frames(scr, seconds):
+    # 每秒一幀，只有秒數在變 (每分鐘一次分鐘位)
+    for s in range(seconds):
+        t = 8 * 3600 + 59 * 60 + s
+        scr.begin("clock")
+        scr.field("time", f"{t // 3600 % 24:02}:{t // 60 % 60:02}:{t % 60:02}", 30, 24)
+        scr.field("alarm", "Alarm: 09:00 [ ]", 0, 40)
+        scr.show()
+
+
+def menu_frames(scr, seconds):
+    for k in range(seconds * ENCODER_STEPS_PER_SEC):
+        if scr.begin("menu"):
+            scr.text("--- Menu ---", 0, 0)
+            for i, item in enumerate(MENU_ITEMS): scr.text(item, 16, 16 + i * 10)
+        scr.field("cursor", ">", 0, 16 + k % len(MENU_ITEMS) * 10)
+        scr.show()
+
+
+def alarm_frames(scr, seconds):
+    # 響鈴：每 0.5 秒閃爍一次
+    for k in range(seconds * 2):
+        scr.begin("alarm")
+        scr.field("msg", "Time to Eat!" if k % 2 == 0 else "", 20, 32, label=True)
+        scr.show()
+
+
+def password_frames(scr, seconds):
+    total = len(PASSWORD_CHARS) + 3
+    buf = ""
+    for k in range(seconds * ENCODER_STEPS_PER_SEC):
+        if scr.begin("pass"): scr.text("Enter WiFi Pass", 0, 0)
+        if k % 8 == 7: buf += PASSWORD_CHARS[k % len(PASSWORD_CHARS)]
+        scr.field("buf", buf[-13:], 0, 16)
+        start = k - 2
+        for i in range(5):
+            idx = (start + i) % total
+            txt = PASSWORD_CHARS[idx] if idx < len(PASSWORD_CHARS) else CONTROL_OPTIONS[idx - len(PASSWORD_CHARS)]
+            if txt == "DEL": txt = "<-"
+            elif txt == "BACK": txt = "RT"
+            x = 10 + i * 24
+            scr.field(i, txt, x, 40)
+            if i == 2: scr.field("caret", "^", x + (4 if len(txt) > 1 else 0), 52)
+        scr.show()
+
+
+VIEWS = (("clock", clock_frames), ("alarm", alarm_frames), ("menu", menu_frames), ("password", password_frames))
+
+
+def measure(view, seconds, full):
+    i2c = CountingI2C()
+    scr = Screen(i2c)
+    scr.full_refresh = full
+    scr.clear(); scr.show()
+    i2c.bytes = 0  # 不計開機第一張
+    view(scr, seconds)
+    return i2c.bytes / seconds
+
+
+if __name__ == "__main__":
+    secs = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+    print(f"{'view':<10}{'full B/s':>10}{'diff B/s':>10}{'bus ms/s':>14}")
+    for name, view in VIEWS:
+        full = measure(view, secs, True)
+        diff = measure(view, secs, False)
+        ms = lambda b: b * BITS_PER_BYTE * 1000 / I2C_HZ
+        print(f"{name:<10}{full:>10.0f}{diff:>10.0f}{ms(full):>7.1f}->{ms(diff):>5.1f}")
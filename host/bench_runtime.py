@@ -0,0 +1,143 @@
+# ==========================================
+# 主機端量測：網路請求期間的 task 延遲 (CPython)
+# ==========================================
+# 在虛擬時鐘上執行完整韌體 (sim.Sim + app.App)，已綁定的裝置從當地 08:00 起：
+#   鬧鐘   : DOSE_EVERY_MIN 分鐘一個時段，響鈴後 5 ~ 30 秒開蓋 (吃藥紀錄 -> 日誌上傳)
+#   旋鈕   : 每 3 ~ 10 秒轉一格或按一下 (時鐘 <-> 選單)；在時鐘畫面時 LID_P 的機率改為開蓋 (提早吃藥)
+#   網路   : 每個請求花 HTTP_MS (Apps Script 處理 + 轉址)，FAIL_P 的請求失敗要重試；另有設定輪詢
+# 以相同腳本比較兩種 HTTP 傳輸：
+#   blocking : 請求期間整個事件迴圈停住 (原本的阻塞 socket / urequests)
+#   async    : httpc 非阻塞，只有網路 task 等待
+# 量測 (虛擬時間，不含主機 CPU 時間)：
+#   input : 旋鈕 / 按鍵 -> 畫面更新 (App.update_ui)
+#   lid   : 開蓋去彈跳結束 -> 處理 (App.handle_lid_event)
+#   alarm : 排定時間 -> 開始響鈴 (Annunciator.start)
+#
+#   python host/bench_runtime.py [分鐘]
+import contextlib
+import io
+import random
+import sys
+
+from sim import DEFAULT_START
+from sim_run import fresh_device
+import runtime as rt
+import app as fw
+import lid
+
+HTTP_MS = 1500
+FAIL_P = 0.2
+LID_P = 0.15
+DOSE_EVERY_MIN = 15
+INPUT_GAP_S = (3, 10)
+ANSWER_S = (5, 30)
+
+
+def doses(minutes):
+    # 08:00 起每 DOSE_EVERY_MIN 分鐘一個時段 (最多 8 個，快照的上限)
+    out = []
+    for m in range(0, min(minutes, 8 * DOSE_EVERY_MIN), DOSE_EVERY_MIN):
+        out.append({"hour": 8 + m // 60, "minute": m % 60, "days": [True] * 7, "box": 1 + len(out) % 2})
+    return out
+
+
+class Probe:
+    # 包住韌體的處理函式，記錄從事件發生到被處理的延遲
+    def __init__(self, sim):
+        self.sim = sim
+        self.input = rt.Meter("input")
+        self.lid = rt.Meter("lid")
+        self.alarm = rt.Meter("alarm")
+        self.inputs = []        # 尚未反映到畫面的輸入時間
+        self.opens = []         # 尚未處理的開蓋時間
+        app = sim.app
+        update_ui = app.update_ui
+        handle_lid = app.handle_lid_event
+        start = app.ann.start
+
+        def on_update():
+            now = sim.clock.now
+            for t in self.inputs: self.input.add(int((now - t) * 1000))
+            self.inputs = []
+            update_ui()
+
+        def on_lid(box, opened, ts):
+            if opened and self.opens:
+                t = self.opens.pop(0) + lid.DEBOUNCE_MS / 1000
+                self.lid.add(int((sim.clock.now - t) * 1000))
+            handle_lid(box, opened, ts)
+
+        def on_ring():
+            self.alarm.add(int((sim.board.rtc() - app.last_alarm_fire) * 1000))
+            start()
+
+        app.update_ui = on_update
+        app.handle_lid_event = on_lid
+        app.ann.start = on_ring
+
+    def open_lid(self, box, delay):
+        board = self.sim.board
+        self.opens.append(self.sim.clock.now + delay)
+        board.set_lid(box, True, delay)
+        board.set_lid(box, False, delay + 10)
+
+
+def script(sim, probe, rng):
+    # 外部事件依排定時間發生；事件迴圈被卡住時回呼會晚執行，延遲從排定時間算起
+    board = sim.board
+    app = sim.app
+    due = [sim.clock.now + 1]
+
+    def tick():
+        t = due[0]
+        s = app.current_state
+        if rng.random() < FAIL_P: board.http_fail = 1
+        if s == fw.ALARM_RINGING:
+            # 病人開蓋回應；畫面不動
+            if not probe.busy:
+                probe.busy = True
+                probe.open_lid(app.sched.entries[app.ringing_slot][3], rng.uniform(*ANSWER_S))
+        else:
+            probe.busy = False
+            if s == fw.CLOCK_VIEW and rng.random() < LID_P:
+                probe.open_lid(rng.randint(1, 2), 0)
+                due[0] = t + rng.uniform(*INPUT_GAP_S) + 10
+                board.at(due[0] - sim.clock.now, tick, True)
+                return
+            probe.inputs.append(t)
+            if s == fw.MENU_SELECT and (app.menu_index != len(fw.MENU_ITEMS) - 1 or rng.random() < 0.5):
+                board.turn(rng.choice((1, -1)))
+            elif s in (fw.CLOCK_VIEW, fw.MENU_SELECT, fw.HISTORY_VIEW): board.press()
+            else: probe.inputs.pop()
+        due[0] = t + rng.uniform(*INPUT_GAP_S)
+        board.at(due[0] - sim.clock.now, tick, True)
+
+    probe.busy = False
+    board.at(due[0] - sim.clock.now, tick, True)
+
+
+def run(mode, minutes):
+    sim = fresh_device(DEFAULT_START - 60, doses(minutes))
+    sim.board.http_ms = HTTP_MS
+    sim.board.http_blocking = mode == "blocking"
+    rng = random.Random(5)
+    with contextlib.redirect_stdout(io.StringIO()):
+        sim.boot()
+        sim.run_for(30)
+        probe = Probe(sim)
+        script(sim, probe, rng)
+        sim.run_for(minutes * 60)
+        sim.close()
+    print(f"[{mode}] http requests {sim.board.http_requests}, {HTTP_MS} ms each")
+    for m in (probe.input, probe.lid, probe.alarm): print("  " + str(m))
+    return probe
+
+
+if __name__ == "__main__":
+    minutes = int(sys.argv[1]) if len(sys.argv) > 1 else 120
+    blocking = run("blocking", minutes)
+    nonblocking = run("async", minutes)
+    # 非阻塞時輸入與開蓋的延遲不該再被一次請求的時間卡住
+    ok = nonblocking.input.worst < HTTP_MS and nonblocking.lid.worst < HTTP_MS and nonblocking.alarm.count > 0
+    print("OK" if ok else "FAIL")
+    sys.exit(0 if ok else 1)
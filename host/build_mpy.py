@@ -0,0 +1,67 @@
+# ==========================================
+# 韌體預編譯：ESP32/*.py -> .mpy (CPython)
+# ==========================================
+# 裝置上 import .py 要先在 ESP32 上解析、編譯，耗時又佔 heap；預先用 mpy-cross 編成 .mpy，
+# 開機只需載入 bytecode。main.py 必須保持原始碼 (MicroPython 只執行 main.py)，
+# 它只有 import hal / app 兩行，其餘模組全部以 .mpy 上傳。
+#
+#   pip install mpy-cross               (版本需與裝置上的 MicroPython 相同)
+#   python host/build_mpy.py            -> build/mpy/*.mpy + main.py，上傳整個資料夾
+#   python host/build_mpy.py --manifest -> 另外產生 build/manifest.py，
+#                                          自行編譯韌體時以 FROZEN_MANIFEST 凍結進 flash (不佔檔案系統與 heap)
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.normpath(os.path.join(HERE, "..", "ESP32"))
+OUT = os.path.normpath(os.path.join(HERE, "..", "build"))
+KEEP_SOURCE = ("main.py", "boot.py")
+ARCH = "xtensawin"      # ESP32；-march 讓 @micropython.native / viper 也能預編譯
+
+
+def mpy_cross():
+    exe = shutil.which("mpy-cross")
+    if exe: return [exe]
+    try:
+        import mpy_cross  # noqa: F401
+        return [sys.executable, "-m", "mpy_cross"]
+    except ImportError:
+        sys.exit("找不到 mpy-cross：pip install mpy-cross (版本需與裝置上的 MicroPython 相同)")
+
+
+def build(manifest):
+    cmd = mpy_cross()
+    dest = os.path.join(OUT, "mpy")
+    os.makedirs(dest, exist_ok=True)
+    total_src = total_mpy = 0
+    modules = []
+    print(f"{'module':<18}{'.py B':>8}{'.mpy B':>8}")
+    for name in sorted(os.listdir(SRC)):
+        if not name.endswith(".py"): continue
+        src = os.path.join(SRC, name)
+        if name in KEEP_SOURCE:
+            shutil.copy(src, dest)
+            continue
+        out = os.path.join(dest, name[:-3] + ".mpy")
+        subprocess.run(cmd + ["-march=" + ARCH, "-o", out, src], check=True)
+        a = os.path.getsize(src); b = os.path.getsize(out)
+        total_src += a; total_mpy += b
+        modules.append(name)
+        print(f"{name:<18}{a:>8}{b:>8}")
+    print(f"{'total':<18}{total_src:>8}{total_mpy:>8}")
+    if manifest:
+        path = os.path.join(OUT, "manifest.py")
+        with open(path, "w") as f:
+            f.write('include("$(PORT_DIR)/boards/manifest.py")\n')
+            for name in modules: f.write(f'module("{name}", base_path="{SRC}")\n')
+        print("frozen manifest:", path)
+    print("上傳:", dest)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--manifest", action="store_true", help="產生凍結用的 manifest.py")
+    build(ap.parse_args().manifest)
@@ -0,0 +1,296 @@
+# ==========================================
+# 主機端負載測試：整批藥盒同時上線 (CPython)
+# ==========================================
+# 以 asyncio 在虛擬時鐘 (sim.VirtualLoop) 上模擬 N 台裝置對 mock_gas.MockGAS 的請求，
+# 一個行程就能跑數千台、數十分鐘的流量，幾秒鐘完成。
+#
+# 時間窗：當地 07:50 起，直到所有裝置的事件處理完
+#   開機     : 每台在 BOOT_SPREAD_S 內開機 -> get_config (NEW_P 比例的新裝置先 bind)
+#   輪詢     : 開機後依韌體規則帶版本輪詢 get_config (1 分鐘起，沒變就加倍到 8 分鐘)
+#   鬧鐘     : 到點 (+ --jitter 秒內隨機延遲) 回報 notify_alarm
+#   開蓋     : 響鈴後 10 秒 ~ 15 分鐘開蓋 -> eat
+# 事件預設與韌體相同，延遲 FLUSH_DELAY_S 後以 batch 上傳；--legacy 改用舊的 eat / notify_alarm GET。
+#
+# 後端：同時最多 CONCURRENCY 個執行 (Apps Script 的同時執行上限)，排隊超過 QUEUE_LIMIT_S 就失敗。
+# 每個請求的處理時間由 MockGAS 實際做了哪些服務呼叫估計 (下方 *_MS 常數，估計值)；
+# 佇列觸發器每分鐘佔用一個執行。裝置端與 httpc 相同：TIMEOUT_S 逾時，失敗後等 2 秒重試，最多 3 次。
+# userId 與 LINE 相同長度，回報 Script Properties 的最高用量；超過容量 (QuotaExceeded) 也算失敗。
+# 失敗比例超過 --max-fail (%)、整體 p95 延遲超過 --max-p95 (ms) 或有 quota 錯誤時以非零狀態結束。
+#
+#   python host/fleet.py [裝置數] [--jitter 秒] [--legacy] [--direct] [--seed N] [--max-fail %] [--max-p95 ms]
+import argparse
+import asyncio
+import random
+import sys
+
+from sim import VirtualClock, VirtualLoop, DEFAULT_START
+from mock_gas import MockGAS, DRAIN_EVERY_S, PROPS_QUOTA
+
+# ---- 流量 ----
+WINDOW_START = DEFAULT_START - 600      # 當地 07:50 (UTC+8)
+BOOT_SPREAD_S = 600
+NEW_P = 0.05
+DOSE_CHOICES = ((8 * 3600, 0.6), (7 * 3600 + 55 * 60, 0.2), (8 * 3600 + 30 * 60, 0.2))   # 當地時間, 比例
+LID_DELAY_S = (10, 900)
+FLUSH_DELAY_S = 5
+POLL_MIN_S = 60
+POLL_MAX_S = 480
+POLL_UNTIL_S = 3600                     # 時間窗內輪詢到 08:50
+
+# ---- 後端 (估計值) ----
+CONCURRENCY = 30
+QUEUE_LIMIT_S = 30
+BASE_MS = 120           # doGet 本身 (啟動、ContentService)
+CALL_MS = 25            # 每次 SpreadsheetApp 呼叫
+CELL_US = 2             # 每讀一格
+PROP_MS = 15            # 每次 Properties 寫入
+FETCH_MS = 250          # 每次 UrlFetchApp (fetchAll 算一次)
+
+# ---- 裝置 ----
+TIMEOUT_S = 10
+RETRIES = 3
+RETRY_WAIT_S = 2
+
+# ---- 門檻 (預設值) ----
+MAX_FAIL_PCT = 0.0      # 重試後仍失敗的請求比例
+MAX_P95_MS = 5000       # 所有成功請求 (含重試) 的 p95 延遲
+
+
+def percentile(xs, p):
+    if not xs: return 0.0
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(p / 100 * len(xs)))]
+
+
+class Backend:
+    # MockGAS 加上同時執行上限與處理時間
+    def __init__(self, loop, clock, gas):
+        self.loop = loop
+        self.clock = clock
+        self.gas = gas
+        gas.next_drain = float("inf")   # 觸發器由 trigger_task 執行
+        self.slots = asyncio.Semaphore(CONCURRENCY)
+        self.waiting = 0
+        self.running = 0
+        self.peak_running = 0
+        self.peak_waiting = 0
+        self.rejected = 0
+        self.busy_s = 0.0
+
+    def _counters(self):
+        g = self.gas
+        return g.sheet_calls(), g.cells_read(), g.prop_writes, g.row_writes, g.fetch_calls
+
+    def cost_s(self, before):
+        d = [a - b for a, b in zip(self._counters(), before)]
+        calls, cells, props, rows, fetches = d
+        return (BASE_MS + (calls + rows) * CALL_MS + cells * CELL_US / 1000 + props * PROP_MS + fetches * FETCH_MS) / 1000
+
+    async def execute(self, fn):
+        # 排隊 -> 執行 fn (同步呼叫 MockGAS) -> 依服務呼叫等待處理時間
+        self.waiting += 1
+        self.peak_waiting = max(self.peak_waiting, self.waiting)
+        try:
+            await asyncio.wait_for(self.slots.acquire(), QUEUE_LIMIT_S)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise OSError("too many concurrent executions")
+        finally:
+            self.waiting -= 1
+        self.running += 1
+        self.peak_running = max(self.peak_running, self.running)
+        try:
+            before = self._counters()
+            out = fn()
+            cost = self.cost_s(before)
+            self.busy_s += cost
+            await asyncio.sleep(cost)
+            return out
+        finally:
+            self.running -= 1
+            self.slots.release()
+
+    async def request(self, params):
+        return await self.execute(lambda: self.gas.do_get(params))
+
+    async def trigger_task(self):
+        while True:
+            await asyncio.sleep(DRAIN_EVERY_S)
+            try: await self.execute(self.gas.drain_outbox)
+            except OSError: pass
+
+
+class Report:
+    def __init__(self):
+        self.lat = {}       # action -> [秒]
+        self.ok = {}
+        self.err = {}
+        self.attempt_err = {}
+        self.first = None
+        self.last = 0.0
+
+    def add(self, action, t0, t1, ok, attempt_errors):
+        self.lat.setdefault(action, [])
+        if ok: self.lat[action].append(t1 - t0)
+        d = self.ok if ok else self.err
+        d[action] = d.get(action, 0) + 1
+        self.attempt_err[action] = self.attempt_err.get(action, 0) + attempt_errors
+        self.first = t0 if self.first is None else min(self.first, t0)
+        self.last = max(self.last, t1)
+
+    def totals(self):
+        # (請求數, 失敗數, 失敗 %, p50 ms, p95 ms, p99 ms)
+        n = sum(self.ok.values()) + sum(self.err.values())
+        fails = sum(self.err.values())
+        lat = [x for v in self.lat.values() for x in v]
+        return (n, fails, fails * 100 / n if n else 0.0,
+                percentile(lat, 50) * 1000, percentile(lat, 95) * 1000, percentile(lat, 99) * 1000)
+
+
+class Device:
+    def __init__(self, fleet, i, rng):
+        self.f = fleet
+        self.uid = "U%032x" % rng.getrandbits(128)     # LINE userId 的長度 (影響 Script Properties 用量)
+        self.jid = "%08x" % rng.getrandbits(32)
+        self.rng = rng
+        self.new = rng.random() < NEW_P
+        self.code = None
+        self.version = None
+        self.seq = 0
+        r = rng.random()
+        for t, w in DOSE_CHOICES:
+            self.dose = t
+            if r < w: break
+            r -= w
+
+    async def call(self, action, params):
+        # 與 App.api_request 相同的重試；延遲從第一次送出算到成功 (含重試)
+        f = self.f; clock = f.clock
+        t0 = clock.now
+        errors = 0
+        for attempt in range(RETRIES):
+            if attempt: await asyncio.sleep(RETRY_WAIT_S)
+            try:
+                # 裝置逾時後放棄，但後端那邊的執行不會中止
+                r = await asyncio.wait_for(asyncio.shield(f.backend.request(params)), TIMEOUT_S)
+                f.report.add(action, t0, clock.now, True, errors)
+                return r
+            except (OSError, asyncio.TimeoutError):
+                errors += 1
+        f.report.add(action, t0, clock.now, False, errors)
+        return None
+
+    async def event(self, action, ts):
+        if self.f.legacy:
+            await self.call(action.split(":")[0], {"action": action.split(":")[0], "userId": self.uid})
+            return
+        # 韌體：先寫日誌，FLUSH_DELAY_S 後批次上傳 (沒有合併到同一批的情況)
+        self.seq += 1
+        await asyncio.sleep(FLUSH_DELAY_S)
+        await self.call("batch:" + action.split(":")[0],
+                        {"action": "batch", "userId": self.uid, "jid": self.jid,
+                         "events": f"{self.seq}.{action}.{ts}"})
+
+    async def run(self):
+        f = self.f; rng = self.rng; clock = f.clock
+        await asyncio.sleep(rng.uniform(0, BOOT_SPREAD_S))
+        if self.new:
+            r = await self.call("bind", {"action": "bind", "code": self.code})
+            if not r or r.get("status") != "success": return
+        r = await self.call("get_config", {"action": "get_config", "userId": self.uid})
+        if r: self.version = r.get("version")
+        tasks = [asyncio.ensure_future(self.alarm()), asyncio.ensure_future(self.poll())]
+        await asyncio.gather(*tasks)
+
+    async def alarm(self):
+        f = self.f; clock = f.clock; rng = self.rng
+        fire = (DEFAULT_START - 8 * 3600 + self.dose) - WINDOW_START
+        if clock.now > fire: return     # 開機時已經過了
+        await asyncio.sleep(fire - clock.now + rng.uniform(0, f.jitter))
+        await self.event("notify_alarm", int(clock.wall()))
+        await asyncio.sleep(rng.uniform(*LID_DELAY_S))
+        await self.event("eat:%d" % rng.randint(1, 2), int(clock.wall()))
+
+    async def poll(self):
+        f = self.f; clock = f.clock
+        wait = POLL_MIN_S
+        while True:
+            await asyncio.sleep(wait)
+            if clock.now > POLL_UNTIL_S: return
+            p = {"action": "get_config", "userId": self.uid}
+            if self.version: p["ver"] = self.version
+            r = await self.call("poll", p)
+            if r and r.get("status") == "success":
+                self.version = r.get("version"); wait = POLL_MIN_S
+            else: wait = min(wait * 2, POLL_MAX_S)
+
+
+class Fleet:
+    def __init__(self, n, jitter, legacy, queued, seed):
+        self.clock = VirtualClock(WINDOW_START)
+        self.loop = VirtualLoop(self.clock)
+        asyncio.set_event_loop(self.loop)
+        rng = random.Random(seed)
+        self.gas = MockGAS(clock=self.clock.wall, queued=queued, rng=random.Random(seed + 1))
+        self.backend = Backend(self.loop, self.clock, self.gas)
+        self.report = Report()
+        self.jitter = jitter
+        self.legacy = legacy
+        self.devices = [Device(self, i, random.Random(rng.random())) for i in range(n)]
+        for d in self.devices:
+            if d.new: d.code = self.gas.generate_code(d.uid)
+            else: self.gas.add_user(d.uid, [{"hour": d.dose // 3600, "minute": d.dose // 60 % 60,
+                                             "days": [True] * 7, "box": 1}])
+
+    def run(self):
+        trig = self.loop.create_task(self.backend.trigger_task())
+        self.loop.run_until_complete(asyncio.gather(*(d.run() for d in self.devices)))
+        trig.cancel()
+        self.loop.run_until_complete(asyncio.gather(trig, return_exceptions=True))
+        self.gas.drain_outbox()
+        self.loop.close()
+
+
+def print_report(fleet, label):
+    r = fleet.report; b = fleet.backend
+    span = max(r.last - r.first, 1e-9)
+    total, fails, fail_pct, p50, p95, p99 = r.totals()
+    print(f"== {label}")
+    print(f"{'action':<20}{'ok':>7}{'fail':>6}{'fail%':>7}{'retry':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for a in sorted(r.lat):
+        lat = r.lat[a]
+        ok = r.ok.get(a, 0); err = r.err.get(a, 0)
+        print(f"{a:<20}{ok:>7}{err:>6}{err * 100 / (ok + err):>7.2f}{r.attempt_err.get(a, 0):>7}"
+              f"{percentile(lat, 50) * 1000:>9.0f}{percentile(lat, 95) * 1000:>9.0f}{percentile(lat, 99) * 1000:>9.0f}"
+              f"{(max(lat) if lat else 0) * 1000:>9.0f}")
+    print(f"requests {total} in {span:.0f}s ({total / span:.1f}/s), failed {fails} ({fail_pct:.2f}%), "
+          f"p50 {p50:.0f} ms, p95 {p95:.0f} ms, p99 {p99:.0f} ms")
+    print(f"backend: peak running {b.peak_running}/{CONCURRENCY}, peak queued {b.peak_waiting}, "
+          f"rejected {b.rejected}, busy {b.busy_s:.0f} execution-s")
+    print(f"logs written {len(fleet.gas.logs)}, pushes sent {len(fleet.gas.pushes)}")
+    g = fleet.gas
+    print(f"script properties: peak {g.peak_props / 1024:.0f} KB / {PROPS_QUOTA // 1024} KB, "
+          f"end {g.props_bytes / 1024:.0f} KB, direct writes {g.direct_flushes}, quota errors {g.quota_errors}")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("devices", type=int, nargs="?", default=2000)
+    ap.add_argument("--jitter", type=float, default=0, help="鬧鐘回報隨機延遲上限 (秒)")
+    ap.add_argument("--legacy", action="store_true", help="事件用舊的 eat / notify_alarm GET")
+    ap.add_argument("--direct", action="store_true", help="後端不用佇列 (同步 appendRow + fetch)")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--max-fail", type=float, default=MAX_FAIL_PCT, help="失敗比例上限 (%%)")
+    ap.add_argument("--max-p95", type=float, default=MAX_P95_MS, help="整體 p95 延遲上限 (ms)")
+    a = ap.parse_args()
+    f = Fleet(a.devices, a.jitter, a.legacy, not a.direct, a.seed)
+    f.run()
+    print_report(f, f"{a.devices} devices, jitter {a.jitter:.0f}s, "
+                    f"{'legacy GET' if a.legacy else 'batch'}, {'direct' if a.direct else 'queued'} backend")
+    _, _, fail_pct, _, p95, _ = f.report.totals()
+    over = []
+    if fail_pct > a.max_fail: over.append(f"failed {fail_pct:.2f}% > {a.max_fail:g}%")
+    if p95 > a.max_p95: over.append(f"p95 {p95:.0f} ms > {a.max_p95:g} ms")
+    if f.gas.quota_errors: over.append(f"{f.gas.quota_errors} quota errors")
+    print("FAIL: " + ", ".join(over) if over else "OK")
+    sys.exit(1 if over else 0)
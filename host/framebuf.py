@@ -0,0 +1,72 @@
+# ==========================================
+# 主機端 framebuf 替身 (CPython)
+# ==========================================
+# 只實作韌體用到的部分：MONO_VLSB、fill / fill_rect / pixel / text / blit。
+# 字型是依字元碼產生的佔位點陣 (8x8，右側留 3 欄空白)，
+# 字形與裝置不同，但寬度與位置一致，足以比較畫面差異與傳輸量。
+MONO_VLSB = 0
+
+
+def _glyph(c):
+    if c == 32: return bytes(8)
+    x = (c * 2654435761) & 0xFFFFFFFF
+    cols = []
+    for _ in range(5):
+        x = (x * 1103515245 + 12345) & 0xFFFFFFFF
+        cols.append(((x >> 16) & 0x7F) | 0x01)
+    return bytes(cols) + bytes(3)
+
+
+FONT = [_glyph(c) for c in range(32, 128)]
+
+
+class FrameBuffer:
+    def __init__(self, buf, width, height, fmt=MONO_VLSB, stride=None):
+        self.buf = buf
+        self.width = width
+        self.height = height
+        self.stride = stride or width
+
+    def pixel(self, x, y, c=None):
+        if not (0 <= x < self.width and 0 <= y < self.height): return None
+        i = (y >> 3) * self.stride + x
+        bit = 1 << (y & 7)
+        if c is None: return 1 if self.buf[i] & bit else 0
+        if c: self.buf[i] |= bit
+        else: self.buf[i] &= ~bit & 0xFF
+
+    def fill(self, c):
+        self.buf[:] = (b"\xff" if c else b"\x00") * len(self.buf)
+
+    def fill_rect(self, x, y, w, h, c):
+        for yy in range(max(y, 0), min(y + h, self.height)):
+            for xx in range(max(x, 0), min(x + w, self.width)):
+                self.pixel(xx, yy, c)
+
+    def rect(self, x, y, w, h, c, f=False):
+        if f: return self.fill_rect(x, y, w, h, c)
+        self.fill_rect(x, y, w, 1, c); self.fill_rect(x, y + h - 1, w, 1, c)
+        self.fill_rect(x, y, 1, h, c); self.fill_rect(x + w - 1, y, 1, h, c)
+
+    def hline(self, x, y, w, c):
+        self.fill_rect(x, y, w, 1, c)
+
+    def vline(self, x, y, h, c):
+        self.fill_rect(x, y, 1, h, c)
+
+    def text(self, s, x, y, c=1):
+        for ch in s:
+            code = ord(ch)
+            if code < 32 or code > 127: code = 127
+            g = FONT[code - 32]
+            for j in range(8):
+                col = g[j]
+                for b in range(8):
+                    if col & (1 << b): self.pixel(x + j, y + b, c)
+            x += 8
+
+    def blit(self, src, x, y, key=-1, palette=None):
+        for sy in range(src.height):
+            for sx in range(src.width):
+                v = src.pixel(sx, sy)
+                if v != key: self.pixel(x + sx, y + sy, v)
@@ -0,0 +1,432 @@
+# ==========================================
+# 主機端 Apps Script 替身 (CPython)
+# ==========================================
+# 以記憶體中的資料表重現 Code.gs doGet 的裝置端 API：
+#   bind / get_config (含版本比對) / eat / notify_alarm / batch
+# 回傳內容與 Code.gs 相同；LINE 推播只記錄在 pushes，不會真的送出。
+#
+# Users / Codes 以 Sheet (列的清單) 保存，欄位與試算表相同，並統計讀寫的儲存格數與呼叫次數，
+# 可比較兩種查詢方式 (host/bench_gas.py)：
+#   indexed=True  : 與目前 Code.gs 相同，userId / 綁定碼 -> 列號索引，只讀寫單列
+#   indexed=False : 舊版 Code.gs，每次 getDataRange().getValues() 整表掃描
+# 紀錄與推播同樣有兩種方式：
+#   queued=True   : 與目前 Code.gs 相同，請求只寫一次佇列屬性，drain_outbox (每分鐘觸發器) 批次寫入 / 推播
+#   queued=False  : 舊版，每筆紀錄 appendRow、每則推播 UrlFetchApp.fetch，都在回應裝置之前
+# logs / stats / pushes 是已寫入試算表 / 已送出的內容；佇列中的還不算。
+# Script Properties (版本號、seq、q_ 佇列) 共用 PROPS_QUOTA：寫入後超過就丟出 QuotaExceeded (與 setProperty 相同)；
+# 用量加上這次的佇列超過 PROPS_BUDGET 時與 Code.gs 相同，改為直接寫入 (Code.gs 用估計值，這裡用實際用量)。
+import json
+import random
+import time
+
+CODE_TTL_S = 10 * 60
+CODE_CACHE_S = 15 * 60
+BATCH_FRESH_S = 10 * 60
+DRAIN_EVERY_S = 60
+USER_COLS = 8
+CACHE_MAX_S = 6 * 3600
+SEQ_JIDS = 2
+PROPS_QUOTA = 500 * 1024    # Script Properties 總容量 (key + value 的位元組)
+PROPS_BUDGET = 400 * 1024   # 超過就不排入佇列，直接寫入 (Code.gs 的 PROPS_BUDGET)
+Q_KEY_BYTES = 30            # q_ 屬性名稱長度 (q_時間_亂數_序號)
+
+
+class QuotaExceeded(OSError):
+    pass
+
+
+def prop_bytes(k, v):
+    return len(k) + len(v.encode())
+
+
+def item_bytes(kind, v):
+    # 佇列項目在 Code.gs 中的 JSON 長度
+    it = {"p": v[0], "t": v[1], "n": 0} if kind == "push" else {"s": kind, "r": list(v)}
+    return len(json.dumps(it, ensure_ascii=False).encode()) + 1
+
+
+def default_days():
+    return [False] * 7
+
+
+class Sheet:
+    # 試算表工作表：rows[0] 是第 1 列，統計 Apps Script 呼叫次數與讀寫儲存格數
+    def __init__(self, header):
+        self.rows = [list(header)]
+        self.calls = 0
+        self.cells_read = 0
+        self.cells_written = 0
+
+    def last_row(self):
+        self.calls += 1
+        return len(self.rows)
+
+    def get_values(self):
+        # getDataRange().getValues()
+        self.calls += 1
+        self.cells_read += sum(len(r) for r in self.rows)
+        return [list(r) for r in self.rows]
+
+    def get_column(self, n):
+        # getRange(1, 1, lastRow, 1).getValues()
+        self.calls += 1
+        self.cells_read += n
+        return [r[0] if r else "" for r in self.rows[:n]]
+
+    def get_row(self, row, cols):
+        # 超過最後一列時與 Apps Script 相同，讀到空白
+        self.calls += 1
+        self.cells_read += cols
+        r = self.rows[row - 1] if row <= len(self.rows) else []
+        return (r + [""] * cols)[:cols]
+
+    def set_cells(self, row, col, values):
+        self.calls += 1
+        self.cells_written += len(values)
+        r = self.rows[row - 1]
+        if len(r) < col - 1 + len(values): r.extend([""] * (col - 1 + len(values) - len(r)))
+        r[col - 1:col - 1 + len(values)] = values
+
+    def append_row(self, values):
+        self.calls += 1
+        self.cells_written += len(values)
+        self.rows.append(list(values))
+        return len(self.rows)
+
+    def replace_all(self, rows):
+        # clearContent + setValues (壓縮)
+        self.calls += 2
+        self.cells_written += sum(len(r) for r in rows)
+        self.rows = [list(r) for r in rows]
+
+
+class ScriptCache:
+    # CacheService.getScriptCache()：到期即消失
+    def __init__(self, clock):
+        self.clock = clock
+        self.items = {}
+
+    def get(self, key):
+        v = self.items.get(key)
+        if v is None or v[1] < self.clock(): return None
+        return v[0]
+
+    def put(self, key, value, ttl):
+        self.items[key] = (value, self.clock() + ttl)
+
+
+class MockGAS:
+    def __init__(self, clock=time.time, indexed=True, queued=True, rng=None):
+        self.clock = clock
+        self.indexed = indexed
+        self.queued = queued
+        self.rng = rng or random.Random()
+        self.users = Sheet(["UserId", "Type", "Created", "AlarmHour", "AlarmMinute",
+                            "AlarmDays", "AlarmDoses", "ConfigVersion"])
+        self.codes = Sheet(["Code", "UserId", "Expires", "Status"])
+        self.props = {}     # Script Properties (cfgver_ / seq_)
+        self.cache = ScriptCache(clock)
+        self.logs = []      # (unix 秒, userId, type, note)
+        self.pushes = []    # (userId, 訊息)
+        self.stats = []     # (userId, 裝置效能統計字串)
+        self.requests = 0
+        self.not_modified = 0
+        self.outbox = []        # 這次請求收集的紀錄 / 推播 (Code.gs 的 OUTBOX)
+        self.queue = []         # 已寫入的 q_ 屬性，每個是 (一串項目, 位元組)
+        self.props_bytes = 0    # Script Properties 目前用量 (含 q_ 佇列)
+        self.peak_props = 0
+        self.quota_errors = 0
+        self.direct_flushes = 0 # 佇列超過 PROPS_BUDGET，直接寫入的次數
+        self.next_drain = clock() + DRAIN_EVERY_S
+        # 服務呼叫次數
+        self.prop_writes = 0    # 佇列 / seq 的 setProperty(ies)
+        self.row_writes = 0     # Logs / Stats 的 appendRow 或 setValues
+        self.fetch_calls = 0    # UrlFetchApp.fetch / fetchAll
+
+    # ---- 測試用：建立資料 ----
+    def add_user(self, user_id, doses):
+        # 建立一位使用者 (沒有版本號的舊資料 = "1")
+        row = self._user_row_or_append(user_id)
+        first = doses[0] if doses else {"hour": 8, "minute": 0, "days": default_days()}
+        self.users.set_cells(row, 4, [first["hour"], first["minute"], json.dumps(first["days"]),
+                                      json.dumps(doses), "1"])
+
+    def add_code(self, code, user_id):
+        self._append_code(str(code), user_id)
+
+    def sheet_calls(self):
+        return self.users.calls + self.codes.calls
+
+    def cells_read(self):
+        return self.users.cells_read + self.codes.cells_read
+
+    # ---- 列號索引 (與 Code.gs 相同) ----
+    # 回傳 (列號, 該列前 cols 欄) 或 None；scan 模式整表讀取後直接取列
+    def _find_user_row(self, user_id, cols):
+        sh = self.users
+        if not self.indexed:
+            data = sh.get_values()
+            for i in range(1, len(data)):
+                if data[i][0] == user_id: return i + 1, (data[i] + [""] * cols)[:cols]
+            return None
+        key = "urow_" + str(user_id)
+        row = int(self.cache.get(key) or -1)
+        if row > 1:
+            vals = sh.get_row(row, cols)
+            if vals[0] == user_id: return row, vals
+        ids = sh.get_column(sh.last_row())
+        for i in range(1, len(ids)):
+            if ids[i] == user_id:
+                self.cache.put(key, str(i + 1), CACHE_MAX_S)
+                return i + 1, sh.get_row(i + 1, cols)
+        return None
+
+    def _find_code_row(self, code, cols):
+        sh = self.codes
+        if not self.indexed:
+            data = sh.get_values()
+            for i in range(len(data) - 1, -1, -1):
+                if str(data[i][0]) == code: return i + 1, data[i][:cols]
+            return None
+        key = "crow_" + code
+        row = int(self.cache.get(key) or -1)
+        if row > 0:
+            vals = sh.get_row(row, cols)
+            if str(vals[0]) == code: return row, vals
+        col = sh.get_column(sh.last_row())
+        for i in range(len(col) - 1, -1, -1):
+            if str(col[i]) == code:
+                self.cache.put(key, str(i + 1), CODE_CACHE_S)
+                return i + 1, sh.get_row(i + 1, cols)
+        return None
+
+    def _user_row_or_append(self, user_id):
+        found = self._find_user_row(user_id, 1)
+        if found: row = found[0]
+        else:
+            row = self.users.append_row([user_id, "User", int(self.clock()), "", "", "", "", ""])
+            if self.indexed: self.cache.put("urow_" + user_id, str(row), CACHE_MAX_S)
+        return row
+
+    def _append_code(self, code, user_id):
+        self.codes.append_row([code, user_id, self.clock() + CODE_TTL_S, "WAIT"])
+        row = self.codes.last_row()
+        if self.indexed: self.cache.put("crow_" + code, str(row), CODE_CACHE_S)
+
+    # ---- 與 Code.gs 相同的處理 ----
+    def log_action(self, user_id, note, when=None, kind="Eat"):
+        self._row("Logs", (when if when is not None else int(self.clock()), user_id, kind, note))
+
+    def log_device_stats(self, user_id, st):
+        self._row("Stats", (user_id, st))
+
+    def _row(self, sheet, row):
+        if self.queued: self.outbox.append((sheet, row)); return
+        self.row_writes += 1
+        (self.logs if sheet == "Logs" else self.stats).append(row)
+
+    def push(self, user_id, text):
+        if self.queued: self.outbox.append(("push", (user_id, text))); return
+        self.fetch_calls += 1
+        self.pushes.append((user_id, text))
+
+    # ---- Script Properties ----
+    def set_props(self, items, queued=0):
+        # setProperties (queued：一起寫入的 q_ 佇列位元組)；超過容量時丟出例外、什麼都不寫
+        d = queued
+        for k, v in items.items():
+            d += prop_bytes(k, v) - (prop_bytes(k, self.props[k]) if k in self.props else 0)
+        if self.props_bytes + d > PROPS_QUOTA:
+            self.quota_errors += 1
+            raise QuotaExceeded("Script Properties quota exceeded")
+        self.props.update(items)
+        self.props_bytes += d
+        self.peak_props = max(self.peak_props, self.props_bytes)
+
+    # ---- 佇列 ----
+    def flush_outbox(self, extra=None):
+        # 這次請求的項目 (與 extra 屬性) 一次寫入
+        items = self.outbox
+        self.outbox = []
+        if not items and not extra: return
+        size = Q_KEY_BYTES + 2 + sum(item_bytes(k, v) for k, v in items) if items else 0
+        if size and self.props_bytes + size > PROPS_BUDGET:
+            # 佇列太大：直接寫入 (每個工作表一次 setValues，推播一次 fetchAll)
+            self.direct_flushes += 1
+            self._write_items(items)
+            items = []; size = 0
+            if not extra: return
+        self.prop_writes += 1
+        self.set_props(extra or {}, size)
+        if items: self.queue.append((items, size))
+
+    def drain_outbox(self):
+        # drainOutbox 觸發器：每個工作表一次 setValues，推播一次 fetchAll
+        if not self.queue: return
+        items = [it for q, _ in self.queue for it in q]
+        self.props_bytes -= sum(n for _, n in self.queue)
+        self.queue = []
+        self._write_items(items)
+
+    def _write_items(self, items):
+        # writeRows + sendPushes
+        sheets = set()
+        for kind, v in items:
+            if kind == "push": continue
+            (self.logs if kind == "Logs" else self.stats).append(v)
+            sheets.add(kind)
+        self.row_writes += len(sheets)
+        sent = [v for kind, v in items if kind == "push"]
+        if sent:
+            self.fetch_calls += 1
+            self.pushes.extend(sent)
+
+    def _tick(self):
+        # 每分鐘的時間觸發器 (在下一次請求時補跑)
+        if self.clock() >= self.next_drain:
+            self.drain_outbox()
+            self.next_drain = self.clock() + DRAIN_EVERY_S
+
+    def generate_code(self, user_id):
+        code = str(self.rng.randint(100000, 999999))
+        self._append_code(code, user_id)
+        return code
+
+    def verify_code(self, code):
+        code = str(code)
+        if not code: return {"status": "error", "message": "Code not found"}
+        found = self._find_code_row(code, 4)
+        if not found: return {"status": "error", "message": "Code not found"}
+        row, rec = found
+        if rec[3] == "USED": return {"status": "error", "message": "Code already used"}
+        if self.clock() > rec[2]: return {"status": "error", "message": "Code expired"}
+        self.codes.set_cells(row, 4, ["USED"])
+        return {"status": "success", "userId": rec[1]}
+
+    def compact_codes(self):
+        # 刪除已使用或過期的綁定碼，重建快取索引；回傳刪除列數
+        sh = self.codes
+        data = sh.get_values()
+        now = self.clock()
+        keep = [data[0]] + [r for r in data[1:] if r[3] != "USED" and now <= r[2]]
+        if len(keep) == len(data): return 0
+        sh.replace_all(keep)
+        if self.indexed:
+            for i, r in enumerate(keep[1:], 2): self.cache.put("crow_" + str(r[0]), str(i), CODE_CACHE_S)
+        return len(data) - len(keep)
+
+    def save_user_config(self, user_id, doses):
+        # LINE 修改設定：與 saveUserConfig 相同，每次儲存換新版本
+        row = self._user_row_or_append(user_id)
+        first = doses[0]
+        version = str(int(self.clock() * 1000))
+        self.users.set_cells(row, 4, [first["hour"], first["minute"], json.dumps(first["days"]),
+                                      json.dumps(doses), version])
+        self.set_props({"cfgver_" + user_id: version})
+
+    def get_config_version(self, user_id):
+        return self.props.get("cfgver_" + str(user_id))
+
+    def get_user_config(self, user_id):
+        found = self._find_user_row(user_id, USER_COLS)
+        if not found: return None
+        r = found[1]
+        try: hour = int(r[3])
+        except (TypeError, ValueError): hour = 0
+        try: minute = int(r[4])
+        except (TypeError, ValueError): minute = 0
+        days = default_days()
+        try:
+            if r[5]: days = json.loads(r[5])
+        except ValueError: pass
+        doses = None
+        try:
+            if r[6]: doses = json.loads(r[6])
+        except ValueError: pass
+        if not doses: doses = [{"hour": hour, "minute": minute, "days": days, "box": 0}]
+        return {"hour": hour, "minute": minute, "days": days, "doses": doses,
+                "version": str(r[7]) if r[7] else "1"}
+
+    def apply_batch(self, user_id, jid, events):
+        key = "seq_" + user_id
+        jid = jid or ""
+        seqs = [p.rsplit(":", 1) for p in self.props.get(key, "").split()]
+        last = int(dict(seqs).get(jid, 0))
+        acked = last
+        now = self.clock()
+        for seq, action, ts in sorted(events):
+            if seq <= last: continue    # 重送
+            fresh = now - ts < BATCH_FRESH_S
+            parts = action.split(":")
+            if parts[0] == "eat" and len(parts) > 1:
+                self.log_action(user_id, f"ESP32開蓋(藥格{parts[1]})", ts)
+                if fresh: self.push(user_id, f"✅ 偵測到第 {parts[1]} 格藥盒已打開，吃藥紀錄成功！")
+            elif action == "eat":
+                self.log_action(user_id, "ESP32按鈕(批次)", ts)
+                if fresh: self.push(user_id, "✅ 您已按下實體按鈕，吃藥紀錄成功！")
+            elif action == "notify_alarm":
+                self.log_action(user_id, "ESP32鬧鐘(批次)", ts, "Alarm")
+                if fresh: self.push(user_id, "⏰ 時間到了！請記得吃藥 💊")
+            acked = seq
+        # seq_<userId> = "jid:seq jid:seq"，最近的在前，最多 SEQ_JIDS 個
+        value = " ".join([f"{jid}:{acked}"] + [f"{j}:{n}" for j, n in seqs if j != jid][:SEQ_JIDS - 1])
+        extra = {key: value} if acked > last else None
+        if self.queued: self.flush_outbox(extra)    # 佇列與 seq 同一次寫入
+        elif extra:
+            self.prop_writes += 1
+            self.set_props(extra)
+        return {"status": "success", "acked": acked}
+
+    def do_get(self, p):
+        # p: 查詢參數 dict；回傳 dict (JSON) 或 str (純文字)
+        self._tick()
+        out = self._handle_get(p)
+        if self.queued: self.flush_outbox()
+        return out
+
+    def _handle_get(self, p):
+        self.requests += 1
+        action = p.get("action")
+        uid = p.get("userId")
+        if p.get("st"): self.log_device_stats(uid, p["st"])
+        if action == "bind":
+            r = self.verify_code(p.get("code", ""))
+            if r["status"] == "success": return {"status": "success", "userId": r["userId"]}
+            return {"status": "error", "message": r["message"]}
+        if action == "eat" and uid:
+            self.log_action(uid, "ESP32按鈕(GET)")
+            self.push(uid, "✅ 您已按下實體按鈕，吃藥紀錄成功！")
+            return {"status": "success"}
+        if action == "get_config":
+            known = p.get("ver")
+            if known:
+                current = self.get_config_version(uid)
+                if current and current == known:
+                    self.not_modified += 1
+                    return {"status": "not_modified", "version": current}
+            c = self.get_user_config(uid)
+            if c:
+                self.set_props({"cfgver_" + str(uid): c["version"]})
+                return {"status": "success", "hour": c["hour"], "minute": c["minute"], "enabled": True,
+                        "days": c["days"], "doses": c["doses"], "version": c["version"]}
+            self.set_props({"cfgver_" + str(uid): "0"})
+            return {"status": "success", "hour": 8, "minute": 0, "enabled": False,
+                    "days": default_days(), "doses": [], "version": "0"}
+        if action == "notify_alarm" and uid:
+            self.push(uid, "⏰ 時間到了！請記得吃藥 💊")
+            return {"status": "success"}
+        if action == "batch" and uid:
+            return self.apply_batch(uid, p.get("jid"), parse_batch_events(p.get("events")))
+        return "GAS Online"
+
+
+def parse_batch_events(s):
+    # "seq.action.ts,..." -> [(seq, action, ts)]
+    out = []
+    if not s: return out
+    for part in s.split(","):
+        f = part.split(".")
+        if len(f) != 3: continue
+        try: out.append((int(f[0]), f[1], int(f[2])))
+        except ValueError: continue
+    return out
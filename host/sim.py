@@ -0,0 +1,605 @@
+# ==========================================
+# 主機端模擬器 (CPython)
+# ==========================================
+# SimBoard 提供與 ESP32/hal.py Board 相同的方法，讓 app.App 直接在電腦上執行：
+#   腳位     : SimPin (可由腳本改變電位並觸發 IRQ)
+#   OLED     : SimDisplay (解讀 SSD1306 視窗命令，寫入 128x64 GDDRAM)
+#   WLAN     : SimWLAN (假的 AP 清單與連線延遲)
+#   SNTP / RTC: RTC = 虛擬時鐘 + 可設定的漂移 (ppm)，SNTP 回覆帶隨機往返延遲
+#   HTTP     : SimHttp，請求轉給 mock_gas.MockGAS (Code.gs 替身)
+#   計時器   : SimTimer (排進事件迴圈)
+# 虛擬時鐘：VirtualLoop 沒有可處理的事件時直接把時間快轉到下一個計時器，
+# light sleep 也只是把時間往前推，幾天的排程幾秒鐘就跑完。
+#
+#   sim = Sim(); sim.boot(); sim.run_for(86400); sim.close()
+import asyncio
+import heapq
+import json
+import os
+import random
+import selectors
+import sys
+import tempfile
+import time
+from urllib.parse import urlsplit, parse_qsl
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "ESP32"))
+sys.path.insert(0, HERE)  # 主機端 framebuf 替身
+import runtime as rt  # noqa: E402
+from mock_gas import MockGAS  # noqa: E402
+
+DEFAULT_START = 1767225600   # 2026-01-01 00:00:00 UTC
+EDGE_MS = 2                  # 模擬旋鈕每個正交邊緣的間隔
+STEP_MS = 80                 # 腳本轉動時每格間隔 (不觸發加速)
+
+
+# -----------------------------
+# 虛擬時鐘與事件迴圈
+# -----------------------------
+class VirtualClock:
+    def __init__(self, start=DEFAULT_START):
+        self.start = start
+        self.now = 0.0      # 開機後經過秒數 (事件迴圈與 ticks_ms 用)
+
+    def monotonic(self):
+        return self.now
+
+    def wall(self):
+        return self.start + self.now
+
+    def advance(self, s):
+        if s > 0: self.now += s
+
+    def set(self, t):
+        if t > self.now: self.now = t
+
+    def install(self):
+        # 韌體用 time.time() 當 RTC、runtime.ticks_* 當單調時鐘，兩者都換成虛擬時間；
+        # 裝置的 localtime 不含時區，主機端固定用 UTC
+        rt.set_clock(self.monotonic)
+        time.time = self.wall
+        os.environ["TZ"] = "UTC"
+        time.tzset()
+
+
+class _FastForwardSelector(selectors.BaseSelector):
+    # 沒有就緒的 I/O 時不等待，直接把虛擬時間推到下一個計時器
+    def __init__(self, clock):
+        self._sel = selectors.DefaultSelector()
+        self.clock = clock
+
+    def register(self, fileobj, events, data=None):
+        return self._sel.register(fileobj, events, data)
+
+    def unregister(self, fileobj):
+        return self._sel.unregister(fileobj)
+
+    def modify(self, fileobj, events, data=None):
+        return self._sel.modify(fileobj, events, data)
+
+    def select(self, timeout=None):
+        ready = self._sel.select(0)
+        if not ready and timeout: self.clock.advance(timeout)
+        return ready
+
+    def get_key(self, fileobj):
+        return self._sel.get_key(fileobj)
+
+    def get_map(self):
+        return self._sel.get_map()
+
+    def close(self):
+        self._sel.close()
+
+
+class VirtualLoop(asyncio.SelectorEventLoop):
+    def __init__(self, clock):
+        super().__init__(_FastForwardSelector(clock))
+        self.clock = clock
+
+    def time(self):
+        return self.clock.now
+
+
+# -----------------------------
+# 硬體替身
+# -----------------------------
+class SimPin:
+    IN = 1
+    OUT = 3
+    PULL_UP = 2
+    IRQ_RISING = 1
+    IRQ_FALLING = 2
+
+    def __init__(self, n, v=1):
+        self.n = n
+        self.v = v
+        self.trigger = 0
+        self.handler = None
+
+    def value(self, v=None):
+        if v is None: return self.v
+        self.v = 1 if v else 0
+
+    def irq(self, trigger=None, handler=None):
+        self.trigger = trigger or 0
+        self.handler = handler
+
+    def drive(self, v):
+        # 外部改變電位 (按鍵、旋鈕、開關)，符合觸發條件就呼叫 IRQ
+        v = 1 if v else 0
+        if v == self.v: return
+        self.v = v
+        edge = self.IRQ_RISING if v else self.IRQ_FALLING
+        if self.handler and self.trigger & edge: self.handler(self)
+
+
+class SimReset(Exception):
+    # 韌體呼叫 machine.reset()：結束目前的 main task，由 Sim 重新開機
+    pass
+
+
+class SimWDT:
+    # 逾時沒餵就重置；餵的時候已經逾時 (事件迴圈被卡住) 也算重置
+    def __init__(self, board, timeout_ms):
+        self.board = board
+        self.timeout = timeout_ms / 1000
+        self.fed = board.loop.time()
+        self.feeds = 0
+        self.handle = board.loop.call_later(1, self._check)
+
+    def _expired(self):
+        return self.board.loop.time() - self.fed > self.timeout
+
+    def feed(self):
+        if self._expired(): self.board._reset("wdt"); return
+        self.fed = self.board.loop.time()
+        self.feeds += 1
+
+    def _check(self):
+        self.handle = None
+        if self._expired(): self.board._reset("wdt"); return
+        self.handle = self.board.loop.call_later(1, self._check)
+
+    def stop(self):
+        if self.handle: self.handle.cancel()
+        self.handle = None
+
+
+class SimTimer:
+    ONE_SHOT = 0
+    PERIODIC = 1
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.handle = None
+
+    def init(self, mode=ONE_SHOT, period=0, callback=None):
+        self.deinit()
+        self.mode = mode
+        self.period = period
+        self.callback = callback
+        self.handle = self.loop.call_later(period / 1000, self._fire)
+
+    def _fire(self):
+        self.handle = None
+        if self.mode == self.PERIODIC: self.handle = self.loop.call_later(self.period / 1000, self._fire)
+        if self.callback: self.callback(self)
+
+    def deinit(self):
+        if self.handle: self.handle.cancel()
+        self.handle = None
+
+
+class SimPWM:
+    # 蜂鳴器：記錄發聲次數與總時間 (虛擬時間)
+    def __init__(self, loop):
+        self.loop = loop
+        self.f = 0
+        self.duty = 0
+        self.beeps = 0
+        self.on_s = 0.0
+        self._t0 = None
+
+    def freq(self, f=None):
+        if f is None: return self.f
+        self.f = f
+
+    def duty_u16(self, d=None):
+        if d is None: return self.duty
+        now = self.loop.time()
+        if d and self._t0 is None: self._t0 = now; self.beeps += 1
+        elif not d and self._t0 is not None: self.on_s += now - self._t0; self._t0 = None
+        self.duty = d
+
+
+class SimDisplay:
+    # 接在 I2C 上的 SSD1306：只解讀 render.Screen 用到的命令
+    def __init__(self, width=128, height=64):
+        self.width = width
+        self.pages = height // 8
+        self.ram = bytearray(width * self.pages)
+        self.window = (0, width - 1, 0, self.pages - 1)
+        self.contrast = 0xFF
+        self.on = True
+        self.bytes = 0
+        self.writes = 0
+
+    def writeto(self, addr, buf):
+        self.bytes += 1 + len(buf)
+        buf = bytes(buf)
+        if buf[0] == 0x40:
+            self._data(buf[1:]); return
+        c = buf[1:]
+        i = 0
+        while i < len(c):
+            op = c[i]
+            if op == 0x21: self.window = (c[i + 1], c[i + 2]) + self.window[2:]; i += 3
+            elif op == 0x22: self.window = self.window[:2] + (c[i + 1], c[i + 2]); i += 3
+            elif op == 0x81: self.contrast = c[i + 1]; i += 2
+            elif op in (0xAE, 0xAF): self.on = op == 0xAF; i += 1
+            else: i += 1
+
+    def writevto(self, addr, bufs):
+        data = b"".join(bytes(b) for b in bufs)
+        self.bytes += 1 + len(data)
+        if data and data[0] == 0x40: self._data(data[1:])
+
+    def _data(self, data):
+        # 水平定址：欄位到視窗右邊後換到下一頁
+        x0, x1, p0, p1 = self.window
+        x, p = x0, p0
+        for b in data:
+            self.ram[p * self.width + x] = b
+            x += 1
+            if x > x1:
+                x = x0; p += 1
+                if p > p1: p = p0
+        self.writes += 1
+
+    def pixel(self, x, y):
+        return (self.ram[(y // 8) * self.width + x] >> (y % 8)) & 1
+
+    def dump(self):
+        rows = []
+        for y in range(self.pages * 8):
+            rows.append("".join("#" if self.pixel(x, y) else "." for x in range(self.width)))
+        return "\n".join(rows)
+
+
+class SimWLAN:
+    def __init__(self, board):
+        self.board = board
+        self.networks = {}      # ssid -> (password, rssi, channel, bssid)
+        self.connect_ms = 3000  # 不指定 BSSID、走 DHCP 的完整連線時間，其中：
+        self.scan_ms = 2000     #   掃描所有頻道 (指定 BSSID 時省略)
+        self.dhcp_ms = 700      #   DHCP (已設定固定 IP 時省略)
+        self._active = False
+        self._connected = False
+        self._pending = None
+        self._static = None
+        self.down_until = 0     # AP 故障到這個虛擬時間 (outage)
+        self.connects = 0
+        self.fast_connects = 0
+
+    def add_network(self, ssid, password, rssi=-55, channel=6, bssid=None):
+        bssid = bssid or bytes((2, 0, 0, 0, len(self.networks), channel))
+        self.networks[ssid] = (password, rssi, channel, bssid)
+
+    def active(self, v=None):
+        if v is None: return self._active
+        self._active = bool(v)
+
+    def isconnected(self):
+        return self._connected
+
+    def config(self, *args, **kw):
+        pass
+
+    def connect(self, ssid, password, bssid=None):
+        self.connects += 1
+        self.disconnect()
+        net = self.networks.get(ssid)
+        if net is None or net[0] != password or self.board.clock.now < self.down_until: return
+        if bssid is not None and bssid != net[3]: return
+        ms = self.connect_ms
+        if bssid is not None: ms -= self.scan_ms; self.fast_connects += 1
+        if self._static: ms -= self.dhcp_ms
+        self._pending = self.board.loop.call_later(ms / 1000, self._up)
+
+    def _up(self):
+        self._pending = None
+        self._connected = True
+
+    def disconnect(self):
+        if self._pending: self._pending.cancel()
+        self._pending = None
+        self._connected = False
+
+    def outage(self, s):
+        # AP 斷線 s 秒 (例如路由器重開)，期間連不上
+        self.disconnect()
+        self.down_until = self.board.clock.now + s
+
+    def scan(self):
+        if self.board.clock.now < self.down_until: return []
+        return [(ssid.encode(), bssid, ch, rssi, 3, False)
+                for ssid, (pw, rssi, ch, bssid) in self.networks.items()]
+
+    def ifconfig(self, cfg=None):
+        if cfg is None: return self._static or ("192.168.0.10", "255.255.255.0", "192.168.0.1", "192.168.0.1")
+        self._static = None if cfg == 'dhcp' else tuple(cfg)
+
+
+class SimResponse:
+    # 與 httpc.Response 相同：readinto / close 是 coroutine
+    def __init__(self, status_code, text):
+        self.status_code = status_code
+        self.content = text.encode()
+        self.pos = 0
+
+    async def readinto(self, buf):
+        n = min(len(buf), len(self.content) - self.pos)
+        buf[:n] = self.content[self.pos:self.pos + n]
+        self.pos += n
+        return n
+
+    async def json(self):
+        return json.loads(self.content)
+
+    async def close(self):
+        pass
+
+
+class SimHttp:
+    # HttpClient 替身：請求直接交給後端替身
+    def __init__(self, board):
+        self.board = board
+        self.closes = 0
+
+    async def get(self, url, headers=None):
+        b = self.board
+        b.http_requests += 1
+        if not b.wlan_if.isconnected(): raise OSError(113)
+        if b.http_ms:
+            # 後端處理 + 網路往返：非阻塞時只有這個 task 等待；http_blocking 模擬舊的阻塞 socket，整個事件迴圈停住
+            if b.http_blocking: b.stall(b.http_ms / 1000)
+            else: await asyncio.sleep(b.http_ms / 1000)
+        if b.http_fail > 0:
+            b.http_fail -= 1
+            raise OSError(16)
+        params = dict(parse_qsl(urlsplit(url).query, keep_blank_values=True))
+        r = b.backend.do_get(params)
+        if isinstance(r, str): return SimResponse(200, r)
+        return SimResponse(200, json.dumps(r))
+
+    def close(self):
+        self.closes += 1
+
+
+class SimBoard:
+    def __init__(self, clock, loop, backend):
+        self.clock = clock
+        self.loop = loop
+        self.backend = backend
+        self.pins = {}
+        self.display = None
+        self.buzzer = None
+        self.timers = []
+        self.watchdog = None
+        self.rtc_mem = b""          # RTC 記憶體：重置保留、斷電清除
+        self.cause = "power"
+        self.resets = []            # [(時間, 原因)]
+        self.on_reset = None        # Sim 設定：重置後重新開機
+        self.wlan_if = SimWLAN(self)
+        self.ntp_syncs = 0          # SNTP 請求次數
+        self.ntp_down = False       # True：SNTP 不通 (網路正常)
+        self.rtc_sets = 0
+        self.rtc_ppm = 0.0          # RTC 漂移 (正 = 走太快)
+        self.rtc_err = 0.0          # 上次設定時 RTC - 真實時間 (秒)
+        self.rtc_at = clock.wall()
+        self.rng = random.Random(3)
+        time.time = self.rtc        # 韌體的 time.time() 讀的是 RTC
+        self.http_requests = 0
+        self.http_fail = 0          # >0：接下來幾次請求丟出 OSError 16
+        self.http_ms = 0            # 每次請求花的時間 (虛擬 ms)
+        self.http_blocking = False  # True：請求期間卡住事件迴圈 (量測用)
+        self._events = []           # 腳本事件 heap：[時間, 序號, fn, 是否為旋鈕/按鍵, 已執行]
+        self._seq = 0
+        self._wake_input = False
+
+    # ---- 與 hal.Board 相同的介面 ----
+    def pin_in(self, n):
+        return self.pins.setdefault(n, SimPin(n, 1))
+
+    def pin_out(self, n):
+        return self.pins.setdefault(n, SimPin(n, 0))
+
+    def pwm(self, n):
+        self.buzzer = SimPWM(self.loop)
+        return self.buzzer
+
+    def display_i2c(self, scl, sda, width, height):
+        self.display = SimDisplay(width, height)
+        return self.display
+
+    def timer(self, n):
+        t = SimTimer(self.loop)
+        self.timers.append(t)
+        return t
+
+    def wlan(self):
+        return self.wlan_if
+
+    def rtc(self):
+        w = self.clock.wall()
+        return w + self.rtc_err + (w - self.rtc_at) * self.rtc_ppm * 1e-6
+
+    def rtc_error(self):
+        return self.rtc() - self.clock.wall()
+
+    def power_loss(self):
+        # RTC 斷電歸零 (ESP32 從 2000-01-01 起算)，RTC 記憶體清除
+        self.set_time_ms(946684800000)
+        self.rtc_mem = b""
+        self.cause = "power"
+
+    def time_ms(self):
+        return int(self.rtc() * 1000)
+
+    def set_time_ms(self, ms):
+        self.rtc_sets += 1
+        self.rtc_at = self.clock.wall()
+        self.rtc_err = ms / 1000 - self.rtc_at
+
+    def ntp_sample(self):
+        if not self.wlan_if.isconnected() or self.ntp_down: raise OSError(110)
+        self.ntp_syncs += 1
+        # 往返 15-400 ms；去回程不對稱造成的誤差最多半個往返
+        rtt = self.rng.uniform(15, 400)
+        asym = self.rng.uniform(-0.5, 0.5) * rtt / 2
+        return int(-self.rtc_error() * 1000 + asym), int(rtt)
+
+    def http_client(self, keep_alive):
+        return SimHttp(self)
+
+    def wake_on_input(self, button, clk):
+        pass
+
+    def woke_by_input(self):
+        return self._wake_input
+
+    def lightsleep(self, ms):
+        # 時間快轉到醒來；期間若有腳本事件，執行到該事件為止 (如同硬體喚醒)
+        self._wake_input = False
+        end = self.clock.now + ms / 1000
+        ev = self._events
+        while ev and ev[0][4]: heapq.heappop(ev)
+        if ev and ev[0][0] <= end:
+            self.clock.set(ev[0][0])
+            while ev and ev[0][0] <= self.clock.now:
+                e = heapq.heappop(ev)
+                if e[4]: continue
+                e[4] = True
+                if e[3]: self._wake_input = True
+                e[2]()
+        else:
+            self.clock.set(end)
+
+    def wdt(self, timeout_ms):
+        self.watchdog = SimWDT(self, timeout_ms)
+        return self.watchdog
+
+    def reset(self):
+        self._reset("soft")
+        raise SimReset()
+
+    def _reset(self, cause):
+        # 硬體重置：計時器、PWM、WiFi 全部停止，RTC 與 RTC 記憶體保留
+        if self.on_reset is None: return
+        self.resets.append((self.clock.wall(), cause))
+        self.cause = cause
+        for t in self.timers: t.deinit()
+        self.timers = []
+        if self.watchdog: self.watchdog.stop(); self.watchdog = None
+        if self.buzzer: self.buzzer.duty_u16(0)
+        self.wlan_if.disconnect()
+        self.loop.call_soon(self.on_reset)
+        self.on_reset = None
+
+    def reset_cause(self):
+        return self.cause
+
+    def rtc_memory(self, data=None):
+        if data is None: return self.rtc_mem
+        self.rtc_mem = bytes(data)
+
+    def stall(self, s):
+        # 事件迴圈被卡住 s 秒 (例如阻塞的 HTTP)：時間前進但沒有任何 task / 回呼執行
+        self.clock.advance(s)
+
+    # ---- 腳本：外部事件 ----
+    def at(self, delay_s, fn, is_input=False):
+        # delay_s 秒後執行 fn (在事件迴圈或 light sleep 中皆可觸發)
+        e = [self.clock.now + delay_s, self._seq, fn, is_input, False]
+        self._seq += 1
+        heapq.heappush(self._events, e)
+        self.loop.call_at(e[0], self._fire, e)
+
+    def _fire(self, e):
+        if e[4]: return
+        e[4] = True
+        e[2]()
+
+    def turn(self, steps, delay_s=0, step_ms=STEP_MS):
+        # 旋鈕轉 steps 格 (正數 = 順時針)；每格四個正交邊緣
+        clk = self.pins[32]; dt = self.pins[33]
+        seq = ((1, 0), (0, 0), (0, 1), (1, 1)) if steps > 0 else ((0, 1), (0, 0), (1, 0), (1, 1))
+        t = delay_s
+        for _ in range(abs(steps)):
+            for k, (a, b) in enumerate(seq):
+                def edge(a=a, b=b):
+                    if clk.v != a: clk.drive(a)
+                    if dt.v != b: dt.drive(b)
+                self.at(t + k * EDGE_MS / 1000, edge, True)
+            t += step_ms / 1000
+        return t
+
+    def press(self, delay_s=0, hold_ms=60):
+        sw = self.pins[4]
+        self.at(delay_s, lambda: sw.drive(0), True)
+        self.at(delay_s + hold_ms / 1000, lambda: sw.drive(1), True)
+        return delay_s + hold_ms / 1000 + 0.25   # 避開按鍵去彈跳時間
+
+    def set_lid(self, box, opened, delay_s=0):
+        pin = self.pins[18 if box == 1 else 19]
+        self.at(delay_s, lambda: pin.drive(0 if opened else 1))
+        return delay_s
+
+
+# -----------------------------
+# 模擬器
+# -----------------------------
+class Sim:
+    def __init__(self, start=DEFAULT_START, workdir=None, backend=None):
+        self.clock = VirtualClock(start)
+        self.clock.install()
+        self.loop = VirtualLoop(self.clock)
+        asyncio.set_event_loop(self.loop)
+        self.backend = backend or MockGAS(clock=self.clock.wall)
+        self.board = SimBoard(self.clock, self.loop, self.backend)
+        # 韌體的設定 / 日誌檔寫在目前目錄，每個模擬器用自己的暫存目錄
+        self.workdir = workdir or tempfile.mkdtemp(prefix="pillbox-sim-")
+        os.chdir(self.workdir)
+        self.app = None
+        self.task = None
+
+    def boot(self):
+        from app import App
+        self.app = App(self.board)
+        self.board.on_reset = self.reboot
+        self.task = self.loop.create_task(self.app.main())
+        return self.app
+
+    def reboot(self):
+        # 重置後重新開機：停掉舊韌體的 task，ticks 從 0 起算，同一塊板子 (RTC / 工作目錄保留)
+        for t in self.app.tasks: t.cancel()
+        if self.task.done():
+            if not self.task.cancelled(): self.task.exception()
+        else: self.task.cancel()
+        t0 = self.clock.now
+        rt.set_clock(lambda: self.clock.now - t0)
+        self.boot()
+
+    def run_for(self, seconds):
+        self.loop.run_until_complete(asyncio.sleep(seconds))
+        if self.task and self.task.done() and not self.task.cancelled():
+            self.task.result()  # 韌體例外直接拋出
+
+    def close(self):
+        # 取消韌體與腳本的所有 task
+        tasks = [t for t in asyncio.all_tasks(self.loop) if not t.done()]
+        for t in tasks: t.cancel()
+        if tasks: self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        self.loop.close()
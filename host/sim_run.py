@@ -0,0 +1,452 @@
+# ==========================================
+# 主機端模擬：設定流程 + 多天服藥回歸測試 (CPython)
+# ==========================================
+# 在虛擬時鐘上執行完整韌體 (app.App + sim.SimBoard + mock_gas.MockGAS)：
+#   1. 開機掃描 WiFi -> 旋鈕輸入密碼 -> 綁定 -> 同步雲端設定
+#   2. 模擬病人 N 天：鬧鐘響後開蓋 / 偶爾忘記改按按鈕 / 偶爾提早吃藥
+#   3. 第一天中午從 LINE 重新送出設定，裝置須在輪詢上限內自動取得新版本
+#   4. 檢查每個時段都有響 (或因提早吃藥而取消)，所有紀錄都送達後端
+#   5. 以存好的設定重新開機 (WiFi 連線要 8 秒)：時鐘立刻出現，之後在背景上線並同步設定
+#   6. 服藥歷史 (history.bin) 的每日統計與實際相符，重開機後從檔案重建的索引相同
+#   7. 沒人理會的鬧鐘：逐級加大、自動貪睡後再響並再次通知，響滿最後一輪後停止
+#   8. 響鈴中當機、事件迴圈卡住觸發看門狗：重開機後接續響鈴、重開期間到期的鬧鐘補響、不重複通知
+#   9. 提早吃藥只取消藥格相符的時段；回應響鈴後再開蓋不算下一個時段的提早吃藥
+#  10. 還沒綁定就開蓋：事件留在日誌裡、網路 task 閒置 (不空轉)，綁定後才上傳
+#  11. 開蓋事件來不及處理：緩衝區滿了丟新事件，歷史紀錄用開蓋當下的時間
+#  12. 校時讓時鐘往前跳：跳過的時段照補響規則補響或記為錯過
+# 任一檢查失敗則以非零狀態結束。
+#
+#   python host/sim_run.py [天數] [-v]
+import asyncio
+import contextlib
+import io
+import random
+import sys
+import time
+
+from sim import Sim, DEFAULT_START
+import app as fw
+import annunciator
+import history
+import link
+from stats import STAGE_LINK, LINK_DROPS, LINK_FAST, BOOT_CLOCK
+from snapshot import CAUSES
+
+SSID = "HomeAP"
+PASSWORD = "pw1234"
+BIND_CODE = "123456"
+USER_ID = "U_sim"
+DOSES = [
+    {"hour": 8, "minute": 0, "days": [True] * 7, "box": 1},
+    {"hour": 20, "minute": 30, "days": [True] * 5 + [False] * 2, "box": 2},
+]
+START = DEFAULT_START - 2 * 3600      # 當地時間 06:00 開機
+FORGET_P = 0.1                        # 響鈴後很久才按按鈕
+EARLY_P = 0.1                         # 鬧鐘前一小時就先吃
+RTC_PPM = 40                          # RTC 每天快約 3.5 秒
+OUTAGE_S = 1200                       # 第三天的 AP 故障時間
+RING_TOLERANCE_S = 2                  # 響鈴誤差上限 (含病人 0.5 秒輪詢)
+
+
+def enter_text(board, t, text, charset):
+    # 從 char_index = 0 轉到每個字元再按下，最後轉到 OK
+    total = len(charset) + 3
+    for ch in text:
+        idx = charset.index(ch)
+        t = board.turn(idx if idx <= total // 2 else idx - total, t)
+        t = board.press(t)
+    t = board.turn(-3, t)   # OK = len(charset)，反轉 3 格最近
+    return board.press(t)
+
+
+def menu(board, t, item):
+    t = board.press(t)      # 時鐘畫面 -> 選單
+    t = board.turn(fw.MENU_ITEMS.index(item), t)
+    return board.press(t)
+
+
+class Patient:
+    def __init__(self, sim, rng):
+        self.sim = sim
+        self.rng = rng
+        self.rings = 0
+        self.ring_err = 0.0     # 響鈴時間與排定時間的最大差距 (真實時間，秒)
+        self.takes = 0
+        self.early = 0
+        self.busy = False
+
+    def take_by_lid(self, box, delay):
+        b = self.sim.board
+        b.set_lid(box, True, delay)
+        b.set_lid(box, False, delay + 10)
+        self.takes += 1
+
+    def plan_early(self, start, days):
+        # 對每個時段，以 EARLY_P 的機率在前一小時開蓋
+        for t, box in dose_times(start, days):
+            if self.rng.random() < EARLY_P:
+                self.sim.board.at(t - 3600 - self.sim.clock.wall(), lambda box=box: self._early(box))
+
+    def _early(self, box):
+        app = self.sim.app
+        if app.current_state != fw.CLOCK_VIEW: return
+        self.early += 1
+        self.take_by_lid(box, 0)
+
+    async def run(self):
+        app = self.sim.app
+        while True:
+            await asyncio.sleep(0.5)
+            if app.current_state != fw.ALARM_RINGING or self.busy: continue
+            self.rings += 1
+            self.ring_err = max(self.ring_err, abs(self.sim.clock.wall() - app.last_alarm_fire))
+            self.busy = True
+            if self.rng.random() < FORGET_P:
+                self.sim.board.press(self.rng.uniform(600, 1500))
+                self.takes += 1
+            else:
+                box = app.sched.entries[self._ringing_dose()][3]
+                self.take_by_lid(box, self.rng.uniform(5, 90))
+            while app.current_state == fw.ALARM_RINGING: await asyncio.sleep(0.5)
+            self.busy = False
+
+    def _ringing_dose(self):
+        # 目前響的是哪個時段：最近一次觸發的那個
+        app = self.sim.app
+        last = app.last_alarm_fire
+        for i, t in enumerate(app.sched.last_fire):
+            if t == last: return i
+        return 0
+
+
+def dose_times(start, end):
+    # [start, end) 之間每個時段的觸發時間 (epoch 秒)，與 Schedule 無關的獨立計算
+    out = []
+    day0 = (start + fw.UTC_OFFSET) // 86400 * 86400 - fw.UTC_OFFSET
+    d = day0
+    while d < end:
+        wday = time.gmtime(d + fw.UTC_OFFSET)[6]
+        for dose in DOSES:
+            t = d + dose["hour"] * 3600 + dose["minute"] * 60
+            if start < t < end and dose["days"][wday]: out.append((t, dose["box"]))
+        d += 86400
+    return sorted(out)
+
+
+def reboot_check(sim0, out):
+    # 同一個工作目錄 (wifi.txt / alarm.json / user_id.txt) 與後端，新的板子
+    sim = Sim(start=int(sim0.clock.wall()), workdir=sim0.workdir, backend=sim0.backend)
+    sim.board.wlan_if.add_network(SSID, PASSWORD)
+    # 頻道擁擠：完整掃描很慢；link.txt 留有上次的 AP，應走快速重連
+    sim.board.wlan_if.connect_ms = 8000
+    sim.board.wlan_if.scan_ms = 6000
+    # 斷電重開：RTC 歸零，開機先由 clock.txt 還原 (未校時)，連上網路後校時
+    sim.board.power_loss()
+    with contextlib.redirect_stdout(out):
+        app = sim.boot()
+        sim.run_for(0.5)
+        clock_shown = app.current_state == fw.CLOCK_VIEW
+        restored = not app.tk.synced and abs(sim.board.rtc_error()) < 4 * 3600
+        sim.run_for(120)
+        sim.close()
+    boot = list(app.stats.boot)
+    ok = clock_shown and all(boot) and boot[0] < 100 and boot[1] < 3000 and app.get_user_id() == USER_ID
+    ok = ok and restored and app.tk.synced and abs(sim.board.rtc_error()) < 1
+    d = sim0.app.hist.today()
+    ok = ok and app.hist.summary(d, 30) == sim0.app.hist.summary(d, 30) and app.hist.next_seq == sim0.app.hist.next_seq
+    return ok, boot
+
+
+def fresh_device(start, doses=DOSES):
+    # 新的板子，已存 WiFi 與綁定 (開機後在背景連線並同步設定)
+    sim = Sim(start=start)
+    sim.board.wlan_if.add_network(SSID, PASSWORD)
+    sim.backend.add_user(USER_ID, doses)
+    with open("wifi.txt", "w") as f: f.write(f"{SSID}\n{PASSWORD}")
+    with open("user_id.txt", "w") as f: f.write(USER_ID)
+    return sim
+
+
+def snooze_check(out):
+    # 08:00 的鬧鐘響了沒人回應
+    sim = fresh_device(DEFAULT_START - 600)
+    rounds = annunciator.ROUNDS
+    ring_s = (rounds * annunciator.RING_MS + (rounds - 1) * annunciator.SNOOZE_MS) / 1000
+    with contextlib.redirect_stdout(out):
+        app = sim.boot()
+        sim.run_for(600 + ring_s / 2)
+        ringing = app.current_state == fw.ALARM_RINGING
+        sim.run_for(ring_s / 2 + 600)
+        sim.close()
+        sim.backend.drain_outbox()
+    ann = app.ann; bz = sim.board.buzzer
+    alarm_logs = sum(1 for rec in sim.backend.logs if rec[2] == "Alarm")
+    ok = ringing and ann.gave_up and not ann.active and app.current_state == fw.CLOCK_VIEW
+    ok = ok and ann.repeats == rounds - 1 and alarm_logs == rounds and ann.level == ann.levels - 1
+    ok = ok and bz.duty == 0 and bz.beeps > 0 and bz.on_s < rounds * annunciator.RING_MS / 1000
+    return ok, (alarm_logs, bz.beeps, bz.on_s)
+
+
+def crash_check(out):
+    # 每天 08:00 / 08:30 兩個時段 (當地時間 07:55 開機)
+    doses = [{"hour": 8, "minute": m, "days": [True] * 7, "box": b} for m, b in ((0, 1), (30, 2))]
+    sim = fresh_device(DEFAULT_START - 300, doses)
+    board = sim.board
+
+    def boom(*a): raise RuntimeError("injected")
+
+    with contextlib.redirect_stdout(out):
+        app = sim.boot()
+        sim.run_for(320)
+        ringing = app.current_state == fw.ALARM_RINGING
+        # 1. 響鈴中 task 拋出未處理的例外 -> 存快照、重置 -> 接續響鈴 (不重複通知)
+        app.lcd.field = boom
+        sim.run_for(2)
+        a2 = sim.app
+        resumed = a2 is not app and a2.current_state == fw.ALARM_RINGING and a2.ann.active
+        resume_ms = a2.stats.boot[BOOT_CLOCK]
+        sim.run_for(board.press(1) + 5)
+        taken = a2.current_state == fw.CLOCK_VIEW and a2.hist.taken(a2.hist.today())
+        # 2. 08:29:30 事件迴圈卡住 2 分鐘 -> 看門狗重置 -> 重開期間到期的 08:30 補響
+        board.at(DEFAULT_START + 1770 - sim.clock.wall(), lambda: board.stall(120))
+        sim.run_for(DEFAULT_START + 1920 - sim.clock.wall())
+        a3 = sim.app
+        caught_up = a3 is not a2 and a3.current_state == fw.ALARM_RINGING and a3.ringing_slot == 1
+        sim.run_for(board.press(1) + 5)
+        # 3. 之後都不再響
+        sim.run_for(1800)
+        quiet = a3.current_state == fw.CLOCK_VIEW and sim.app is a3
+        sim.close()
+        sim.backend.drain_outbox()
+    causes = [c for _, c in board.resets]
+    alarm_logs = sum(1 for rec in sim.backend.logs if rec[2] == "Alarm")
+    ok = ringing and resumed and resume_ms < 1000 and taken and caught_up and quiet
+    ok = ok and causes == ["soft", "wdt"] and CAUSES[a2.snap.cause] == "crash" and CAUSES[a3.snap.cause] == "wdt"
+    ok = ok and a3.snap.resets == 2 and alarm_logs == 2
+    return ok, (causes, resume_ms, alarm_logs)
+
+
+def unbound_check(out):
+    # 已存 WiFi、還沒綁定 (當地時間 06:00 開機)
+    sim = Sim(start=START)
+    sim.board.wlan_if.add_network(SSID, PASSWORD)
+    sim.backend.add_user(USER_ID, DOSES)
+    with open("wifi.txt", "w") as f: f.write(f"{SSID}\n{PASSWORD}")
+    board = sim.board
+    with contextlib.redirect_stdout(out):
+        app = sim.boot()
+        sim.run_for(60)
+        board.set_lid(1, True, 0); board.set_lid(1, False, 10)
+        sim.run_for(3600)
+        # 虛擬時鐘有前進 = 事件迴圈沒有卡在 0 ms 的重試
+        idle = app.journal.has_pending() and sim.backend.requests == 0 and sim.clock.wall() >= START + 3660
+        sim.backend.add_code(BIND_CODE, USER_ID)    # 綁定碼有效期限短，要綁定時才產生
+        t = menu(board, 0, "Bind User")
+        t = enter_text(board, t, BIND_CODE, fw.NUMERIC_CHARS)
+        sim.run_for(t + 60)
+        sim.close()
+        sim.backend.drain_outbox()
+    eat_logs = sum(1 for rec in sim.backend.logs if rec[2] == "Eat")
+    ok = idle and app.get_user_id() == USER_ID and eat_logs == 1 and not app.journal.has_pending()
+    return ok, eat_logs
+
+
+def early_check(out):
+    # 08:00 藥格 1、09:00 藥格 1、10:00 藥格 2 (當地時間 07:00 開機)
+    doses = [{"hour": h, "minute": 0, "days": [True] * 7, "box": b} for h, b in ((8, 1), (9, 1), (10, 2))]
+    sim = fresh_device(DEFAULT_START - 3600, doses)
+    board = sim.board
+    rang = []
+
+    def lid(box, t):
+        board.set_lid(box, True, t - sim.clock.wall())
+        board.set_lid(box, False, t + 10 - sim.clock.wall())
+
+    async def answer():
+        # 響鈴 30 秒後開藥格 1
+        while True:
+            await asyncio.sleep(0.5)
+            app = sim.app
+            if app.current_state == fw.ALARM_RINGING and app.ringing_slot not in rang:
+                rang.append(app.ringing_slot)
+                lid(1, sim.clock.wall() + 30)
+
+    with contextlib.redirect_stdout(out):
+        app = sim.boot()
+        sim.loop.create_task(answer())
+        lid(2, DEFAULT_START - 1800)    # 07:30 提早吃 10:00 (藥格 2) 的藥：08:00 (藥格 1) 照響
+        lid(1, DEFAULT_START + 600)     # 08:10 回應過 08:00 之後再開藥格 1：09:00 照響
+        sim.run_for(4 * 3600)
+        sim.close()
+    d = app.hist.today()
+    skips = [r[5] for r in app.hist.read(1, 64, (history.K_SKIP,))]
+    ok = rang == [0, 1] and skips == [2] and app.hist.day_counts(d) == (3, 3)
+    return ok, (rang, skips)
+
+
+def lid_check(out):
+    # lid_task 來不及取出時：環形緩衝區滿了丟新事件並計數，已排隊的開蓋照原本的時間記入歷史
+    sim = fresh_device(DEFAULT_START - 3600)
+    with contextlib.redirect_stdout(out):
+        app = sim.boot()
+        sim.run_for(60)
+        lids = app.lids
+        t0 = int(time.time()) - 120
+        for i in range(lids.size + 4): lids._push(1 + (i & 1), (i & 2) >> 1, t0 + i)
+        queued = (lids.head - lids.tail) % lids.size
+        first = lids.q_ts[lids.tail]
+        lids.notify()
+        sim.run_for(60)
+        sim.close()
+    takes = [r[1] for r in app.hist.read(1, 64, (history.K_TAKE,))]
+    want = [t0 + i + history.EPOCH_OFFSET for i in range(lids.size - 1) if i & 2]
+    ok = queued == lids.size - 1 and lids.dropped == 5 and first == t0 and takes == want
+    return ok, (queued, lids.dropped, len(takes))
+
+
+def step_check(out):
+    # RTC 慢了 3 小時 (07:01 顯示 04:01) 沒被發現，校時往前跳：
+    # 05:00 超過補響時間記為錯過，06:45 補響
+    doses = [{"hour": h, "minute": m, "days": [True] * 7, "box": 1} for h, m in ((5, 0), (6, 45))]
+    sim = fresh_device(DEFAULT_START - 3600, doses)
+    board = sim.board
+    with contextlib.redirect_stdout(out):
+        app = sim.boot()
+        sim.run_for(60)
+        board.set_time_ms(board.time_ms() - 3 * 3600 * 1000)
+        app.tk.due = fw.rt.ticks_ms(); app.tk.kick()
+        sim.run_for(180)    # 省電模式一分鐘醒一次，校時要等下一次醒來
+        sim.close()
+    late = [r[5] for r in app.hist.read(1, 64, (history.K_LATE,))]
+    ok = late == [0] and app.current_state == fw.ALARM_RINGING and app.ringing_slot == 1
+    return ok, (late, app.ringing_slot if app.current_state == fw.ALARM_RINGING else None)
+
+
+def main(days, verbose):
+    rng = random.Random(7)
+    sim = Sim(start=START)
+    sim.board.wlan_if.add_network(SSID, PASSWORD)
+    sim.board.wlan_if.add_network("Neighbor", "x", rssi=-80)
+    sim.board.rtc_ppm = RTC_PPM
+    sim.backend.add_user(USER_ID, DOSES)
+    sim.backend.add_code(BIND_CODE, USER_ID)
+    out = sys.stdout if verbose else io.StringIO()
+    t_wall = time.perf_counter()
+    ok = True
+
+    with contextlib.redirect_stdout(out):
+        app = sim.boot()
+        sim.run_for(2)
+        # 1. WiFi：AP 清單第一個就是 SSID
+        t = sim.board.press(0)
+        t = enter_text(sim.board, t, PASSWORD, fw.PASSWORD_CHARS)
+        sim.run_for(t + 10)
+        setup_ok = app.current_state == fw.CLOCK_VIEW and sim.board.wlan_if.isconnected()
+        # 2. 綁定後同步設定
+        t = menu(sim.board, 0, "Bind User")
+        t = enter_text(sim.board, t, BIND_CODE, fw.NUMERIC_CHARS)
+        sim.run_for(t + 5)
+        t = menu(sim.board, 0, "Sync Cloud")
+        sim.run_for(t + 5)
+        setup_ok = setup_ok and app.get_user_id() == USER_ID and len(app.sched.entries) == len(DOSES)
+
+        # 3. 病人
+        synced = int(sim.clock.wall())
+        end = synced + days * 86400
+        patient = Patient(sim, rng)
+        patient.plan_early(synced, end)
+        sim.loop.create_task(patient.run())
+        # LINE 重新設定 (同樣的時段、新版本)，記錄裝置多久後取得
+        edit = {}
+        sim.board.at(6 * 3600, lambda: (sim.backend.save_user_config(USER_ID, DOSES),
+                                       edit.setdefault("t", sim.clock.wall())))
+
+        async def watch_version():
+            while app.alarm_config.get("version") != sim.backend.get_config_version(USER_ID) or "t" not in edit:
+                await asyncio.sleep(1)
+            edit["lag"] = sim.clock.wall() - edit["t"]
+        sim.loop.create_task(watch_version())
+        # WiFi 斷線：路由器重開 90 秒、之後一次 20 分鐘的故障 (退避重試)
+        wlan = sim.board.wlan_if
+        sim.board.at(30 * 3600, lambda: wlan.outage(90))
+        sim.board.at(54 * 3600, lambda: wlan.outage(OUTAGE_S))
+        sim.run_for(end - synced)
+        sim.run_for(3600)   # 讓最後的日誌上傳完
+        sim.close()
+        sim.backend.drain_outbox()  # 最後一批佇列
+
+    power = app.pm.report()     # reboot_check 換了時鐘，先算好
+    today = app.hist.today()
+    hist = app.hist.summary(today, days + 1)
+    week = app.hist.summary(today, 7)
+    rtc_err = sim.board.rtc_error()
+    boot_ok, boot = reboot_check(sim, out)
+    snooze_ok, snooze = snooze_check(out)
+    crash_ok, crash = crash_check(out)
+    early_ok, early = early_check(out)
+    unbound_ok, unbound = unbound_check(out)
+    lid_ok, lid = lid_check(out)
+    step_ok, step = step_check(out)
+    wall = time.perf_counter() - t_wall
+    expected = dose_times(synced, end)
+    kinds = {}
+    for rec in sim.backend.logs: kinds[rec[2]] = kinds.get(rec[2], 0) + 1
+    eat_logs = kinds.get("Eat", 0); alarm_logs = kinds.get("Alarm", 0)
+
+    print(f"simulated {days} days in {wall:.1f}s ({days * 86400 / wall:.0f}x real time)")
+    print(f"setup (wifi / bind / sync) : {'ok' if setup_ok else 'FAILED'}")
+    print(f"scheduled doses            : {len(expected)}")
+    print(f"rang / skipped (taken early): {patient.rings} / {patient.early}")
+    print(f"takes / eat logs            : {patient.takes} / {eat_logs}")
+    print(f"alarm logs                  : {alarm_logs}")
+    print(f"http requests               : {sim.board.http_requests}  (backend {sim.backend.requests})")
+    print(f"config polls not modified   : {sim.backend.not_modified}")
+    lag = edit.get("lag")
+    print(f"LINE edit -> device         : {'never' if lag is None else f'{lag:.0f}s'}")
+    print(f"rtc drift / error at end    : {RTC_PPM:.0f} ppm / {rtc_err * 1000:+.0f} ms  ({app.tk.report()})")
+    print(f"alarm timing error (max)    : {patient.ring_err:.2f}s")
+    print(f"history doses on time / due : {hist[0]} / {hist[1]}  (7 days {week[0]} / {week[1]}, "
+          f"streak {app.hist.streak(today)}d, {app.hist.next_seq - 1} records)")
+    print(f"buzzer beeps / on           : {sim.board.buzzer.beeps} / {sim.board.buzzer.on_s:.0f}s  "
+          f"(re-rings {app.ann.repeats})")
+    print(f"ignored alarm notify / beeps / on: {snooze[0]} / {snooze[1]} / {snooze[2]:.0f}s  "
+          f"({'ok' if snooze_ok else 'FAILED'})")
+    print(f"crash / watchdog resets     : {' / '.join(crash[0])}  (resume {crash[1]} ms, "
+          f"alarm notify {crash[2]})  ({'ok' if crash_ok else 'FAILED'})")
+    print(f"early take rang / skipped   : {early[0]} / {early[1]}  ({'ok' if early_ok else 'FAILED'})")
+    print(f"unbound take -> eat logs    : {unbound}  ({'ok' if unbound_ok else 'FAILED'})")
+    print(f"lid burst queued / dropped / takes: {lid[0]} / {lid[1]} / {lid[2]}  ({'ok' if lid_ok else 'FAILED'})")
+    print(f"clock step late / rang      : {step[0]} / {step[1]}  ({'ok' if step_ok else 'FAILED'})")
+    print(f"oled bytes                  : {sim.board.display.bytes}")
+    print(f"power                       : {power}")
+    print(f"journal pending / dropped   : {app.journal.has_pending()} / {app.journal.dropped}")
+    print(f"stats uploads               : {len(sim.backend.stats)}")
+    st = app.stats
+    link_n = st.count[STAGE_LINK]
+    drops = st.counters[LINK_DROPS]; fast = st.counters[LINK_FAST]
+    print(f"wifi drops / fast reconnects: {drops} / {fast}  (reconnect avg {st.avg(STAGE_LINK) // 1000} ms"
+          f", max {st.worst[STAGE_LINK] // 1000} ms, n={link_n})")
+    print(f"reboot clock / online / config: {boot[0]} / {boot[1]} / {boot[2]} ms  ({'ok' if boot_ok else 'FAILED'})")
+    print(app.stats.report())
+
+    if not setup_ok or not boot_ok or not snooze_ok or not crash_ok or not early_ok \
+            or not unbound_ok or not lid_ok \
+            or not step_ok: ok = False
+    if days >= 3 and (drops < 2 or fast < 1 or not app.link.online): ok = False
+    # AP 恢復後最多再等一次退避上限 (加一次重試的連線時間) 就要連上
+    if st.worst[STAGE_LINK] // 1000 > (OUTAGE_S + link.RETRY_MAX_MS // 1000 + 30) * 1000: ok = False
+    if lag is None or lag > fw.CONFIG_POLL_MAX_MS / 1000 + fw.MAX_SLEEP_MS / 1000: ok = False
+    if patient.rings + patient.early != len(expected): ok = False
+    if alarm_logs != patient.rings + app.ann.repeats: ok = False
+    if eat_logs != patient.takes: ok = False
+    if app.journal.has_pending(): ok = False
+    if days < 30 and hist != (len(expected), len(expected)): ok = False
+    if abs(rtc_err) > 1 or patient.ring_err > RING_TOLERANCE_S: ok = False
+    print("OK" if ok else "FAIL")
+    return ok
+
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith("-")]
+    days = int(args[0]) if args else 7
+    sys.exit(0 if main(days, "-v" in sys.argv) else 1)